@@ -42,6 +42,50 @@ print(i)
 ' < $BIG
 }
 
+# Print many lines with a builtin, to measure output buffering.  The output
+# goes to a file, so echo, printf, and write can leave it in the buffer.
+#
+# Usage:
+#   benchmarks/builtin-io.sh print-lines bin/osh echo
+#   benchmarks/builtin-io.sh print-lines bash printf 1000000
+
+print-lines() {
+  local sh=${1:-bin/osh}
+  local builtin=${2:-echo}
+  local n=${3:-10000000}
+
+  local out=_tmp/print-lines.txt
+  mkdir -p _tmp
+
+  local code
+  case $builtin in
+    echo)   code='echo "line $i"' ;;
+    printf) code='printf "line %d\n" $i' ;;
+    write)  code='write -- "line $i"' ;;
+  esac
+
+  time $sh -c "
+i=0
+while test \$i -lt $n; do
+  $code
+  i=\$((i + 1))
+done > $out
+"
+  wc -l $out
+}
+
+print-lines-all() {
+  local n=${1:-10000000}
+  for sh in bash bin/osh; do
+    for builtin in echo printf; do
+      echo "--- $sh $builtin"
+      print-lines $sh $builtin $n
+    done
+  done
+  echo "--- bin/osh write"
+  print-lines bin/osh write $n
+}
+
 bash-syscall() {
   # Shows that there are tons of read(0, 1) calls!
   seq 20 | strace -e read -- bash -c 'mapfile'
@@ -13,6 +13,7 @@
 #              also integer counter
 # - bubble_sort: indexed array (bash uses a linked list?)
 # - palindrome: string, slicing, unicode
+# - var_lookup: reading and assigning variables in a function
 # - parse_help: realistic shell-only string processing, which I didn't write.
 #
 # TODO:
@@ -61,6 +62,17 @@ fib-tasks() {
   done
 }
 
+# task_name,iter,args
+var_lookup-tasks() {
+  local provenance=$1
+
+  # No Python version of this one
+  cat $provenance | filter-provenance bash dash $OIL_NATIVE_REGEX |
+  while read fields; do
+    echo 'var_lookup 20 1000' | xargs -n 3 -- echo "$fields"
+  done
+}
+
 word_freq-tasks() {
   local provenance=$1
 
@@ -247,6 +259,7 @@ parse_help-one() {
 
 hello-all() { task-all hello "$@"; }
 fib-all() { task-all fib "$@"; }
+var_lookup-all() { task-all var_lookup "$@"; }
 word_freq-all() { task-all word_freq "$@"; }
 assoc_array-all() { task-all assoc_array "$@"; }
 
@@ -310,7 +323,7 @@ task-all() {
 
     local -a cmd
     case $task_name in
-      (hello|fib)
+      (hello|fib|var_lookup)
         # Run it DIRECTLY, do not run $0.  Because we do NOT want to fork bash
         # than dash, because bash uses more memory.
         cmd=($runtime benchmarks/compute/$task_name.$(ext $runtime) "$arg1" "$arg2")
@@ -0,0 +1,30 @@
+#!/bin/sh
+#
+# POSIX shell script that does little but read and write variables, in a
+# function with a few globals and locals.  Every expansion in OSH goes through
+# Mem.GetValue().
+
+iters=${1:-5}  # first argument of every benchmark should be the number of iterations
+
+n=${2:-1000}
+
+g1=1 g2=2 g3=3
+
+f() {
+  local x=0 y=0 z=0
+  local j=0 s=''
+  while test $j -lt $n; do
+    x=$((x + g1))
+    y=$((y + g2 + x))
+    z=$((z + g3 + y - x))
+    s="$x $y $z $g1 $g2 $g3"
+    j=$((j + 1))
+  done
+  echo "$s"
+}
+
+i=0
+while test $i -lt $iters; do
+  f
+  i=$((i+1))
+done
@@ -0,0 +1,45 @@
+#!/usr/bin/env bash
+#
+# Benchmark the 'wait' builtin with many background jobs.
+#
+# Usage:
+#   benchmarks/wait.sh <function name>
+#
+# Example:
+#   benchmarks/wait.sh compare 1000
+
+set -o nounset
+set -o pipefail
+set -o errexit
+
+readonly TIMEFORMAT='%R'
+
+# Start N background processes, then wait for all of them.  Before
+# Waiter.ReapExited(), 'wait' checked JobState.NumRunning() once per process,
+# which is quadratic in the number of jobs.
+fanout() {
+  local sh=${1:-bin/osh}
+  local n=${2:-1000}
+
+  $sh -c '
+n=$1
+i=0
+while test $i -lt $n; do
+  true &
+  i=$((i + 1))
+done
+wait
+echo "waited for $n jobs"
+' dummy $n
+}
+
+compare() {
+  local n=${1:-1000}
+
+  for sh in bash dash bin/osh; do
+    echo "--- $sh"
+    time fanout $sh $n
+  done
+}
+
+"$@"
@@ -65,6 +65,7 @@ asdl/py.*
 core/py.*
 core/comp_ui.py
 core/optview.py
+core/parse_cache.py
 frontend/consts.py
 frontend/match.py
 frontend/py_reader.py
@@ -72,6 +73,7 @@ pgen2/parse.py
 pylib/path_stat.py
 oil_lang/expr_eval.py
 oil_lang/objects.py
+osh/arith_compile.py
 osh/bool_stat.py
 osh/history.py
 EOF
@@ -11,14 +11,22 @@ Arena, and the entire Arena can be discarded at once.
 Also, we don't want to save comment lines.
 """
 
+import array
+
 from _devbuild.gen.syntax_asdl import line_span, source_t
 from asdl import runtime
 from core.pyerror import log
+from mycpp import mylib
 
-from typing import List, Dict, Any
+from typing import List, Dict, Optional, Any, TYPE_CHECKING
+if TYPE_CHECKING:
+  from core.pyos import MappedFile
 
 _ = log
 
+# Each mapping holds a descriptor, so don't map too many files
+_MAX_MAPPED_FILES = 32
+
 
 class ctx_Location(object):
 
@@ -46,14 +54,29 @@ class Arena(object):
   def __init__(self):
     # type: () -> None
 
-    # Three parallel arrays indexed by line_id.
+    # Parallel arrays indexed by line_id.
     self.line_vals = []  # type: List[str]
     self.line_nums = []  # type: List[int]
     self.line_srcs = []  # type: List[source_t]
     self.line_num_strs = {}  # type: Dict[int, str]  # an INTERN table
 
-    # indexed by span_id
-    self.spans = []  # type: List[line_span]
+    # For lines of sourced files.  After DropFileLines(), line_vals has '' and
+    # the line is read back from the file at this offset.
+    self.line_files = []  # type: List[Optional[MappedFile]]
+    self.line_offsets = []  # type: List[int]
+    # The open mappings.  Sourcing a file again reuses its mapping.
+    self.mapped_files = []  # type: List[MappedFile]
+
+    # Parallel arrays indexed by span_id.  There's one span per token, so
+    # GetLineSpan() creates line_span objects only when they're asked for.  In
+    # Python these are array('i') columns, which avoids an object per token.
+    self.span_line_ids = []  # type: List[int]
+    self.span_cols = []  # type: List[int]
+    self.span_lengths = []  # type: List[int]
+    if mylib.PYTHON:
+      self.span_line_ids = array.array('i')  # type: ignore
+      self.span_cols = array.array('i')  # type: ignore
+      self.span_lengths = array.array('i')  # type: ignore
 
     # reuse these instances in many line_span instances
     self.source_instances = []  # type: List[source_t]
@@ -76,19 +99,84 @@ class Arena(object):
     self.line_vals.append(line)
     self.line_nums.append(line_num)
     self.line_srcs.append(self.source_instances[-1])
+    self.line_files.append(None)
+    self.line_offsets.append(-1)
+    return line_id
+
+  def AddMappedFile(self, mapped):
+    # type: (MappedFile) -> Optional[MappedFile]
+    """Return the mapping to record lines of a newly mapped file with.
+
+    If the same unchanged file is already mapped, the new mapping is closed
+    and the old one is returned.  Returns None if too many files are mapped.
+    """
+    # Close mappings of files that changed.  Their lines are read as ''
+    # either way.
+    open_files = []  # type: List[MappedFile]
+    for m in self.mapped_files:
+      if m.Changed():
+        m.Close()
+      else:
+        open_files.append(m)
+    self.mapped_files = open_files
+
+    for m in self.mapped_files:
+      if m.IsSameFile(mapped):
+        mapped.Close()
+        return m
+
+    if len(self.mapped_files) >= _MAX_MAPPED_FILES:
+      mapped.Close()
+      return None
+
+    self.mapped_files.append(mapped)
+    return mapped
+
+  def AddFileLine(self, line, line_num, mapped, offset):
+    # type: (str, int, MappedFile, int) -> int
+    """Like AddLine(), but also record where the line is in a mapped file."""
+    line_id = self.AddLine(line, line_num)
+    self.line_files[line_id] = mapped
+    self.line_offsets[line_id] = offset
     return line_id
 
+  def DropFileLines(self, mapped, first_line_id):
+    # type: (MappedFile, int) -> None
+    """Stop keeping a copy of the file's lines, after it's fully parsed.
+
+    GetLine() reads them back from the mapping.  If the file has already
+    changed, then the mapping is useless, and we keep the copies.
+    """
+    if mapped.Changed():
+      mapped.Close()
+      for line_id in xrange(first_line_id, len(self.line_vals)):
+        if self.line_files[line_id] is mapped:
+          self.line_files[line_id] = None
+      return
+
+    for line_id in xrange(first_line_id, len(self.line_vals)):
+      if self.line_files[line_id] is mapped:
+        self.line_vals[line_id] = ''
+
   def GetLine(self, line_id):
     # type: (int) -> str
     """Return the text of a line.
 
-    TODO: This should be hidden behind an interface like Python's line cache?
-    It should store offsets (and maybe checkums).  It will have two
-    implementions: in-memory for interactive, and on-disk for batch and
-    'sourced' files.
+    Lines of large sourced files are read back from a read-only mmap(), which
+    gives '' if the file has changed since.  Other lines are in memory.
     """
     assert line_id >= 0, line_id
-    return self.line_vals[line_id]
+    line = self.line_vals[line_id]
+    if len(line) == 0:
+      mapped = self.line_files[line_id]
+      if mapped is not None:
+        line = mapped.Line(self.line_offsets[line_id])
+    return line
+
+  def LastLineId(self):
+    # type: () -> int
+    """Return one past the last line ID."""
+    return len(self.line_vals)
 
   def GetLineNumber(self, line_id):
     # type: (int) -> int
@@ -127,17 +215,17 @@ class Arena(object):
 
     if left_id == right_id:
       # the single line
-      parts.append(self.line_vals[left_id][left_col+1:right_col])
+      parts.append(self.GetLine(left_id)[left_col+1:right_col])
     else:
       # first incomplete line
-      parts.append(self.line_vals[left_id][left_col+1:])
+      parts.append(self.GetLine(left_id)[left_col+1:])
 
       # all the complete lines
       for line_id in xrange(left_id + 1, right_id):
-        parts.append(self.line_vals[line_id])
+        parts.append(self.GetLine(line_id))
 
       # last incomplete line
-      parts.append(self.line_vals[right_id][:right_col])
+      parts.append(self.GetLine(right_id)[:right_col])
 
     return ''.join(parts)
 
@@ -148,19 +236,21 @@ class Arena(object):
   def AddLineSpan(self, line_id, col, length):
     # type: (int, int, int) -> int
     """Save a line_span and return a new span ID for later retrieval."""
-    span_id = len(self.spans)  # spids are just array indices
-    span = line_span(line_id, col, length)
-    self.spans.append(span)
+    span_id = len(self.span_line_ids)  # spids are just array indices
+    self.span_line_ids.append(line_id)
+    self.span_cols.append(col)
+    self.span_lengths.append(length)
     return span_id
 
   def GetLineSpan(self, span_id):
     # type: (int) -> line_span
     assert span_id != runtime.NO_SPID, span_id
-    assert span_id < len(self.spans), \
-      'Span ID out of range: %d is greater than %d' % (span_id, len(self.spans))
-    return self.spans[span_id]
+    assert span_id < len(self.span_line_ids), \
+      'Span ID out of range: %d is greater than %d' % (span_id, len(self.span_line_ids))
+    return line_span(self.span_line_ids[span_id], self.span_cols[span_id],
+                     self.span_lengths[span_id])
 
   def LastSpanId(self):
     # type: () -> int
     """Return one past the last span ID."""
-    return len(self.spans)
+    return len(self.span_line_ids)
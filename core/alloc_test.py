@@ -25,6 +25,14 @@ class AllocTest(unittest.TestCase):
 
     span_id = arena.AddLineSpan(0, 1, 2)
     self.assertEqual(0, span_id)
+    span_id = arena.AddLineSpan(1, 3, 4)
+    self.assertEqual(1, span_id)
+    self.assertEqual(2, arena.LastSpanId())
+
+    span = arena.GetLineSpan(1)
+    self.assertEqual(1, span.line_id)
+    self.assertEqual(3, span.col)
+    self.assertEqual(4, span.length)
 
     arena.PopSource()
 
@@ -0,0 +1,204 @@
+"""
+code_cache.py - Reuse the parse of code strings for eval, trap, and
+PROMPT_COMMAND.
+
+A loop that runs 'eval "$code"', or a function that sets a trap, would
+otherwise lex and parse the same string every time.
+
+Invariants:
+
+- An entry is keyed by the code string.  It also records who parsed it and
+  where, e.g. 'eval' and the span ID of its argument, so the arena lines that
+  error messages point to are the ones a fresh parse would have made.  An entry
+  from a different place is replaced.
+- Like core/parse_cache.py, we only save and reuse an entry when there are no
+  aliases, and the parse options are the same as when it was parsed.  'eval'
+  parses incrementally, so if running a command defines an alias or changes an
+  option, we parse the rest of the string from its text.
+
+The size is $OSH_CODE_CACHE_SIZE, which defaults to 100 entries.  0 disables
+it.
+"""
+from __future__ import print_function
+
+from _devbuild.gen.runtime_asdl import value_e, value__Str
+from core import alloc
+from core import error
+from core import main_loop
+from core import util
+from core.pyerror import e_die
+from frontend import reader
+from mycpp import mylib
+
+from typing import cast, Dict, List, Optional, TYPE_CHECKING
+if TYPE_CHECKING:
+  from _devbuild.gen.syntax_asdl import command_t, source_t
+  from core.state import Mem
+  from core.ui import ErrorFormatter
+  from frontend.parse_lib import ParseContext
+  from osh.cmd_eval import CommandEvaluator
+
+
+_DEFAULT_SIZE = 100
+
+
+def CanParseAhead(parse_ctx, parse_options):
+  # type: (ParseContext, str) -> bool
+  """Would parsing now give the same result as with these options?"""
+  return (len(parse_ctx.aliases) == 0 and
+          parse_ctx.ParseOptionString() == parse_options)
+
+
+class _Entry(object):
+
+  def __init__(self, who, spid, parse_options, nodes, num_lines):
+    # type: (str, int, str, List[command_t], List[int]) -> None
+    self.who = who
+    self.spid = spid
+    self.parse_options = parse_options
+    self.nodes = nodes
+    self.num_lines = num_lines  # lines consumed after parsing each node
+
+
+class CodeCache(object):
+  """An LRU cache from code strings to the commands parsed from them."""
+
+  def __init__(self, parse_ctx, mem):
+    # type: (ParseContext, Mem) -> None
+    self.parse_ctx = parse_ctx
+    self.arena = parse_ctx.arena
+    self.mem = mem
+
+    self.entries = {}  # type: Dict[str, _Entry]
+    self.lru = util.LruKeys()
+
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def _MaxSize(self):
+    # type: () -> int
+    val = self.mem.GetValue('OSH_CODE_CACHE_SIZE')
+    if val.tag_() != value_e.Str:
+      return _DEFAULT_SIZE
+    s = cast(value__Str, val).s
+    try:
+      max_size = int(s)
+    except ValueError:
+      e_die('$OSH_CODE_CACHE_SIZE should be an integer, got %r', s)
+    return max_size
+
+  def _Get(self, code_str, who, spid):
+    # type: (str, str, int) -> Optional[_Entry]
+    entry = self.entries.get(code_str)
+    if (entry is None or entry.who != who or entry.spid != spid or
+        not CanParseAhead(self.parse_ctx, entry.parse_options)):
+      self.misses += 1
+      return None
+
+    self.hits += 1
+    self.lru.Touch(code_str)
+    return entry
+
+  def _Put(self, code_str, entry):
+    # type: (str, _Entry) -> None
+    max_size = self._MaxSize()
+    if max_size <= 0:
+      return
+
+    while len(self.entries) >= max_size:
+      mylib.dict_erase(self.entries, self.lru.PopOldest())
+      self.evictions += 1
+
+    self.lru.Touch(code_str)
+    self.entries[code_str] = entry
+
+  def Parse(self, code_str, who, src, spid):
+    # type: (str, str, source_t, int) -> command_t
+    """Like main_loop.ParseWholeFile() on the string.
+
+    Used for trap handlers and PROMPT_COMMAND, which are parsed before they're
+    run.  Raises error.Parse.
+    """
+    entry = self._Get(code_str, who, spid)
+    if entry is not None:
+      return entry.nodes[0]
+
+    parse_options = self.parse_ctx.ParseOptionString()
+
+    line_reader = reader.StringLineReader(code_str, self.arena)
+    c_parser = self.parse_ctx.MakeOshParser(line_reader)
+    with alloc.ctx_Location(self.arena, src):
+      node = main_loop.ParseWholeFile(c_parser)  # can raise error.Parse
+
+    if len(self.parse_ctx.aliases) == 0:
+      self._Put(code_str, _Entry(who, spid, parse_options, [node], []))
+    return node
+
+  def Batch(self, code_str, who, src, spid, cmd_ev, errfmt, cmd_flags):
+    # type: (str, str, source_t, int, CommandEvaluator, ErrorFormatter, int) -> int
+    """Like main_loop.Batch() on the string.  Used for eval."""
+    with alloc.ctx_Location(self.arena, src):
+      entry = self._Get(code_str, who, spid)
+      if entry is None:
+        return self._Record(code_str, who, spid, cmd_ev, errfmt, cmd_flags)
+      else:
+        return self._Replay(entry, code_str, cmd_ev, errfmt, cmd_flags)
+
+  def _Record(self, code_str, who, spid, cmd_ev, errfmt, cmd_flags):
+    # type: (str, str, int, CommandEvaluator, ErrorFormatter, int) -> int
+    """The same loop as main_loop.Batch(), saving what was parsed."""
+    parse_options = self.parse_ctx.ParseOptionString()
+    can_cache = True
+    nodes = []  # type: List[command_t]
+    num_lines = []  # type: List[int]
+
+    line_reader = reader.StringLineReader(code_str, self.arena)
+    c_parser = self.parse_ctx.MakeOshParser(line_reader)
+
+    status = 0
+    while True:
+      if can_cache and not CanParseAhead(self.parse_ctx, parse_options):
+        can_cache = False
+
+      try:
+        node = c_parser.ParseLogicalLine()  # can raise ParseError
+        if node is None:  # EOF
+          c_parser.CheckForPendingHereDocs()  # can raise ParseError
+          break
+      except error.Parse as e:
+        errfmt.PrettyPrintError(e)
+        return 2
+
+      if can_cache:
+        nodes.append(node)
+        num_lines.append(line_reader.line_num - 1)
+
+      is_return, is_fatal = cmd_ev.ExecuteAndCatch(node, cmd_flags=cmd_flags)
+      status = cmd_ev.LastStatus()
+      if is_return or is_fatal:
+        # We didn't parse the rest of the string
+        return status
+
+    if can_cache:
+      self._Put(code_str, _Entry(who, spid, parse_options, nodes, num_lines))
+    return status
+
+  def _Replay(self, entry, code_str, cmd_ev, errfmt, cmd_flags):
+    # type: (_Entry, str, CommandEvaluator, ErrorFormatter, int) -> int
+    """Execute cached commands."""
+    status = 0
+    for i, node in enumerate(entry.nodes):
+      if i != 0 and not CanParseAhead(self.parse_ctx, entry.parse_options):
+        # e.g. an alias was defined.  Parse the rest like eval would.
+        line_reader = reader.StringLineReader(code_str, self.arena)
+        line_reader.SkipLines(entry.num_lines[i - 1])
+        c_parser = self.parse_ctx.MakeOshParser(line_reader)
+        return main_loop.Batch(cmd_ev, c_parser, errfmt, cmd_flags=cmd_flags)
+
+      is_return, is_fatal = cmd_ev.ExecuteAndCatch(node, cmd_flags=cmd_flags)
+      status = cmd_ev.LastStatus()
+      if is_return or is_fatal:
+        break
+
+    return status
@@ -523,83 +523,134 @@ class VariablesAction(CompletionAction):
       yield var_name
 
 
+def _LowerBound(words, prefix):
+  # type: (List[str], str) -> int
+  """Returns the index of the first word >= prefix, in a sorted list."""
+  lo = 0
+  hi = len(words)
+  while lo < hi:
+    mid = (lo + hi) // 2
+    if words[mid] < prefix:
+      lo = mid + 1
+    else:
+      hi = mid
+  return lo
+
+
+class ExecutableIndex(object):
+  """A sorted list of executables for each dir in $PATH.
+
+  Shared by all 'compgen -A command' actions, so it persists across TABs.
+  Each dir's entry is valid as long as the dir's mtime is unchanged, which
+  costs one stat() per dir.  Completing a prefix is a binary search, not a
+  scan over every executable.
+  """
+
+  def __init__(self):
+    # type: () -> None
+    self.mtimes = {}  # type: Dict[str, float]
+    self.names = {}  # type: Dict[str, List[str]]
+
+  def _ListDir(self, d):
+    # type: (str) -> List[str]
+    try:
+      entries = posix.listdir(d)
+    except OSError as e:
+      return []
+
+    dir_exes = []  # type: List[str]
+    for name in entries:
+      path = os_path.join(d, name)
+      # access() fails if the file was deleted after listing, which is fine
+      if posix.access(path, X_OK):
+        dir_exes.append(name)  # append the name, not the path
+    dir_exes.sort()
+    return dir_exes
+
+  def Update(self, path_dirs):
+    # type: (List[str]) -> None
+    """Make the index consistent with the dirs, and evict stale entries."""
+    mtimes = {}  # type: Dict[str, float]
+    names = {}  # type: Dict[str, List[str]]
+
+    for d in path_dirs:
+      if d in mtimes:  # duplicate in $PATH
+        continue
+      # There could be a directory that doesn't exist in the $PATH.
+      mtime = path_stat.mtime(d)
+      if mtime == -1:
+        continue
+
+      dir_exes = self.names.get(d)
+      if dir_exes is None or self.mtimes[d] != mtime:
+        dir_exes = self._ListDir(d)
+
+      mtimes[d] = mtime
+      names[d] = dir_exes
+
+    # Dirs that are no longer in $PATH are dropped
+    self.mtimes = mtimes
+    self.names = names
+
+  def Matches(self, path_dirs, prefix):
+    # type: (List[str], str) -> Iterator[str]
+    """Yield executables starting with prefix, in $PATH order."""
+    self.Update(path_dirs)
+
+    for d in path_dirs:
+      dir_exes = self.names.get(d)
+      if dir_exes is None:
+        continue
+      i = _LowerBound(dir_exes, prefix)
+      n = len(dir_exes)
+      while i < n and dir_exes[i].startswith(prefix):
+        yield dir_exes[i]
+        i += 1
+
+
+def _PathDirs(mem):
+  # type: (Mem) -> List[str]
+  val = mem.GetValue('PATH')
+  if val.tag_() != value_e.Str:
+    # No matches if not a string
+    return []
+  assert isinstance(val, value__Str)  # for MyPy
+  return val.s.split(':')
+
+
+def PrewarmExecutableIndex(mem, exe_index):
+  # type: (Mem, ExecutableIndex) -> None
+  """For shopt -s prewarm_completion.
+
+  Build the index at interactive startup, so the first TAB is fast.
+  """
+  exe_index.Update(_PathDirs(mem))
+
+
 class ExternalCommandAction(CompletionAction):
   """Complete commands in $PATH.
 
   This is PART of compgen -A command.
   """
-  def __init__(self, mem):
-    # type: (Mem) -> None
+  def __init__(self, mem, exe_index):
+    # type: (Mem, ExecutableIndex) -> None
     """
     Args:
       mem: for looking up Path
+      exe_index: shared cache of the executables in each dir
     """
     self.mem = mem
-    # Should we list everything executable in $PATH here?  And then whenever
-    # $PATH is changed, regenerated it?
-    # Or we can cache directory listings?  What if the contents of the dir
-    # changed?
-    # Can we look at the dir timestamp?
-    #
-    # (dir, timestamp) -> list of entries perhaps?  And then every time you hit
-    # tab, do you have to check the timestamp?  It should be cached by the
-    # kernel, so yes.
-    self.ext = []
-
-    # (dir, timestamp) -> list
-    # NOTE: This cache assumes that listing a directory is slower than statting
-    # it to get the mtime.  That may not be true on all systems?  Either way
-    # you are reading blocks of metadata.  But I guess /bin on many systems is
-    # huge, and will require lots of sys calls.
-    self.cache = {}
+    self.exe_index = exe_index
 
   def Matches(self, comp):
     # type: (Api) -> Iterator[str]
-    """
-    TODO: Cache is never cleared.
-
-    - When we get a newer timestamp, we should clear the old one.
-    - When PATH is changed, we can remove old entries.
-    """
-    val = self.mem.GetValue('PATH')
-    if val.tag_() != value_e.Str:
-      # No matches if not a string
-      return
-    assert isinstance(val, value__Str)  # for MyPy
-
-    path_dirs = val.s.split(':')
+    path_dirs = _PathDirs(self.mem)
     #log('path: %s', path_dirs)
 
-    executables = []  # type: List[str]
-    for d in path_dirs:
-      try:
-        st = posix.stat(d)
-      except OSError as e:
-        # There could be a directory that doesn't exist in the $PATH.
-        continue
-      key = (d, st.st_mtime)
-
-      dir_exes = self.cache.get(key)
-      if dir_exes is None:
-        entries = posix.listdir(d)
-        dir_exes = []
-        for name in entries:
-          path = os_path.join(d, name)
-          # TODO: Handle exception if file gets deleted in between listing and
-          # check?
-          if not posix.access(path, X_OK):
-            continue
-          dir_exes.append(name)  # append the name, not the path
-
-        self.cache[key] = dir_exes
-
-      executables.extend(dir_exes)
-
     # TODO: Shouldn't do the prefix / space thing ourselves.  readline does
     # that at the END of the line.
-    for word in executables:
-      if word.startswith(comp.to_complete):
-        yield word
+    for word in self.exe_index.Matches(path_dirs, comp.to_complete):
+      yield word
 
 
 class _Predicate(object):
@@ -11,8 +11,10 @@ completion_test.py: Tests for completion.py
 from __future__ import print_function
 
 import os
-import unittest
+import shutil
 import sys
+import tempfile
+import unittest
 
 from _devbuild.gen.option_asdl import option_i
 from _devbuild.gen.runtime_asdl import value_e, Proc
@@ -128,12 +130,42 @@ class CompletionTest(unittest.TestCase):
     parse_opts, exec_opts, mutable_opts = state.MakeOpts(mem, None)
     mem.exec_opts = exec_opts
 
-    a = completion.ExternalCommandAction(mem)
+    a = completion.ExternalCommandAction(mem, completion.ExecutableIndex())
     comp = self._CompApi([], 0, 'f')
     print(list(a.Matches(comp)))
 
-    # TODO: This should set up the file system and $PATH and assert that only
-    # executable files are accessed!
+  def testExecutableIndex(self):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      for name in ['foo', 'food', 'bar', 'notexec']:
+        path = os.path.join(tmp_dir, name)
+        with open(path, 'w') as f:
+          f.write('')
+        if name != 'notexec':
+          os.chmod(path, 0o755)
+
+      index = completion.ExecutableIndex()
+      path_dirs = [tmp_dir, '/nonexistent']
+      self.assertEqual(['foo', 'food'], list(index.Matches(path_dirs, 'fo')))
+      self.assertEqual(['bar', 'foo', 'food'],
+                       list(index.Matches(path_dirs, '')))
+      self.assertEqual([], list(index.Matches(path_dirs, 'not')))
+
+      # A new file changes the mtime of the dir, which invalidates its entry.
+      # Set it explicitly so the test doesn't depend on timestamp resolution.
+      path = os.path.join(tmp_dir, 'fox')
+      with open(path, 'w') as f:
+        f.write('')
+      os.chmod(path, 0o755)
+      os.utime(tmp_dir, (0, 0))
+      self.assertEqual(['foo', 'food', 'fox'],
+                       list(index.Matches(path_dirs, 'fo')))
+
+      # Dirs removed from $PATH are evicted
+      index.Update([])
+      self.assertEqual({}, index.names)
+    finally:
+      shutil.rmtree(tmp_dir)
 
   def testFileSystemAction(self):
     CASES = [
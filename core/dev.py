@@ -14,6 +14,7 @@ from _devbuild.gen.syntax_asdl import assign_op_e
 from asdl import runtime
 from core import error
 from core import optview
+from core import pyos
 from core import state
 from core import ui
 from qsn_ import qsn
@@ -26,6 +27,7 @@ from mycpp.mylib import tagswitch, iteritems
 import yajl
 
 import posix_ as posix
+from posix_ import O_CREAT, O_TRUNC, O_WRONLY
 
 from typing import List, Dict, Optional, Any, cast, TYPE_CHECKING
 if TYPE_CHECKING:
@@ -182,6 +184,207 @@ class ctx_Tracer(object):
     self.tracer.PopMessage(self.label, self.arg)
 
 
+class _PerfCounter(object):
+  """Totals for one builtin, proc, or external binary."""
+
+  def __init__(self, kind, name):
+    # type: (str, str) -> None
+    self.kind = kind  # builtin, proc, or external
+    self.name = name
+    self.count = 0
+    self.wall_time = 0.0  # seconds, including nested commands
+    self.cpu_time = 0.0  # seconds used by children reaped meanwhile
+
+
+def _SortByWallTime(counters):
+  # type: (List[_PerfCounter]) -> None
+  """Sort in place, slowest first.  There are few enough to insertion sort."""
+  for i in xrange(1, len(counters)):
+    c = counters[i]
+    j = i - 1
+    while j >= 0 and counters[j].wall_time < c.wall_time:
+      counters[j + 1] = counters[j]
+      j -= 1
+    counters[j + 1] = c
+
+
+def _Micros(seconds):
+  # type: (float) -> int
+  return int(seconds * 1000000)
+
+
+class PerfCounters(object):
+  """Accumulates timings for shopt -s perf_counters, and reports them at exit.
+
+  Wall time is inclusive: a proc's time includes the commands it runs.  CPU
+  time comes from the rusage that wait4() returns for each child, so it's
+  nonzero only for commands that wait on processes.
+
+  The report goes to stderr, unless $OSH_PERF_COUNTERS_JSON names a file to
+  write JSON to.
+  """
+
+  def __init__(self, exec_opts, json_path, f):
+    # type: (optview.Exec, str, _DebugFile) -> None
+    self.exec_opts = exec_opts
+    self.json_path = json_path
+    self.f = f
+    self.counters = {}  # type: Dict[str, _PerfCounter]
+
+  def Add(self, kind, name, wall_time, cpu_time):
+    # type: (str, str, float, float) -> None
+    key = '%s %s' % (kind, name)
+    c = self.counters.get(key)
+    if c is None:
+      c = _PerfCounter(kind, name)
+      self.counters[key] = c
+    c.count += 1
+    c.wall_time += wall_time
+    c.cpu_time += cpu_time
+
+  def _Sorted(self):
+    # type: () -> List[_PerfCounter]
+    result = []  # type: List[_PerfCounter]
+    for _, c in iteritems(self.counters):
+      result.append(c)
+    _SortByWallTime(result)
+    return result
+
+  def MaybeDump(self):
+    # type: () -> None
+    """Called when the main shell exits."""
+    if len(self.counters) == 0:
+      return
+    counters = self._Sorted()
+
+    if len(self.json_path):
+      if mylib.PYTHON:  # can't translate due to open()
+        d = [
+            {
+              'kind': c.kind,
+              'name': c.name,
+              'count': c.count,
+              'wall_us': _Micros(c.wall_time),
+              'cpu_us': _Micros(c.cpu_time),
+            }
+            for c in counters
+        ]
+        with open(self.json_path, 'w') as f:
+          print(yajl.dumps(d, indent=2), file=f)
+      return
+
+    self.f.write('%-8s %8s %12s %12s  %s\n' %
+                 ('kind', 'count', 'wall_us', 'cpu_us', 'name'))
+    for c in counters:
+      self.f.write('%-8s %8d %12d %12d  %s\n' %
+                   (c.kind, c.count, _Micros(c.wall_time),
+                    _Micros(c.cpu_time), c.name))
+
+
+class ctx_PerfCounter(object):
+  """Times a builtin, proc, or external command for PerfCounters."""
+
+  def __init__(self, perf, kind, name):
+    # type: (PerfCounters, str, str) -> None
+    self.perf = perf
+    self.kind = kind
+    self.name = name
+    self.enabled = perf.exec_opts.perf_counters()
+    self.start_time = 0.0
+    self.start_cpu = 0.0
+    if self.enabled:
+      self.start_time = pyos.WallTime()
+      self.start_cpu = pyos.ChildCpuTime()
+
+  def __enter__(self):
+    # type: () -> None
+    pass
+
+  def __exit__(self, type, value, traceback):
+    # type: (Any, Any, Any) -> None
+    if self.enabled:
+      self.perf.Add(self.kind, self.name, pyos.WallTime() - self.start_time,
+                    pyos.ChildCpuTime() - self.start_cpu)
+
+
+# Sample every millisecond of the shell's CPU time
+SAMPLE_INTERVAL_US = 1000
+
+
+class Sampler(object):
+  """A sampling profiler for shell code, enabled with $OSH_SAMPLE_PROFILE.
+
+  SIGPROF fires after each interval of CPU time the shell uses, and the
+  signal handler only queues it.  At the next safe point, TrapState calls
+  Sample(), which records the stack of procs and sourced files, and the
+  file:line of the current command.
+
+  At exit, the counts are written as folded stacks, which flamegraph.pl reads:
+
+      main;myproc;lib.sh:12 42
+
+  The 'main' frame is there when the shell runs a script, like ${FUNCNAME[@]}
+  in bash.  With -c and no arguments, it isn't:
+
+      myproc;[ -c flag ]:1 42
+
+  Time spent waiting for external commands isn't sampled, because it's not
+  the shell's CPU time.  Use shopt -s perf_counters for that.
+  """
+
+  def __init__(self, mem, arena, path):
+    # type: (Mem, alloc.Arena, str) -> None
+    self.mem = mem
+    self.arena = arena
+    self.path = path
+    self.counts = {}  # type: Dict[str, int]
+
+  def _CurrentStack(self):
+    # type: () -> str
+    parts = []  # type: List[str]
+    for frame in self.mem.debug_stack:
+      if frame.func_name is not None:
+        parts.append(frame.func_name)
+      elif frame.source_name is not None:
+        parts.append(frame.source_name)
+      # Temp frames are ignored
+
+    span_id = self.mem.CurrentSpanId()
+    if span_id == runtime.NO_SPID:
+      parts.append('?')
+    else:
+      line_id = self.arena.GetLineSpan(span_id).line_id
+      parts.append('%s:%d' % (ui.GetLineSourceString(self.arena, line_id),
+                              self.arena.GetLineNumber(line_id)))
+
+    return ';'.join(parts)
+
+  def Sample(self):
+    # type: () -> None
+    stack = self._CurrentStack()
+    self.counts[stack] = self.counts.get(stack, 0) + 1
+
+  def MaybeDump(self):
+    # type: () -> None
+    """Called when the main shell exits."""
+    if len(self.path) == 0:
+      return
+    pyos.StopProfiling()
+
+    lines = []  # type: List[str]
+    for stack in sorted(self.counts):
+      lines.append('%s %d\n' % (stack, self.counts[stack]))
+
+    try:
+      fd = posix.open(self.path, O_WRONLY | O_CREAT | O_TRUNC, 0o666)
+    except OSError as e:
+      log("osh: Couldn't write profile to %r: %s", self.path,
+          posix.strerror(e.errno))
+      return
+    posix.write(fd, ''.join(lines))
+    posix.close(fd)
+
+
 def _PrintShValue(val, buf):
   # type: (value_t, mylib.BufWriter) -> None
   """Using maybe_shell_encode() for legacy xtrace_details."""
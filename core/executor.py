@@ -4,15 +4,20 @@ executor.py
 from __future__ import print_function
 
 from errno import EINTR
-import sys
+from signal import SIGPIPE
 
 #from _devbuild.gen.option_asdl import builtin_i
 from _devbuild.gen.id_kind_asdl import Id
 from _devbuild.gen.option_asdl import builtin_i
-from _devbuild.gen.runtime_asdl import redirect, trace
+from _devbuild.gen.runtime_asdl import (
+    redirect, redirect_arg__Path, trace, value_e, value__Str
+)
 from _devbuild.gen.syntax_asdl import (
     command_e, command__Simple, command__Pipeline, command__ControlFlow,
-    command_sub, compound_word, Token,
+    command_sub, redir, word_e, word_t, compound_word, word_part_e,
+    word_part_t, word_part__BracedTuple, double_quoted, simple_var_sub,
+    braced_var_sub, bracket_op_e, suffix_op_e, suffix_op__Unary,
+    suffix_op__PatSub,
 )
 from asdl import runtime
 from core import dev
@@ -20,6 +25,7 @@ from core import error
 from core import process
 from core.pyerror import e_die, e_die_status, log
 from core import pyos
+from core import pyutil
 from core import ui
 from core import vm
 from frontend import consts
@@ -27,8 +33,9 @@ from frontend import location
 from osh import word_
 
 import posix_ as posix
+from posix_ import O_RDONLY
 
-from typing import cast, Dict, List, TYPE_CHECKING
+from typing import cast, Dict, List, Optional, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.runtime_asdl import (
       cmd_value__Argv, CommandStatus, StatusArray, Proc
@@ -40,6 +47,123 @@ if TYPE_CHECKING:
 
 _ = log
 
+# Command sub output is read in blocks that grow from the min to the max size,
+# so small outputs don't allocate big strings.  A Linux pipe holds 64 KiB, so
+# bigger reads don't help.
+_CSUB_MIN_BLOCK_SIZE = 4096
+_CSUB_MAX_BLOCK_SIZE = 64 * 1024
+
+# The default size of a Linux pipe buffer
+_PIPE_CAPACITY = 64 * 1024
+
+
+def _StripTrailingNewlines(chunks):
+  # type: (List[str]) -> None
+  """Like ''.join(chunks).rstrip('\n'), but only touches the last chunks."""
+  while len(chunks):
+    last = chunks[-1].rstrip('\n')
+    if len(last):
+      chunks[-1] = last
+      return
+    chunks.pop()  # it was all newlines
+
+
+def _CommandSubTooBig(max_bytes, cs_part):
+  # type: (int, command_sub) -> None
+  e_die('Command sub output exceeded $OSH_CSUB_MAX_BYTES (%d)', max_bytes,
+        span_id=cs_part.left_token.span_id)
+
+
+_FLUSH_BEFORE_BUILTINS = [
+    builtin_i.read, builtin_i.mapfile, builtin_i.readarray, builtin_i.wait,
+    builtin_i.fg, builtin_i.bg,
+]
+
+
+# Builtins that can run in this process when they're at the front of a
+# pipeline.  They don't read stdin or change shell state.  'printf -v' does, so
+# we check its args separately.
+_IN_PROCESS_BUILTINS = ['echo', 'printf', 'true', 'false', ':']
+
+
+def _PartHasNoEffects(UP_part):
+  # type: (word_part_t) -> bool
+  """Can evaluating this part only read shell state?
+
+  Command subs are OK because they run in another process.
+  """
+  tag = UP_part.tag_()
+  if tag in (word_part_e.Literal, word_part_e.EscapedLiteral,
+             word_part_e.SingleQuoted, word_part_e.TildeSub,
+             word_part_e.BracedRange):
+    return True
+
+  if tag == word_part_e.DoubleQuoted:
+    dq = cast(double_quoted, UP_part)
+    for p in dq.parts:
+      if not _PartHasNoEffects(p):
+        return False
+    return True
+
+  if tag == word_part_e.BracedTuple:
+    bt = cast(word_part__BracedTuple, UP_part)
+    for w in bt.words:
+      if not _WordHasNoEffects(w):
+        return False
+    return True
+
+  if tag == word_part_e.CommandSub:
+    cs = cast(command_sub, UP_part)
+    # Process subs like <(echo hi) set $_process_sub_status
+    return cs.left_token.id in (Id.Left_DollarParen, Id.Left_Backtick)
+
+  if tag == word_part_e.SimpleVarSub:
+    tok = cast(simple_var_sub, UP_part).token
+    return tok.val != '$BASHPID'
+
+  if tag == word_part_e.BracedVarSub:
+    bvs = cast(braced_var_sub, UP_part)
+    if bvs.token.val == 'BASHPID':
+      return False
+    # a[i++] can assign
+    if (bvs.bracket_op is not None and
+        bvs.bracket_op.tag_() != bracket_op_e.WholeArray):
+      return False
+
+    op = bvs.suffix_op
+    if op is None:
+      return True
+    op_tag = op.tag_()
+    if op_tag == suffix_op_e.Nullary:
+      return True
+    if op_tag == suffix_op_e.Unary:
+      unary = cast(suffix_op__Unary, op)
+      if unary.tok.id in (Id.VTest_Equals, Id.VTest_ColonEquals):
+        return False  # ${x=default} assigns
+      return _WordHasNoEffects(unary.arg_word)
+    if op_tag == suffix_op_e.PatSub:
+      pat_sub = cast(suffix_op__PatSub, op)
+      if not _WordHasNoEffects(pat_sub.pat):
+        return False
+      return pat_sub.replace is None or _WordHasNoEffects(pat_sub.replace)
+    return False  # e.g. slices, which are arithmetic
+
+  # ArithSub, ExtGlob, and Oil parts
+  return False
+
+
+def _WordHasNoEffects(UP_w):
+  # type: (word_t) -> bool
+  if UP_w.tag_() == word_e.Empty:
+    return True
+  if UP_w.tag_() != word_e.Compound:
+    return False
+  w = cast(compound_word, UP_w)
+  for p in w.parts:
+    if not _PartHasNoEffects(p):
+      return False
+  return True
+
 
 class _ProcessSubFrame(object):
   def __init__(self):
@@ -65,6 +189,7 @@ class ShellExecutor(vm._Executor):
       ext_prog,  # type: process.ExternalProgram
       waiter,  # type: process.Waiter
       tracer,  # type: dev.Tracer
+      perf,  # type: dev.PerfCounters
       job_state,  # type: process.JobState
       fd_state,  # type: process.FdState
       errfmt  # type: ui.ErrorFormatter
@@ -81,6 +206,7 @@ class ShellExecutor(vm._Executor):
     self.ext_prog = ext_prog
     self.waiter = waiter
     self.tracer = tracer
+    self.perf = perf
     # sleep 5 & puts a (PID, job#) entry here.  And then "jobs" displays it.
     self.job_state = job_state
     self.fd_state = fd_state
@@ -124,10 +250,27 @@ class ShellExecutor(vm._Executor):
   def RunBuiltin(self, builtin_id, cmd_val):
     # type: (int, cmd_value__Argv) -> int
     """Run a builtin.  Also called by the 'builtin' builtin."""
+    # Check the option here, so the common case doesn't pay for a
+    # ctx_PerfCounter per builtin.
+    if self.exec_opts.perf_counters():
+      with dev.ctx_PerfCounter(self.perf, 'builtin', cmd_val.argv[0]):
+        return self._RunBuiltin(builtin_id, cmd_val)
+    return self._RunBuiltin(builtin_id, cmd_val)
+
+  def _RunBuiltin(self, builtin_id, cmd_val):
+    # type: (int, cmd_value__Argv) -> int
     self.tracer.OnBuiltin(builtin_id, cmd_val.argv)
 
     builtin_func = self.builtins[builtin_id]
 
+    # Output of echo, printf, etc. can stay in the buffer, so a loop that
+    # prints many lines makes fewer write() calls.  It's flushed before the
+    # shell forks, execs, exits, or changes descriptors, and before builtins
+    # that wait, e.g. so a prompt is shown before 'read'.
+    buffered = self.fd_state.CanBufferStdout()
+    if builtin_id in _FLUSH_BEFORE_BUILTINS:
+      process.FlushStdout()
+
     # note: could be second word, like 'builtin read'
     with ui.ctx_Location(self.errfmt, cmd_val.arg_spids[0]):
       try:
@@ -143,12 +286,12 @@ class ShellExecutor(vm._Executor):
         self.errfmt.PrefixPrint(e.msg, prefix='%r ' % arg0, span_id=e.span_id)
         status = 2  # consistent error code for usage error
       finally:
-        # Flush stdout after running ANY builtin.  This is very important!
-        # Silence errors like we did from 'echo'.
-        try:
-          sys.stdout.flush()
-        except IOError as e:
-          pass
+        # Flush stdout after running ANY builtin, unless it can be buffered.
+        # This is very important!
+        if buffered:
+          self.fd_state.stdout_pending = True
+        else:
+          process.FlushStdout()
 
     return status
 
@@ -209,8 +352,9 @@ class ShellExecutor(vm._Executor):
                   span_id=arg0_spid)
 
         with dev.ctx_Tracer(self.tracer, 'proc', argv):
-          # NOTE: Functions could call 'exit 42' directly, etc.
-          status = self.cmd_ev.RunProc(proc_node, argv[1:], arg0_spid)
+          with dev.ctx_PerfCounter(self.perf, 'proc', arg0):
+            # NOTE: Functions could call 'exit 42' directly, etc.
+            status = self.cmd_ev.RunProc(proc_node, argv[1:], arg0_spid)
         return status
 
     # Notes:
@@ -252,10 +396,13 @@ class ShellExecutor(vm._Executor):
       return 127
 
     # Normal case: ls /
-    if do_fork:
+    # With perf_counters, don't exec the last command, so the shell is still
+    # there to report at exit.
+    if do_fork or self.exec_opts.perf_counters():
       thunk = process.ExternalThunk(self.ext_prog, argv0_path, cmd_val, environ)
       p = process.Process(thunk, self.job_state, self.tracer)
-      status = p.RunWait(self.waiter, trace.External(cmd_val.argv))
+      with dev.ctx_PerfCounter(self.perf, 'external', argv0_path):
+        status = p.RunWait(self.waiter, trace.External(cmd_val.argv))
 
       # this is close to a "leaf" for errors
       # problem: permission denied EACCESS prints duplicate messages
@@ -311,14 +458,122 @@ class ShellExecutor(vm._Executor):
       self.job_state.AddJob(p)  # show in 'jobs' list
     return 0
 
+  def _CanRunInProcess(self, node):
+    # type: (command_t) -> bool
+    """Can this part of a pipeline run in this process, before the last part?
+
+    Only if it's a builtin like 'echo' that has no effect other than writing
+    to stdout.  Functions could change variables, so they still run in a
+    subshell, as in bash.
+    """
+    if node.tag_() != command_e.Simple:
+      return False
+    simple = cast(command__Simple, node)
+    if (len(simple.redirects) or len(simple.more_env) or
+        simple.typed_args is not None or simple.block is not None):
+      return False
+    if len(simple.words) == 0:
+      return False
+
+    ok, arg0, _ = word_.StaticEval(simple.words[0])
+    if not ok or arg0 not in _IN_PROCESS_BUILTINS or arg0 in self.procs:
+      return False
+
+    if arg0 == 'printf':
+      # Rule out printf -v, which assigns
+      if len(simple.words) < 2:
+        return False
+      ok, fmt, _ = word_.StaticEval(simple.words[1])
+      if not ok or fmt.startswith('-'):
+        return False
+
+    for w in simple.words:
+      if not _WordHasNoEffects(w):
+        return False
+    return True
+
+  def _RunPipelineInProcess(self, node, status_out):
+    # type: (command__Pipeline, CommandStatus) -> bool
+    """Run a pipeline like 'echo "$x" | read y' without forking.
+
+    The first n-1 parts are builtins that only write to stdout, so we run them
+    one after another, with output going to an unlinked temp file instead of a
+    pipe.  Unlike a pipe, it can't fill up.  The last part runs in this process
+    reading the file, like it would for 'lastpipe'.
+
+    Returns False if the temp file couldn't be created, so the caller should
+    fork.
+    """
+    tmp_dir = self.mem.GetValue('TMPDIR')
+    if tmp_dir.tag_() == value_e.Str:
+      dir_name = cast(value__Str, tmp_dir).s
+    else:
+      dir_name = '/tmp'
+    r, w = pyos.TempFilePipe(dir_name)
+    if r == -1:
+      return False
+
+    n = len(node.children)
+    pipe_status = []  # type: List[int]
+    for i in xrange(n):
+      status_out.pipe_spids.append(location.SpanForCommand(node.children[i]))
+
+    # The parts are run with the $? the pipeline started with, like in
+    # subshells
+    last_status = self.mem.LastStatus()
+
+    # Nothing reads the output of all but the part before the last one, so
+    # throw it away.
+    null_fd = -1
+    if n > 2:
+      null_fd = posix.open('/dev/null', posix.O_WRONLY, 0)
+
+    for i in xrange(n - 1):
+      out_fd = w if i == n - 2 else null_fd
+      with process.ctx_StdoutToFile(self.fd_state, out_fd):
+        self.cmd_ev.ExecuteAndCatch(node.children[i])
+      pipe_status.append(self.mem.LastStatus())
+      self.mem.SetLastStatus(last_status)
+
+    if null_fd != -1:
+      posix.close(null_fd)
+    posix.close(w)
+
+    with process.ctx_Pipe(self.fd_state, r):
+      self.cmd_ev.ExecuteAndCatch(node.children[n - 1])
+
+    # With a real pipe, the writer gets SIGPIPE if the reader exits with more
+    # than a pipe's worth of output unread, e.g. 'printf %99999s x | head -c 1'.
+    # The reader shares the file offset, so we can tell how much it read.
+    unread = pyos.RegularFileSize(r) - pyos.Tell(r)
+    if unread > _PIPE_CAPACITY and not self.exec_opts.sigpipe_status_ok():
+      if pipe_status[n - 2] == 0:
+        pipe_status[n - 2] = 128 + SIGPIPE
+    posix.close(r)
+
+    pipe_status.append(self.cmd_ev.LastStatus())
+    status_out.pipe_status = pipe_status
+    return True
+
   def RunPipeline(self, node, status_out):
     # type: (command__Pipeline, CommandStatus) -> None
 
+    n = len(node.children)
+    if n > 1:
+      in_process = True
+      for i in xrange(n - 1):
+        if not self._CanRunInProcess(node.children[i]):
+          in_process = False
+          break
+      if in_process:
+        with dev.ctx_Tracer(self.tracer, 'pipeline', None):
+          if self._RunPipelineInProcess(node, status_out):
+            return
+
     pi = process.Pipeline(self.exec_opts.sigpipe_status_ok())
     self.job_state.AddPipeline(pi)
 
     # First n-1 processes (which is empty when n == 1)
-    n = len(node.children)
     for i in xrange(n - 1):
       child = node.children[i]
 
@@ -350,23 +605,58 @@ class ShellExecutor(vm._Executor):
             span_id=word_.LeftMostSpanForPart(cs_part))
 
     node = cs_part.child
+    max_bytes = self._MaxCommandSubBytes()
+    chunks = []  # type: List[str]
 
-    # Hack for weird $(<file) construct
+    # The weird $(< file) construct is read in this process, without forking.
+    # (issue 1013)
+    file_redir = None  # type: Optional[redir]
     if node.tag_() == command_e.Simple:
       simple = cast(command__Simple, node)
       # Detect '< file'
       if (len(simple.words) == 0 and
           len(simple.redirects) == 1 and
           simple.redirects[0].op.id == Id.Redir_Less):
-        # change it to __cat < file
-        # note: cmd_eval.py _Dispatch works around lack of spid
-        # TODO: change to 'internal cat' (issue 1013)
-        tok = Token(Id.Lit_Chars, runtime.NO_SPID, '__cat')
-        cat_word = compound_word([tok])
-        # MUTATE the command.Simple node.  This will only be done the first
-        # time in the parent process.
-        simple.words.append(cat_word)
+        file_redir = simple.redirects[0]
+
+    if file_redir:
+      status = self._ReadFileForCommandSub(file_redir, max_bytes, cs_part,
+                                           chunks)
+    else:
+      status = self._CaptureCommandSub(node, max_bytes, cs_part, chunks)
 
+    # OSH has the concept of aborting in the middle of a WORD.  We're not
+    # waiting until the command is over!
+    if self.exec_opts.command_sub_errexit():
+      if status != 0:
+        msg = 'Command Sub exited with status %d' % status
+        raise error.ErrExit(
+            msg, span_id=cs_part.left_token.span_id, status=status)
+
+    else:
+      # Set a flag so we check errexit at the same time as bash.  Example:
+      #
+      # a=$(false)
+      # echo foo  # no matter what comes here, the flag is reset
+      #
+      # Set ONLY until this command node has finished executing.
+
+      # HACK: move this
+      self.cmd_ev.check_command_sub_status = True
+      self.mem.SetLastStatus(status)
+
+    # Runtime errors test case: # $("echo foo > $@")
+    # Why rstrip()?
+    # https://unix.stackexchange.com/questions/17747/why-does-shell-command-substitution-gobble-up-a-trailing-newline-char
+    _StripTrailingNewlines(chunks)
+    return ''.join(chunks)
+
+  def _CaptureCommandSub(self, node, max_bytes, cs_part, chunks):
+    # type: (command_t, int, command_sub, List[str]) -> int
+    """Run the command in a child process, appending its output to chunks.
+
+    Returns the exit status.
+    """
     p = self._MakeProcess(node,
                           inherit_errexit=self.exec_opts.inherit_errexit())
 
@@ -376,10 +666,11 @@ class ShellExecutor(vm._Executor):
     p.Start(trace.CommandSub())
     #log('Command sub started %d', pid)
 
-    chunks = []  # type: List[str]
+    num_bytes = 0
+    block_size = _CSUB_MIN_BLOCK_SIZE
     posix.close(w)  # not going to write
     while True:
-      n, err_num = pyos.Read(r, 4096, chunks)
+      n, err_num = pyos.Read(r, block_size, chunks)
 
       if n < 0:
         if err_num == EINTR:
@@ -390,34 +681,100 @@ class ShellExecutor(vm._Executor):
 
       elif n == 0:  # EOF
         break
+
+      else:
+        num_bytes += n
+        if max_bytes != -1 and num_bytes > max_bytes:
+          posix.close(r)  # the writer gets SIGPIPE
+          p.Wait(self.waiter)
+          _CommandSubTooBig(max_bytes, cs_part)
+
+        if n == block_size and block_size < _CSUB_MAX_BLOCK_SIZE:
+          block_size *= 2
     posix.close(r)
 
-    status = p.Wait(self.waiter)
+    return p.Wait(self.waiter)
 
-    # OSH has the concept of aborting in the middle of a WORD.  We're not
-    # waiting until the command is over!
-    if self.exec_opts.command_sub_errexit():
-      if status != 0:
-        msg = 'Command Sub exited with status %d' % status
-        raise error.ErrExit(
-            msg, span_id=cs_part.left_token.span_id, status=status)
+  def _ReadFileForCommandSub(self, r, max_bytes, cs_part, chunks):
+    # type: (redir, int, command_sub, List[str]) -> int
+    """Implements $(< file), appending the contents to chunks.
 
+    Returns the exit status, which is 1 if the file can't be opened, like the
+    __cat < file process we used to fork.
+    """
+    try:
+      # Note: this also sets the span ID for $LINENO
+      redir_val = self.cmd_ev.EvalRedirect(r)
+    except error.RedirectEval as e:
+      self.errfmt.PrettyPrintError(e)
+      return 1
+    filename = cast(redirect_arg__Path, redir_val.arg).filename
+
+    try:
+      fd = posix.open(filename, O_RDONLY, 0)
+    except OSError as e:
+      self.errfmt.Print_(
+          "Can't open %r: %s" % (filename, pyutil.strerror(e)),
+          span_id=r.op.span_id)
+      return 1
+
+    # A regular file is read in one call, and the next one returns EOF.
+    size = pyos.RegularFileSize(fd)
+    if size == -1:
+      block_size = _CSUB_MIN_BLOCK_SIZE  # e.g. a FIFO or /dev/stdin
     else:
-      # Set a flag so we check errexit at the same time as bash.  Example:
-      #
-      # a=$(false)
-      # echo foo  # no matter what comes here, the flag is reset
-      #
-      # Set ONLY until this command node has finished executing.
+      if max_bytes != -1 and size > max_bytes:
+        posix.close(fd)
+        _CommandSubTooBig(max_bytes, cs_part)
+      block_size = size + 1
 
-      # HACK: move this
-      self.cmd_ev.check_command_sub_status = True
-      self.mem.SetLastStatus(status)
+    status = 0
+    num_bytes = 0
+    while True:
+      n, err_num = pyos.Read(fd, block_size, chunks)
 
-    # Runtime errors test case: # $("echo foo > $@")
-    # Why rstrip()?
-    # https://unix.stackexchange.com/questions/17747/why-does-shell-command-substitution-gobble-up-a-trailing-newline-char
-    return ''.join(chunks).rstrip('\n')
+      if n < 0:
+        if err_num == EINTR:
+          pass  # retry
+        else:
+          self.errfmt.Print_('osh I/O error: %s' % posix.strerror(err_num),
+                             span_id=r.op.span_id)
+          status = 2
+          break
+
+      elif n == 0:  # EOF
+        break
+
+      else:
+        num_bytes += n
+        if max_bytes != -1 and num_bytes > max_bytes:
+          posix.close(fd)
+          _CommandSubTooBig(max_bytes, cs_part)
+
+        if n == block_size and block_size < _CSUB_MAX_BLOCK_SIZE:
+          block_size *= 2
+    posix.close(fd)
+
+    return status
+
+  def _MaxCommandSubBytes(self):
+    # type: () -> int
+    """Returns the limit on command sub output, or -1 if there's none.
+
+    It's opt-in, e.g. OSH_CSUB_MAX_BYTES=$((100 << 20)) to fail instead of
+    exhausting memory on $(cat huge.log).
+    """
+    val = self.mem.GetValue('OSH_CSUB_MAX_BYTES')
+    if val.tag_() != value_e.Str:
+      return -1
+    s = cast(value__Str, val).s
+    try:
+      max_bytes = int(s)
+    except ValueError:
+      e_die('$OSH_CSUB_MAX_BYTES should be an integer, got %r', s)
+    if max_bytes < 0:
+      e_die("$OSH_CSUB_MAX_BYTES can't be negative, got %d", max_bytes)
+    return max_bytes
 
   def RunProcessSub(self, cs_part):
     # type: (command_sub) -> str
@@ -551,6 +908,10 @@ class ShellExecutor(vm._Executor):
     # type: () -> None
     self.fd_state.Pop()
 
+  def MaybeFlushStdout(self):
+    # type: () -> None
+    self.fd_state.MaybeFlushStdout()
+
   def PushProcessSub(self):
     # type: () -> None
     self.process_sub_stack.append(_ProcessSubFrame())
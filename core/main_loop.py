@@ -323,9 +323,11 @@ def Batch(cmd_ev, c_parser, errfmt, cmd_flags=0):
       status = 2
       break
 
-    # Only optimize if we're on the last line like -c "echo hi" etc.
+    # Only optimize if we're on the last line like -c "echo hi" etc.  Not
+    # with $OSH_SAMPLE_PROFILE, which is written when the shell exits.
     if (cmd_flags & cmd_eval.IsMainProgram and
-        c_parser.line_reader.LastLineHint()):
+        c_parser.line_reader.LastLineHint() and
+        cmd_ev.trap_state.sampler is None):
       cmd_flags |= cmd_eval.Optimize
 
     # can't optimize this because we haven't seen the end yet
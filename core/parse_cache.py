@@ -0,0 +1,429 @@
+"""
+parse_cache.py - Save the commands parsed from a sourced file to disk.
+
+Enabled by setting $OSH_PARSE_CACHE_DIR.  The next time the same file is
+sourced, we load the commands instead of lexing and parsing them again.
+
+It's Python-only: the commands and arena lines are serialized with pickle.
+Loading only creates syntax_asdl objects, and the cache dir and its files must
+be owned by the user and not writable by anyone else.
+
+Invariants:
+
+- A cache entry is keyed by the OSH version, the file's identity (path, device,
+  inode, size, and mtime), a hash of its contents, and the values of the parse
+  options.
+- We only save an entry if the file was sourced without aliases, and without
+  changing parse options (e.g. with shopt -s oil:all).  'source' parses
+  incrementally, so either could change how later lines are parsed.
+- When replaying an entry, if aliases or parse options change, we parse the
+  rest of the file from its text, like 'source' always does.
+"""
+from __future__ import print_function
+
+import copy_reg
+import cPickle
+import cStringIO
+import hashlib
+import os  # posix_ doesn't have rename() or fdopen()
+import stat
+
+from _devbuild.gen import syntax_asdl
+from _devbuild.gen.syntax_asdl import source__Reparsed
+from asdl import pybase
+from asdl import runtime
+from core import alloc
+from core import code_cache
+from core import error
+from core import main_loop
+from core import pyutil
+from core import state
+from pylib import os_path
+
+import posix_ as posix
+
+from typing import List, Tuple, Dict, Optional, Any, Callable, TYPE_CHECKING
+if TYPE_CHECKING:
+  from _devbuild.gen.syntax_asdl import command_t, source_t
+  from core.ui import ErrorFormatter
+  from frontend.parse_lib import ParseContext
+  from frontend.reader import FileLineReader
+  from osh.cmd_eval import CommandEvaluator
+  from osh.cmd_parse import CommandParser
+
+
+# Bump this when the layout of a cache file changes.
+_FORMAT = 2
+
+
+class _CantCache(Exception):
+  pass
+
+
+# ASDL class -> indices of fields with span IDs
+_SPID_FIELDS = {}  # type: Dict[type, List[int]]
+
+
+def _IsPrivate(st):
+  # type: (posix.stat_result) -> bool
+  """Is the file or dir ours, and not writable by others?
+
+  Otherwise another user could plant a cache entry that we'd load.
+  """
+  return st.st_uid == posix.getuid() and (st.st_mode & 0o022) == 0
+
+
+def _MakeNode(cls, args):
+  # type: (type, Tuple[Any, ...]) -> pybase.CompoundObj
+  """Unpickle an ASDL object.  Generated constructors take all fields."""
+  return cls(*args)
+
+
+def _ReduceNode(obj):
+  # type: (pybase.CompoundObj) -> Tuple[Any, ...]
+  """Pickle ASDL objects as constructor calls, not a dict of their slots."""
+  cls = type(obj)
+  return _MakeNode, (cls, tuple(getattr(obj, name) for name in cls.__slots__))
+
+
+def _RegisterPickleFunctions():
+  # type: () -> None
+  if _SPID_FIELDS:
+    return
+  for name in dir(syntax_asdl):
+    cls = getattr(syntax_asdl, name)
+    # Sum types like command_t don't have __slots__
+    if (isinstance(cls, type) and issubclass(cls, pybase.CompoundObj) and
+        getattr(cls, '__slots__', None)):
+      copy_reg.pickle(cls, _ReduceNode)
+
+      # Fields with span IDs are named like spids, span_id, or left_spid
+      _SPID_FIELDS[cls] = [
+          i for i, field_name in enumerate(cls.__slots__)
+          if 'spid' in field_name or 'span_id' in field_name
+      ]
+
+
+class _Loader(object):
+  """Unpickles ASDL objects, changing their span IDs as they're created.
+
+  Saved span IDs are relative to the first span of the file, so they have to
+  be translated both when saving and loading.  Doing it while unpickling
+  avoids another pass over the tree.
+  """
+
+  def __init__(self, remap):
+    # type: (Callable[[int], int]) -> None
+    self.remap = remap
+
+  def _MakeNode(self, cls, args):
+    # type: (type, Tuple[Any, ...]) -> pybase.CompoundObj
+    spid_fields = _SPID_FIELDS[cls]
+    if spid_fields:
+      remap = self.remap
+      arg_list = list(args)
+      for i in spid_fields:
+        val = arg_list[i]
+        if isinstance(val, list):
+          arg_list[i] = [remap(spid) for spid in val]
+        elif isinstance(val, int):
+          arg_list[i] = remap(val)
+      args = tuple(arg_list)
+    return cls(*args)
+
+  def _FindGlobal(self, module_name, name):
+    # type: (str, str) -> Any
+    """Only allow the globals that _ReduceNode() and pickling ASDL use.
+
+    A pickle can name any callable, so without this check loading a cache file
+    could run arbitrary code.
+    """
+    if module_name == __name__ and name == '_MakeNode':
+      return self._MakeNode
+    if module_name == syntax_asdl.__name__:
+      cls = getattr(syntax_asdl, name, None)
+      if (isinstance(cls, type) and
+          issubclass(cls, (pybase.Obj, pybase.SimpleObj))):
+        return cls
+    raise cPickle.UnpicklingError('%s.%s not allowed' % (module_name, name))
+
+  def Load(self, f):
+    # type: (Any) -> Any
+    unpickler = cPickle.Unpickler(f)
+    unpickler.find_global = self._FindGlobal
+    return unpickler.load()
+
+
+class _Recorder(object):
+  """Collects the arena lines and spans that parsing a file added.
+
+  'source' interleaves parsing with execution, which can add unrelated lines
+  with 'eval' and so forth.  So we remember ID ranges for each parse.
+  """
+
+  def __init__(self, arena, src):
+    # type: (alloc.Arena, source_t) -> None
+    self.arena = arena
+    self.src = src
+
+    self.line_ids = {}  # type: Dict[int, int]  # arena line_id -> ours
+    self.span_ids = {}  # type: Dict[int, int]  # arena span_id -> ours
+
+    self.lines = []  # type: List[Tuple[str, int, Optional[source_t]]]
+    self.spans = []  # type: List[Tuple[int, int, int]]
+    self.nodes = []  # type: List[str]  # pickled
+    self.num_lines = []  # type: List[int]  # consumed after each node
+
+  def AddRanges(self, first_line_id, first_span_id):
+    # type: (int, int) -> None
+    arena = self.arena
+    for line_id in xrange(first_line_id, arena.LastLineId()):
+      self.line_ids[line_id] = len(self.lines)
+
+      src = arena.GetLineSource(line_id)
+      if src is self.src:
+        line_src = None  # type: Optional[source_t]
+      elif isinstance(src, source__Reparsed):  # e.g. a[i+1]=, backticks
+        line_src = src
+      else:
+        raise _CantCache()
+      self.lines.append((arena.GetLine(line_id),
+                         arena.GetLineNumber(line_id), line_src))
+
+    for span_id in xrange(first_span_id, arena.LastSpanId()):
+      self.span_ids[span_id] = len(self.spans)
+      span = arena.GetLineSpan(span_id)
+      self.spans.append((span.line_id, span.col, span.length))
+
+  def AddNode(self, node, num_lines):
+    # type: (command_t, int) -> None
+    """Copy the node before it's executed, which might mutate it."""
+    try:
+      s = cPickle.dumps(node, cPickle.HIGHEST_PROTOCOL)
+    except (cPickle.PicklingError, TypeError):
+      raise _CantCache()
+    self.nodes.append(s)
+    self.num_lines.append(num_lines)
+
+  def Entry(self):
+    # type: () -> Tuple[Any, ...]
+    """Return lines, spans, and nodes with IDs relative to the file."""
+
+    def _RemapSpan(span_id):
+      # type: (int) -> int
+      if span_id == runtime.NO_SPID:
+        return span_id
+      if span_id not in self.span_ids:  # e.g. the call_spid of 'source'
+        raise _CantCache()
+      return self.span_ids[span_id]
+
+    loader = _Loader(_RemapSpan)
+
+    # This also copies the line sources, which the arena still uses
+    s = cPickle.dumps(self.lines, cPickle.HIGHEST_PROTOCOL)
+    lines = loader.Load(cStringIO.StringIO(s))
+
+    spans = []  # type: List[Tuple[int, int, int]]
+    for line_id, col, length in self.spans:
+      if line_id not in self.line_ids:
+        raise _CantCache()
+      spans.append((self.line_ids[line_id], col, length))
+
+    nodes = [loader.Load(cStringIO.StringIO(pickled)) for pickled in self.nodes]
+
+    return lines, spans, nodes, self.num_lines
+
+
+class ParseCache(object):
+  """Used by the 'source' builtin."""
+
+  def __init__(self, parse_ctx, mem):
+    # type: (ParseContext, state.Mem) -> None
+    self.parse_ctx = parse_ctx
+    self.arena = parse_ctx.arena
+    self.mem = mem
+    self.version_str = None  # type: Optional[str]
+
+    _RegisterPickleFunctions()
+
+  def _ParseOptions(self):
+    # type: () -> str
+    return self.parse_ctx.ParseOptionString()
+
+  def _CanParseAhead(self, parse_options):
+    # type: (str) -> bool
+    """Would parsing now give the same result as when the file was cached?"""
+    return code_cache.CanParseAhead(self.parse_ctx, parse_options)
+
+  def _Key(self, path, f):
+    # type: (str, Any) -> Optional[Tuple[Any, ...]]
+    """
+    The mtime has a coarse granularity, so the file could be rewritten without
+    changing it.  The hash of the contents catches that.
+    """
+    try:
+      st = posix.fstat(f.fileno())
+      contents = f.read()
+      f.seek(0)
+    except (IOError, OSError):
+      return None
+
+    if self.version_str is None:
+      self.version_str = pyutil.GetVersion(pyutil.GetResourceLoader())
+
+    return (_FORMAT, self.version_str, os_path.abspath(path), st.st_dev,
+            st.st_ino, st.st_size, st.st_mtime,
+            hashlib.sha1(contents).hexdigest(), self._ParseOptions())
+
+  def _CacheDirIsPrivate(self, cache_dir):
+    # type: (str) -> bool
+    try:
+      st = posix.stat(cache_dir)
+    except OSError:
+      return False
+    return stat.S_ISDIR(st.st_mode) and _IsPrivate(st)
+
+  def _Load(self, cache_path, key):
+    # type: (str, Tuple[Any, ...]) -> Optional[Tuple[Any, ...]]
+    """Returns lines, spans, nodes, and line counts, or None."""
+    base_span_id = self.arena.LastSpanId()
+
+    def _RemapSpan(span_id):
+      # type: (int) -> int
+      if span_id == runtime.NO_SPID:
+        return span_id
+      return base_span_id + span_id
+
+    loader = _Loader(_RemapSpan)
+    try:
+      with open(cache_path, 'rb') as f:
+        if not _IsPrivate(posix.fstat(f.fileno())):
+          return None
+        # The key is pickled separately, so a stale entry isn't loaded
+        if loader.Load(f) != key:
+          return None
+        return loader.Load(f)
+    except Exception:  # missing, truncated, or from an older OSH
+      return None
+
+  def _Save(self, cache_path, key, recorder):
+    # type: (str, Tuple[Any, ...], _Recorder) -> None
+    try:
+      entry = recorder.Entry()
+    except _CantCache:
+      return
+
+    # Write to a temp file and rename, so another shell never sees half of it
+    tmp_path = '%s.%d' % (cache_path, posix.getpid())
+    try:
+      fd = posix.open(tmp_path, posix.O_WRONLY | posix.O_CREAT | posix.O_EXCL,
+                      0o600)
+      with os.fdopen(fd, 'wb') as f:
+        cPickle.dump(key, f, cPickle.HIGHEST_PROTOCOL)
+        cPickle.dump(entry, f, cPickle.HIGHEST_PROTOCOL)
+      os.rename(tmp_path, cache_path)
+    except (IOError, OSError):
+      pass  # The cache is best effort
+
+  def Batch(self, path, src, line_reader, c_parser, cmd_ev, errfmt, cmd_flags):
+    # type: (str, source_t, FileLineReader, CommandParser, CommandEvaluator, ErrorFormatter, int) -> int
+    """Like main_loop.Batch(), but may load the commands from the cache.
+
+    Args:
+      src: The source_t that 'source' pushed on the arena
+    """
+    cache_dir = state.MaybeString(self.mem, 'OSH_PARSE_CACHE_DIR')
+    key = None  # type: Optional[Tuple[Any, ...]]
+    if (cache_dir and len(self.parse_ctx.aliases) == 0 and
+        self._CacheDirIsPrivate(cache_dir)):
+      key = self._Key(path, line_reader.f)
+    if key is None:
+      return main_loop.Batch(cmd_ev, c_parser, errfmt, cmd_flags=cmd_flags)
+
+    name = hashlib.sha1(key[2]).hexdigest()
+    cache_path = os_path.join(cache_dir, name)
+
+    entry = self._Load(cache_path, key)
+    if entry is None:
+      return self._Record(cache_path, key, src, c_parser, cmd_ev, errfmt,
+                          cmd_flags)
+    else:
+      return self._Replay(entry, key[-1], line_reader, c_parser, cmd_ev,
+                          errfmt, cmd_flags)
+
+  def _Record(self, cache_path, key, src, c_parser, cmd_ev, errfmt,
+              cmd_flags):
+    # type: (str, Tuple[Any, ...], source_t, CommandParser, CommandEvaluator, ErrorFormatter, int) -> int
+    """The same loop as main_loop.Batch(), saving what was parsed."""
+    arena = self.arena
+    parse_options = key[-1]
+    recorder = _Recorder(arena, src)
+    can_cache = True
+
+    status = 0
+    while True:
+      if can_cache and not self._CanParseAhead(parse_options):
+        can_cache = False
+
+      first_line_id = arena.LastLineId()
+      first_span_id = arena.LastSpanId()
+      try:
+        node = c_parser.ParseLogicalLine()  # can raise ParseError
+        if node is None:  # EOF
+          c_parser.CheckForPendingHereDocs()  # can raise ParseError
+          break
+      except error.Parse as e:
+        errfmt.PrettyPrintError(e)
+        return 2
+
+      if can_cache:
+        try:
+          recorder.AddRanges(first_line_id, first_span_id)
+          recorder.AddNode(node, c_parser.line_reader.line_num - 1)
+        except _CantCache:
+          can_cache = False
+
+      is_return, is_fatal = cmd_ev.ExecuteAndCatch(node, cmd_flags=cmd_flags)
+      status = cmd_ev.LastStatus()
+      if is_return or is_fatal:
+        # We didn't parse the rest of the file
+        return status
+
+    if can_cache:
+      self._Save(cache_path, key, recorder)
+    return status
+
+  def _Replay(self, entry, parse_options, line_reader, c_parser, cmd_ev,
+              errfmt, cmd_flags):
+    # type: (Tuple[Any, ...], str, FileLineReader, CommandParser, CommandEvaluator, ErrorFormatter, int) -> int
+    """Execute cached commands, after adding their lines to the arena."""
+    lines, spans, nodes, num_lines = entry
+
+    arena = self.arena
+    base_line_id = arena.LastLineId()
+
+    for line, line_num, line_src in lines:
+      if line_src is None:
+        arena.AddLine(line, line_num)
+      else:
+        with alloc.ctx_Location(arena, line_src):
+          arena.AddLine(line, line_num)
+
+    # Span IDs in the nodes were already translated by _Load()
+    for line_id, col, length in spans:
+      arena.AddLineSpan(base_line_id + line_id, col, length)
+
+    status = 0
+    for i, node in enumerate(nodes):
+      if not self._CanParseAhead(parse_options):
+        # e.g. an alias was defined.  Parse the rest like 'source' would.
+        if i != 0:
+          line_reader.SkipLines(num_lines[i - 1])
+        return main_loop.Batch(cmd_ev, c_parser, errfmt, cmd_flags=cmd_flags)
+
+      is_return, is_fatal = cmd_ev.ExecuteAndCatch(node, cmd_flags=cmd_flags)
+      status = cmd_ev.LastStatus()
+      if is_return or is_fatal:
+        break
+
+    return status
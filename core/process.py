@@ -11,6 +11,7 @@ from __future__ import print_function
 
 from errno import EACCES, EBADF, ECHILD, EINTR, ENOENT, ENOEXEC
 import fcntl as fcntl_
+import sys
 from fcntl import F_DUPFD, F_GETFD, F_SETFD, FD_CLOEXEC
 from signal import SIG_DFL, SIGINT, SIGPIPE, SIGQUIT, SIGTSTP, SIGTTOU, SIGTTIN
 
@@ -43,7 +44,7 @@ import posix_ as posix
 from posix_ import (
     # translated by mycpp and directly called!  No wrapper!
     WIFSIGNALED, WIFEXITED, WIFSTOPPED,
-    WEXITSTATUS, WTERMSIG,
+    WEXITSTATUS, WTERMSIG, WNOHANG,
     O_APPEND, O_CREAT, O_RDONLY, O_RDWR, O_WRONLY, O_TRUNC,
 )
 
@@ -90,6 +91,18 @@ class _RedirFrame(object):
     self.forget = forget
 
 
+def FlushStdout():
+  # type: () -> None
+  """Write output that echo, printf, and write may have left in the buffer.
+
+  Errors are silenced, like in echo.
+  """
+  try:
+    sys.stdout.flush()
+  except IOError as e:
+    pass
+
+
 class _FdFrame(object):
   def __init__(self):
     # type: () -> None
@@ -111,6 +124,11 @@ class _FdFrame(object):
     return '<_FdFrame %s>' % self.saved
 
 
+# A loop writes output that builtins left in the buffer after this long, so
+# 'echo started; while true; do :; done > log' doesn't hold it back.
+_MAX_PENDING_SECS = 0.1
+
+
 class FdState(object):
   """File descriptor state for the current process.
   
@@ -132,6 +150,52 @@ class FdState(object):
     self.tracer = tracer
     self.waiter = waiter
 
+    # Whether echo, printf, and write can leave output in the stdout buffer.
+    # Computed lazily, since redirects change it.
+    self.can_buffer_stdout = False
+    self.buffer_checked = False
+    # Whether a builtin may have left output in the buffer, and when a loop
+    # first saw it there.
+    self.stdout_pending = False
+    self.pending_since = -1.0
+
+  def CanBufferStdout(self):
+    # type: () -> bool
+    """Can output stay in the buffer until something else needs ordering?
+
+    Not when stdout is a terminal, or the same file as stderr, e.g. with
+    2>&1.  Then it would be interleaved differently with error messages and
+    xtrace.  Not while there are background jobs, which may write to the same
+    file at any time.
+    """
+    if len(self.job_state.jobs):
+      return False
+    if not self.buffer_checked:
+      self.can_buffer_stdout = (not posix.isatty(1) and
+                                not pyos.SameFile(1, 2))
+      self.buffer_checked = True
+    return self.can_buffer_stdout
+
+  def MaybeFlushStdout(self):
+    # type: () -> None
+    """Write buffered output that has waited over _MAX_PENDING_SECS."""
+    if not self.stdout_pending:
+      return
+    now = pyos.WallTime()
+    if self.pending_since < 0.0:
+      self.pending_since = now
+    elif now - self.pending_since > _MAX_PENDING_SECS:
+      FlushStdout()
+      self.stdout_pending = False
+      self.pending_since = -1.0
+
+  def _StdoutWillChange(self):
+    # type: () -> None
+    FlushStdout()
+    self.stdout_pending = False
+    self.pending_since = -1.0
+    self.buffer_checked = False
+
   def Open(self, path):
     # type: (str) -> mylib.LineReader
     """Opens a path for read, but moves it out of the reserved 3-9 fd range.
@@ -418,6 +482,8 @@ class FdState(object):
     """Apply a group of redirects and remember to undo them."""
 
     #log('> fd_state.Push %s', redirects)
+    if len(redirects):
+      self._StdoutWillChange()
     new_frame = _FdFrame()
     self.stack.append(new_frame)
     self.cur_frame = new_frame
@@ -441,6 +507,7 @@ class FdState(object):
 
     echo foo | read line; echo $line
     """
+    self._StdoutWillChange()
     new_frame = _FdFrame()
     self.stack.append(new_frame)
     self.cur_frame = new_frame
@@ -448,9 +515,26 @@ class FdState(object):
     self._PushDup(r, redir_loc.Fd(0))
     return True
 
+  def PushStdoutToFile(self, w):
+    # type: (int) -> bool
+    """Save the current stdout and make it go to descriptor 'w'.
+
+    For pipelines whose stages run in this process.  See
+    ShellExecutor._RunPipelineInProcess().
+    """
+    self._StdoutWillChange()
+    new_frame = _FdFrame()
+    self.stack.append(new_frame)
+    self.cur_frame = new_frame
+
+    self._PushDup(w, redir_loc.Fd(1))
+    return True
+
   def Pop(self):
     # type: () -> None
     frame = self.stack.pop()
+    if len(frame.saved):
+      self._StdoutWillChange()
     #log('< Pop %s', frame)
     for rf in reversed(frame.saved):
       if rf.saved_fd == NO_FD:
@@ -561,6 +645,24 @@ class ExternalProgram(object):
     self._Exec(argv0_path, cmd_val.argv, cmd_val.arg_spids[0], environ, True)
     assert False, "This line should never execute" # NO RETURN
 
+  def Spawn(self, argv0_path, cmd_val, environ):
+    # type: (str, cmd_value__Argv, Dict[str, str]) -> int
+    """Start a program with posix_spawn(), which doesn't copy our memory.
+
+    Returns:
+      The PID, or -1 if the caller should fork() and Exec() instead.  That
+      handles shebang hijacking, the /bin/sh retry, and error messages.
+    """
+    if len(self.hijack_shebang):
+      return -1
+    try:
+      # The signals that Process.Start() resets in the child
+      pid = posix.posix_spawn(argv0_path, cmd_val.argv, environ,
+                              [SIGPIPE, SIGQUIT, SIGTSTP, SIGTTOU, SIGTTIN])
+    except OSError as e:
+      return -1
+    return pid
+
   def _Exec(self, argv0_path, argv, argv0_spid, environ, should_retry):
     # type: (str, List[str], int, Dict[str, str], bool) -> None
     if len(self.hijack_shebang):
@@ -589,6 +691,8 @@ class ExternalProgram(object):
         finally:  # TODO: use context manager
           f.close()
 
+    FlushStdout()
+    pyos.StopProfiling()  # in case of OSH_SAMPLE_PROFILE and 'exec'
     try:
       posix.execve(argv0_path, argv, environ)
     except OSError as e:
@@ -639,6 +743,15 @@ class Thunk(object):
     """Returns a status code."""
     raise NotImplementedError()
 
+  def Spawn(self):
+    # type: () -> int
+    """Start the thunk without forking, if possible.
+
+    Returns:
+      The PID, or -1 if it has to be run in a forked child.
+    """
+    return -1
+
   def UserString(self):
     # type: () -> str
     """Display for the 'jobs' list."""
@@ -669,6 +782,10 @@ class ExternalThunk(Thunk):
     tmp = [qsn.maybe_shell_encode(a) for a in self.cmd_val.argv]
     return '[process] %s' % ' '.join(tmp)
 
+  def Spawn(self):
+    # type: () -> int
+    return self.ext_prog.Spawn(self.argv0_path, self.cmd_val, self.environ)
+
   def Run(self):
     # type: () -> None
     """
@@ -725,6 +842,7 @@ class SubProgramThunk(Thunk):
     # We do NOT want to raise SystemExit here.  Otherwise dev.Tracer::Pop()
     # gets called in BOTH processes.
     # The crash dump seems to be unaffected.
+    FlushStdout()
     posix._exit(status)
 
 
@@ -868,7 +986,11 @@ class Process(Job):
 
   def Start(self, why):
     # type: (trace_t) -> int
-    """Start this process with fork(), handling redirects."""
+    """Start this process with fork(), handling redirects.
+
+    External programs that need nothing set up in the child are started with
+    posix_spawn() instead.
+    """
     # TODO: If OSH were a job control shell, we might need to call some of
     # these here.  They control the distribution of signals, some of which
     # originate from a terminal.  All the processes in a pipeline should be in
@@ -883,7 +1005,15 @@ class Process(Job):
     #
     # The whole job control mechanism is complicated and hacky.
 
-    pid = posix.fork()
+    # The child would write it again, or the program would write after it
+    FlushStdout()
+
+    pid = -1
+    if len(self.state_changes) == 0:
+      pid = self.thunk.Spawn()
+    if pid == -1:
+      pid = posix.fork()
+
     if pid < 0:
       # When does this happen?
       raise RuntimeError('Fatal error in posix.fork()')
@@ -990,6 +1120,22 @@ class ctx_Pipe(object):
     self.fd_state.Pop()
 
 
+class ctx_StdoutToFile(object):
+
+  def __init__(self, fd_state, fd):
+    # type: (FdState, int) -> None
+    fd_state.PushStdoutToFile(fd)
+    self.fd_state = fd_state
+
+  def __enter__(self):
+    # type: () -> None
+    pass
+
+  def __exit__(self, type, value, traceback):
+    # type: (Any, Any, Any) -> None
+    self.fd_state.Pop()
+
+
 class Pipeline(Job):
   """A pipeline of processes to run.
 
@@ -1396,6 +1542,7 @@ class JobState(object):
 # -1: pyos.UNTRAPPED_SIGWINCH
 W1_OK = -2      # waitpid(-1) returned
 W1_ECHILD = -3  # no processes to wait for
+W1_AGAIN = -4   # WNOHANG was passed and no processes have changed state
 # result > 0:   # a signal number that we exited with!
                 # ignoring untrapped SIGWINCH
 
@@ -1429,13 +1576,17 @@ class Waiter(object):
     self.tracer = tracer
     self.last_status = 127  # wait -n error code
 
-  def WaitForOne(self):
-    # type: () -> int
+  def WaitForOne(self, waitpid_options=0):
+    # type: (int) -> int
     """Wait until the next process returns (or maybe Ctrl-C).
 
+    Args:
+      waitpid_options: WNOHANG to return W1_AGAIN instead of blocking
+
     Returns:
       W1_ECHILD     Nothing to wait for
       W1_OK         Caller should keep waiting
+      W1_AGAIN      WNOHANG was passed, and no process has exited yet
       result > 0    Signal interrupted with
 
       In the interactive shell, we return 0 if we get a Ctrl-C, so the caller
@@ -1462,7 +1613,10 @@ class Waiter(object):
     | Done(int pid, int status)  -- process done
     | EINTR(bool sigint)         -- may or may not retry
     """
-    pid, status = pyos.WaitPid()
+    pid, status = pyos.WaitPid(waitpid_options)
+    if pid == 0:  # WNOHANG and nothing to report
+      return W1_AGAIN
+
     if pid < 0:  # error case
       err_num = status
       #log('waitpid() error => %d %s', e.errno, pyutil.strerror(e))
@@ -1521,3 +1675,14 @@ class Waiter(object):
     self.last_status = status  # for wait -n
     self.tracer.OnProcessEnd(pid, status)
     return W1_OK
+
+  def ReapExited(self):
+    # type: () -> None
+    """Reap every child that has already exited, without blocking.
+
+    Callers that loop on an expensive condition, like 'wait' checking
+    JobState.NumRunning(), call this after a blocking WaitForOne().  Then many
+    children exiting at once cost one check, not one check per child.
+    """
+    while self.WaitForOne(WNOHANG) == W1_OK:
+      pass
@@ -6,10 +6,16 @@ Like py{error,util}.py, it won't be translated to C++.
 from __future__ import print_function
 
 from errno import EINTR
+import fcntl
+import mmap
+import os  # posix_ doesn't have unlink() or wait4()
 import pwd
 import resource
 import signal
 import select
+import stat
+import sys
+import tempfile
 import termios  # for read -n
 import time
 
@@ -28,22 +34,48 @@ _ = log
 EOF_SENTINEL = 256  # bigger than any byte
 NEWLINE_CH = 10  # ord('\n')
 
+SEEK_CUR = 1  # whence arg to lseek()
 
-def WaitPid():
-  # type: () -> Tuple[int, int]
+
+def WaitPid(waitpid_options):
+  # type: (int) -> Tuple[int, int]
   try:
     # Notes:
     # - The arg -1 makes it like wait(), which waits for any process.
     # - WUNTRACED is necessary to get stopped jobs.  What about WCONTINUED?
     # - We don't retry on EINTR, because the 'wait' builtin should be
     #   interruptable.
-    pid, status = posix.waitpid(-1, WUNTRACED)
+    # - waitpid_options may be WNOHANG, in which case pid is 0 if no child
+    #   has changed state.
+    # - wait4() is waitpid() that also returns the child's resource usage.
+    pid, status, rusage = os.wait4(-1, WUNTRACED | waitpid_options)
   except OSError as e:
     return -1, e.errno
 
+  _child_cpu_time[0] += rusage.ru_utime + rusage.ru_stime
   return pid, status
 
 
+# User + system CPU seconds of children reaped by WaitPid().  A list so
+# WaitPid() can mutate it.
+_child_cpu_time = [0.0]
+
+
+def ChildCpuTime():
+  # type: () -> float
+  """CPU time used by all children reaped so far, for perf_counters."""
+  return _child_cpu_time[0]
+
+
+def WallTime():
+  # type: () -> float
+  """Seconds since the epoch, with sub-second precision.
+
+  Unlike time_.time(), which is an integer in C++.
+  """
+  return time.time()
+
+
 class ReadError(Exception):
   """Wraps errno returned by read().  Used by 'read' and 'mapfile' builtins.
   """
@@ -81,7 +113,7 @@ def ReadByte(fd):
   # type: (int) -> Tuple[int, int]
   """
   Another low level interface with a return value interface.  Used by
-  _ReadUntilDelim() and _ReadLineSlowly().
+  _ReadUntilDelim() when stdin isn't a regular file, and ReadLine().
 
   Returns:
     failure: (-1, errno) on failure
@@ -98,6 +130,183 @@ def ReadByte(fd):
       return EOF_SENTINEL, 0
 
 
+def IsRegularFile(fd):
+  # type: (int) -> bool
+  """Is it safe to read ahead on this descriptor and seek back?
+
+  True for regular files, which is what 'read' sees with 'while read; do ...;
+  done < file'.  Pipes, terminals, and sockets can't be rewound, so they need
+  to be read one byte at a time.
+  """
+  try:
+    st = posix.fstat(fd)
+  except OSError:
+    return False
+  return stat.S_ISREG(st.st_mode)
+
+
+def RegularFileSize(fd):
+  # type: (int) -> int
+  """Returns the size of a regular file, or -1 for pipes, terminals, etc.
+
+  Used to read a whole file in one call.
+  """
+  try:
+    st = posix.fstat(fd)
+  except OSError:
+    return -1
+  if not stat.S_ISREG(st.st_mode):
+    return -1
+  return st.st_size
+
+
+def SameFile(fd1, fd2):
+  # type: (int, int) -> bool
+  """Do the descriptors refer to the same file, pipe, or terminal?"""
+  try:
+    st1 = posix.fstat(fd1)
+    st2 = posix.fstat(fd2)
+  except OSError:
+    return False
+  return st1.st_dev == st2.st_dev and st1.st_ino == st2.st_ino
+
+
+def SeekCur(fd, offset):
+  # type: (int, int) -> int
+  """Move the file offset relative to the current position.
+
+  Used to give back bytes that were read past a delimiter.
+
+  Returns:
+    0 on success, or errno on failure.
+  """
+  try:
+    posix.lseek(fd, offset, SEEK_CUR)
+  except OSError as e:
+    return e.errno
+  return 0
+
+
+def Tell(fd):
+  # type: (int) -> int
+  """Returns the file offset, or -1 for pipes, terminals, etc."""
+  try:
+    return posix.lseek(fd, 0, SEEK_CUR)
+  except OSError:
+    return -1
+
+
+class MappedFile(object):
+  """A read-only mmap() of a file, so Arena can read its lines back lazily.
+
+  We keep our own descriptor to detect changes.  If the file is truncated,
+  touching the mapping would raise SIGBUS.
+  """
+
+  def __init__(self, fd, m, size, mtime):
+    # type: (int, mmap.mmap, int, float) -> None
+    self.fd = fd
+    self.m = m
+    self.size = size
+    self.mtime = mtime
+
+  def Changed(self):
+    # type: () -> bool
+    """Has the file been modified since it was mapped, or was it closed?"""
+    if self.fd == -1:
+      return True
+    try:
+      st = posix.fstat(self.fd)
+    except OSError:
+      return True
+    return st.st_size != self.size or st.st_mtime != self.mtime
+
+  def Line(self, offset):
+    # type: (int) -> str
+    """Return the line starting at a byte offset, or '' if the file changed."""
+    if self.Changed():
+      return ''
+    end = self.m.find('\n', offset)
+    if end == -1:
+      end = self.size
+    else:
+      end += 1
+    return self.m[offset:end]
+
+  def IsSameFile(self, other):
+    # type: (MappedFile) -> bool
+    """Do both map the same file, which hasn't changed?"""
+    return (not self.Changed() and not other.Changed() and
+            SameFile(self.fd, other.fd))
+
+  def Close(self):
+    # type: () -> None
+    """Release the mapping and descriptor.  Line() returns '' after this."""
+    if self.fd == -1:
+      return
+    self.m.close()
+    posix.close(self.fd)
+    self.fd = -1
+
+
+def MapFile(fd):
+  # type: (int) -> Optional[MappedFile]
+  """Map a regular file read-only.
+
+  Returns:
+    None if it's not a regular file, it's empty, or mmap() fails.
+  """
+  try:
+    st = posix.fstat(fd)
+  except OSError:
+    return None
+  if not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+    return None
+
+  try:
+    m = mmap.mmap(fd, st.st_size, prot=mmap.PROT_READ)
+  except (EnvironmentError, ValueError):
+    return None
+
+  # Like process.SaveFd(), but child processes shouldn't inherit it
+  try:
+    new_fd = fcntl.fcntl(fd, fcntl.F_DUPFD, 100)  # type: int
+  except IOError:
+    m.close()
+    return None
+  fcntl.fcntl(new_fd, fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+  return MappedFile(new_fd, m, st.st_size, st.st_mtime)
+
+
+def TempFilePipe(tmp_dir):
+  # type: (str) -> Tuple[int, int]
+  """Make an anonymous temp file to use like a pipe, without a size limit.
+
+  Returns:
+    (read fd, write fd), or (-1, -1) if the file couldn't be created.
+  """
+  try:
+    fd, path = tempfile.mkstemp(prefix='osh-pipe-', dir=tmp_dir)
+  except EnvironmentError:
+    return -1, -1
+  try:
+    r = posix.open(path, posix.O_RDONLY, 0)
+  except OSError:
+    posix.close(fd)
+    os.unlink(path)
+    return -1, -1
+  os.unlink(path)
+
+  # Like MapFile(), child processes shouldn't inherit these
+  fds = []  # type: List[int]
+  for old_fd in (r, fd):
+    new_fd = fcntl.fcntl(old_fd, fcntl.F_DUPFD, 100)  # type: int
+    fcntl.fcntl(new_fd, fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+    posix.close(old_fd)
+    fds.append(new_fd)
+  return fds[0], fds[1]
+
+
 def ReadLine():
   # type: () -> str
   """Read a line from stdin.
@@ -322,6 +531,50 @@ def RegisterSignalInterest(sig_num):
   signal.signal(sig_num, gSignalHandler)
 
 
+def StartProfiling(interval_us):
+  # type: (int) -> None
+  """Have SIGPROF fire every interval_us microseconds of CPU time.
+
+  Interrupted system calls are restarted, so 'wait' and 'read' don't see the
+  signal like they would a trap.
+  """
+  RegisterSignalInterest(signal.SIGPROF)
+  signal.siginterrupt(signal.SIGPROF, False)
+  secs = interval_us / 1000000.0
+  signal.setitimer(signal.ITIMER_PROF, secs, secs)
+
+
+def StopProfiling():
+  # type: () -> None
+  """Stop the SIGPROF timer.
+
+  The timer survives execve(), and would kill the new program.  Python also
+  restores the default action, which is to terminate, when it exits.
+  """
+  signal.setitimer(signal.ITIMER_PROF, 0, 0)
+
+
+def _FlushStdoutAndDie(sig_num, unused_frame):
+  # type: (int, Any) -> None
+  try:
+    sys.stdout.flush()
+  except IOError:
+    pass
+  signal.signal(sig_num, signal.SIG_DFL)
+  posix.kill(posix.getpid(), sig_num)
+
+
+def FlushStdoutOnSignal(sig_num):
+  # type: (int) -> None
+  """Write buffered stdout before the signal terminates the shell.
+
+  Only changes signals with the default action, so ignored signals stay
+  ignored.  The shell still dies from the signal.
+  """
+  if signal.getsignal(sig_num) == signal.SIG_DFL:
+    signal.signal(sig_num, _FlushStdoutAndDie)
+
+
 def TakeSignalQueue():
   # type: () -> List[int]
   """Transfer ownership of the current queue of pending signals to the caller."""
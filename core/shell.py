@@ -13,6 +13,7 @@ from _devbuild.gen.syntax_asdl import source, source_t
 from asdl import runtime
 
 from core import alloc
+from core import code_cache
 from core import comp_ui
 from core import dev
 from core import error
@@ -158,8 +159,8 @@ class ShellOptHook(state.OptHook):
     return True
 
 
-def AddOil(b, mem, search_path, cmd_ev, errfmt, procs, arena):
-  # type: (Dict[int, vm._Builtin], state.Mem, state.SearchPath, cmd_eval.CommandEvaluator, ui.ErrorFormatter, Dict[str, Proc], alloc.Arena) -> None
+def AddOil(b, mem, search_path, cmd_ev, errfmt, procs, arena, cached_code):
+  # type: (Dict[int, vm._Builtin], state.Mem, state.SearchPath, cmd_eval.CommandEvaluator, ui.ErrorFormatter, Dict[str, Proc], alloc.Arena, code_cache.CodeCache) -> None
   b[builtin_i.append] = builtin_oil.Append(mem, errfmt)
 
   b[builtin_i.shvar] = builtin_pure.Shvar(mem, search_path, cmd_ev)
@@ -167,7 +168,7 @@ def AddOil(b, mem, search_path, cmd_ev, errfmt, procs, arena):
   b[builtin_i.fopen] = builtin_pure.Fopen(mem, cmd_ev)
 
   b[builtin_i.write] = builtin_oil.Write(mem, errfmt)
-  b[builtin_i.pp] = builtin_oil.Pp(mem, errfmt, procs, arena)
+  b[builtin_i.pp] = builtin_oil.Pp(mem, errfmt, procs, arena, cached_code)
 
   b[builtin_i.use] = builtin_pure.Use(mem, errfmt)
   b[builtin_i.argparse] = builtin_oil.ArgParse(mem, errfmt)
@@ -288,6 +289,9 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   parse_ctx = parse_lib.ParseContext(arena, parse_opts, aliases, oil_grammar)
   parse_ctx.Init_OnePassParse(flag.one_pass_parse)
 
+  # Parsed code for eval, trap, and PROMPT_COMMAND
+  cached_code = code_cache.CodeCache(parse_ctx, mem)
+
   # Three ParseContext instances SHARE aliases.
   comp_arena = alloc.Arena()
   comp_arena.PushSource(source.Unused('completion'))
@@ -379,7 +383,19 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   crash_dump_dir = environ.get('OSH_CRASH_DUMP_DIR', '')
   cmd_deps.dumper = dev.CrashDumper(crash_dump_dir)
 
+  # For shopt -s perf_counters
+  perf_json_path = environ.get('OSH_PERF_COUNTERS_JSON', '')
+  perf = dev.PerfCounters(exec_opts, perf_json_path,
+                          util.DebugFile(mylib.Stderr()))
+
+  # Sampling profiler, see dev.Sampler
+  profile_path = environ.get('OSH_SAMPLE_PROFILE', '')
+  sampler = dev.Sampler(mem, arena, profile_path)
+  if len(profile_path):
+    trap_state.StartSampling(sampler, dev.SAMPLE_INTERVAL_US)
+
   comp_lookup = completion.Lookup()
+  exe_index = completion.ExecutableIndex()
 
   # Various Global State objects to work around readline interfaces
   compopt_state = completion.OptionState()
@@ -397,7 +413,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
 
   shell_ex = executor.ShellExecutor(
       mem, exec_opts, mutable_opts, procs, hay_state, builtins, search_path,
-      ext_prog, waiter, tracer, job_state, fd_state, errfmt)
+      ext_prog, waiter, tracer, perf, job_state, fd_state, errfmt)
 
   shell_native.AddPure(builtins, mem, procs, modules, mutable_opts, aliases,
                        search_path, errfmt)
@@ -426,7 +442,8 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   cmd_ev = cmd_eval.CommandEvaluator(mem, exec_opts, errfmt, procs,
                                      assign_b, arena, cmd_deps, trap_state)
 
-  AddOil(builtins, mem, search_path, cmd_ev, errfmt, procs, arena)
+  AddOil(builtins, mem, search_path, cmd_ev, errfmt, procs, arena,
+         cached_code)
 
   parse_config = funcs.ParseHay(fd_state, parse_ctx, errfmt)
   eval_to_dict = funcs.EvalHay(hay_state, mutable_opts, mem, cmd_ev)
@@ -455,7 +472,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   builtins[builtin_i.unset] = builtin_assign.Unset(mem, procs, unsafe_arith,
                                                    errfmt)
   builtins[builtin_i.eval] = builtin_meta.Eval(parse_ctx, exec_opts, cmd_ev,
-                                               tracer, errfmt)
+                                               tracer, errfmt, cached_code)
   builtins[builtin_i.read] = builtin_misc.Read(splitter, mem, parse_ctx,
                                                cmd_ev, errfmt)
   mapfile = builtin_misc.MapFile(mem, errfmt, cmd_ev)
@@ -474,14 +491,15 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   builtins[builtin_i.json] = builtin_oil.Json(mem, expr_ev, errfmt)
 
   spec_builder = builtin_comp.SpecBuilder(cmd_ev, parse_ctx, word_ev, splitter,
-                                          comp_lookup, errfmt)
+                                          comp_lookup, exe_index, errfmt)
   complete_builtin = builtin_comp.Complete(spec_builder, comp_lookup)
   builtins[builtin_i.complete] = complete_builtin
   builtins[builtin_i.compgen] = builtin_comp.CompGen(spec_builder)
   builtins[builtin_i.compopt] = builtin_comp.CompOpt(compopt_state, errfmt)
   builtins[builtin_i.compadjust] = builtin_comp.CompAdjust(mem)
 
-  builtins[builtin_i.trap] = builtin_trap.Trap(trap_state, parse_ctx, tracer, errfmt)
+  builtins[builtin_i.trap] = builtin_trap.Trap(trap_state, parse_ctx, tracer,
+                                               errfmt, cached_code)
 
   # History evaluation is a no-op if line_input is None.
   hist_ev = history.Evaluator(line_input, hist_ctx, debug_f)
@@ -574,6 +592,8 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
     box = [status]
     cmd_ev.MaybeRunExitTrap(box)
     status = box[0]
+    perf.MaybeDump()
+    sampler.MaybeDump()
 
     return status
 
@@ -637,7 +657,12 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
 
     line_reader.Reset()  # After sourcing startup file, render $PS1
 
-    prompt_plugin = prompt.UserPlugin(mem, parse_ctx, cmd_ev, errfmt)
+    if line_input and exec_opts.prewarm_completion():
+      # After the startup file, which may change $PATH and set the option
+      completion.PrewarmExecutableIndex(mem, exe_index)
+
+    prompt_plugin = prompt.UserPlugin(mem, parse_ctx, cmd_ev, errfmt,
+                                      cached_code)
     try:
       status = main_loop.Interactive(flag, cmd_ev, c_parser, display,
                                      prompt_plugin, errfmt)
@@ -647,6 +672,8 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
     box = [status]
     cmd_ev.MaybeRunExitTrap(box)
     status = box[0]
+    perf.MaybeDump()
+    sampler.MaybeDump()
 
     return status
 
@@ -673,6 +700,8 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
     box = [status]
     cmd_ev.MaybeRunExitTrap(box)
     status = box[0]
+    perf.MaybeDump()
+    sampler.MaybeDump()
 
   # NOTE: We haven't closed the file opened with fd_state.Open
   return status
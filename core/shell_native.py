@@ -15,6 +15,7 @@ from _devbuild.gen.syntax_asdl import source
 from asdl import runtime
 
 from core import alloc
+from core import code_cache
 from core import dev
 from core import error
 from core import executor
@@ -293,6 +294,9 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   parse_ctx = parse_lib.ParseContext(arena, parse_opts, aliases, oil_grammar)
   parse_ctx.Init_OnePassParse(flag.one_pass_parse)
 
+  # Parsed code for eval, trap, and PROMPT_COMMAND
+  cached_code = code_cache.CodeCache(parse_ctx, mem)
+
   # Three ParseContext instances SHARE aliases.
   comp_arena = alloc.Arena()
   comp_arena.PushSource(source.Unused('completion'))
@@ -374,6 +378,17 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   crash_dump_dir = environ.get('OSH_CRASH_DUMP_DIR', '')
   cmd_deps.dumper = dev.CrashDumper(crash_dump_dir)
 
+  # For shopt -s perf_counters
+  perf_json_path = environ.get('OSH_PERF_COUNTERS_JSON', '')
+  perf = dev.PerfCounters(exec_opts, perf_json_path,
+                          util.DebugFile(mylib.Stderr()))
+
+  # Sampling profiler, see dev.Sampler
+  profile_path = environ.get('OSH_SAMPLE_PROFILE', '')
+  sampler = dev.Sampler(mem, arena, profile_path)
+  if len(profile_path):
+    trap_state.StartSampling(sampler, dev.SAMPLE_INTERVAL_US)
+
   #comp_lookup = completion.Lookup()
 
   # Various Global State objects to work around readline interfaces
@@ -392,7 +407,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
 
   shell_ex = executor.ShellExecutor(
       mem, exec_opts, mutable_opts, procs, hay_tree, builtins, search_path,
-      ext_prog, waiter, tracer, job_state, fd_state, errfmt)
+      ext_prog, waiter, tracer, perf, job_state, fd_state, errfmt)
 
   AddPure(builtins, mem, procs, modules, mutable_opts, aliases, search_path, errfmt)
   AddIO(builtins, mem, dir_stack, exec_opts, splitter, parse_ctx, errfmt)
@@ -436,7 +451,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   builtins[builtin_i.unset] = builtin_assign.Unset(mem, procs, unsafe_arith,
                                                    errfmt)
   builtins[builtin_i.eval] = builtin_meta.Eval(parse_ctx, exec_opts, cmd_ev,
-                                               tracer, errfmt)
+                                               tracer, errfmt, cached_code)
   builtins[builtin_i.read] = builtin_misc.Read(splitter, mem, parse_ctx,
                                                cmd_ev, errfmt)
   mapfile = builtin_misc.MapFile(mem, errfmt, cmd_ev)
@@ -452,7 +467,8 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
           errfmt)
   AddBlock(builtins, mem, mutable_opts, dir_stack, cmd_ev, shell_ex, hay_tree, errfmt)
 
-  builtins[builtin_i.trap] = builtin_trap.Trap(trap_state, parse_ctx, tracer, errfmt)
+  builtins[builtin_i.trap] = builtin_trap.Trap(trap_state, parse_ctx, tracer,
+                                               errfmt, cached_code)
 
   if flag.c is not None:
     arena.PushSource(source.CFlag())
@@ -506,6 +522,8 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
     box = [status]
     cmd_ev.MaybeRunExitTrap(box)
     status = box[0]
+    perf.MaybeDump()
+    sampler.MaybeDump()
 
   # NOTE: We haven't closed the file opened with fd_state.Open
   return status
@@ -58,6 +58,43 @@ _READLINE_DELIMS = ' \t\n"\'><=;|&(:'
 
 LINE_ZERO = -2  # special value that's not runtime.NO_SPID
 
+# Variables whose values are computed by Mem.GetValue(), rather than stored in
+# the scope chain.  It's one hash lookup for every variable.
+_COMPUTED_ARGV = 1
+_COMPUTED_STATUS = 2
+_COMPUTED_THIS_DIR = 3
+_COMPUTED_PIPESTATUS = 4
+_COMPUTED_PROCESS_SUB_STATUS = 5
+_COMPUTED_BASH_REMATCH = 6
+_COMPUTED_FUNCNAME = 7
+_COMPUTED_BASH_SOURCE = 8
+_COMPUTED_CALL_SOURCE = 9
+_COMPUTED_BASH_LINENO = 10
+_COMPUTED_LINENO = 11
+_COMPUTED_BASHPID = 12
+
+
+def _ComputedVars():
+  # type: () -> Dict[str, int]
+  """Name -> _COMPUTED_* constant.
+
+  Filled in at runtime, because mycpp doesn't translate dict literals.
+  """
+  d = {}  # type: Dict[str, int]
+  d['ARGV'] = _COMPUTED_ARGV
+  d['_status'] = _COMPUTED_STATUS
+  d['_this_dir'] = _COMPUTED_THIS_DIR
+  d['PIPESTATUS'] = _COMPUTED_PIPESTATUS
+  d['_pipeline_status'] = _COMPUTED_PIPESTATUS
+  d['_process_sub_status'] = _COMPUTED_PROCESS_SUB_STATUS
+  d['BASH_REMATCH'] = _COMPUTED_BASH_REMATCH
+  d['FUNCNAME'] = _COMPUTED_FUNCNAME
+  d['BASH_SOURCE'] = _COMPUTED_BASH_SOURCE
+  d['BASH_LINENO'] = _COMPUTED_BASH_LINENO
+  d['LINENO'] = _COMPUTED_LINENO
+  d['BASHPID'] = _COMPUTED_BASHPID
+  return d
+
 
 # flags for SetVar
 SetReadOnly   = 1 << 0
@@ -76,6 +113,63 @@ class SearchPath(object):
     self.mem = mem
     self.cache = {}  # type: Dict[str, str]
 
+    # $PATH split into dirs, memoized on its value
+    self.path_str = None  # type: Optional[str]
+    self.path_list = []  # type: List[str]
+
+    # Negative cache of commands that weren't found.  It's valid as long as
+    # the mtimes of the dirs in $PATH are unchanged.
+    self.misses = {}  # type: Dict[str, bool]
+    self.dir_mtimes = []  # type: List[float]
+
+    # For 'hash -s'
+    self.num_hits = 0
+    self.num_misses = 0
+    self.num_negative_hits = 0
+
+  def _PathList(self):
+    # type: () -> List[str]
+    """Returns $PATH split into dirs.
+
+    Caches are invalidated when the value of $PATH changes.
+    """
+    val = self.mem.GetValue('PATH')
+    UP_val = val
+    if val.tag_() == value_e.Str:
+      val = cast(value__Str, UP_val)
+      path_str = val.s
+    else:
+      path_str = None  # treat as empty path
+
+    if path_str != self.path_str:
+      self.ClearCache()
+      self.path_str = path_str
+      if path_str is None:
+        self.path_list = []
+      else:
+        self.path_list = path_str.split(':')
+
+    return self.path_list
+
+  def _DirMtimes(self, path_list):
+    # type: (List[str]) -> List[float]
+    return [path_stat.mtime(path_dir) for path_dir in path_list]
+
+  def _MissIsValid(self, name, path_list):
+    # type: (str, List[str]) -> bool
+    """Is the negative cache entry for name still valid?
+
+    Costs one stat() per dir in $PATH.  Creating or renaming a file changes the
+    mtime of its dir.  'chmod +x' doesn't, so Lookup() never caches a miss
+    when it found a file that isn't executable.
+    """
+    if name not in self.misses:
+      return False
+    if self._DirMtimes(path_list) == self.dir_mtimes:
+      return True
+    self.misses.clear()
+    return False
+
   def Lookup(self, name, exec_required=True):
     # type: (str, bool) -> Optional[str]
     """
@@ -87,16 +181,18 @@ class SearchPath(object):
       else:
         return None
 
-    # TODO: Could cache this computation to avoid allocating every time for all
-    # the splitting.
-    val = self.mem.GetValue('PATH')
-    UP_val = val
-    if val.tag_() == value_e.Str:
-      val = cast(value__Str, UP_val)
-      path_list = val.s.split(':')
-    else:
-      path_list = []  # treat as empty path
+    path_list = self._PathList()
+
+    if exec_required and self._MissIsValid(name, path_list):
+      self.num_negative_hits += 1
+      return None
 
+    if exec_required and len(self.misses) == 0:
+      # Take the snapshot before searching, so we don't miss changes made
+      # during the search
+      self.dir_mtimes = self._DirMtimes(path_list)
+
+    cache_miss = exec_required
     for path_dir in path_list:
       full_path = os_path.join(path_dir, name)
 
@@ -105,19 +201,27 @@ class SearchPath(object):
       # the permissions are changed between check and use.
       if exec_required:
         found = posix.access(full_path, X_OK)
+        if not found and path_stat.exists(full_path):
+          cache_miss = False  # it may become executable
       else:
         found = path_stat.exists(full_path)  # for 'source'
 
       if found:
         return full_path
 
+    if cache_miss:
+      self.misses[name] = True
     return None
 
   def CachedLookup(self, name):
     # type: (str) -> Optional[str]
+    self._PathList()  # clear the cache if $PATH changed
+
     if name in self.cache:
+      self.num_hits += 1
       return self.cache[name]
 
+    self.num_misses += 1
     full_path = self.Lookup(name)
     if full_path is not None:
       self.cache[name] = full_path
@@ -130,13 +234,28 @@ class SearchPath(object):
 
   def ClearCache(self):
     # type: () -> None
-    """For hash -r."""
+    """For hash -r, and when $PATH changes.
+
+    The stats for hash -s are kept.
+    """
     self.cache.clear()
+    self.misses.clear()
 
   def CachedCommands(self):
     # type: () -> List[str]
     return self.cache.values()
 
+  def Stats(self):
+    # type: () -> List[Tuple[str, int]]
+    """For hash -s."""
+    return [
+        ('hits', self.num_hits),
+        ('misses', self.num_misses),
+        ('negative_hits', self.num_negative_hits),
+        ('cached', len(self.cache)),
+        ('cached_misses', len(self.misses)),
+    ]
+
 
 class ctx_Source(object):
   """For source builtin."""
@@ -1251,13 +1370,23 @@ class Mem(object):
     self.argv_stack = [_ArgFrame(argv)]
     frame = NewDict()  # type: Dict[str, cell]
     self.var_stack = [frame]
+    # Name -> the frame where a scope_e.Dynamic lookup found it.  An entry is
+    # removed when the name is added to or removed from any frame, or its
+    # frame is popped, so it always points to the innermost binding.
+    self.dynamic_cache = {}  # type: Dict[str, Dict[str, cell]]
 
     self.arena = arena
 
+    # For GetValue()
+    self.computed_vars = _ComputedVars()
+
     # The debug_stack isn't strictly necessary for execution.  We use it for
     # crash dumps and for 4 parallel arrays: BASH_SOURCE, FUNCNAME,
     # CALL_SOURCE, and BASH_LINENO.
     self.debug_stack = debug_stack
+    # FUNCNAME and BASH_SOURCE, rebuilt when the debug_stack changes
+    self.funcname_val = None  # type: Optional[value__MaybeStrArray]
+    self.bash_source_val = None  # type: Optional[value__MaybeStrArray]
 
     self.pwd = None  # type: Optional[str]
 
@@ -1411,7 +1540,7 @@ class Mem(object):
   def PopCall(self):
     # type: () -> None
     self._PopDebugStack()
-    self.var_stack.pop()
+    self._PopFrame()
     self.argv_stack.pop()
 
   def PushSource(self, source_name, argv):
@@ -1443,7 +1572,13 @@ class Mem(object):
   def PopTemp(self):
     # type: () -> None
     self._PopDebugStack()
-    self.var_stack.pop()
+    self._PopFrame()
+
+  def _PopFrame(self):
+    # type: () -> None
+    frame = self.var_stack.pop()
+    for name in frame:
+      mylib.dict_erase(self.dynamic_cache, name)
 
   def TopNamespace(self):
     # type: () -> Dict[str, runtime_asdl.cell]
@@ -1464,10 +1599,14 @@ class Mem(object):
     self.debug_stack.append(
         DebugFrame(bash_source, func_name, source_name, self.current_spid, argv_i, var_i)
     )
+    self.funcname_val = None
+    self.bash_source_val = None
 
   def _PopDebugStack(self):
     # type: () -> None
     self.debug_stack.pop()
+    self.funcname_val = None
+    self.bash_source_val = None
 
   #
   # Argv
@@ -1547,10 +1686,15 @@ class Mem(object):
       name_map: The name_map it should be set to or deleted from.
     """
     if which_scopes == scope_e.Dynamic:
+      name_map = self.dynamic_cache.get(name)
+      if name_map is not None:
+        return name_map[name], name_map
+
       for i in xrange(len(self.var_stack) - 1, -1, -1):
         name_map = self.var_stack[i]
         if name in name_map:
           cell = name_map[name]
+          self.dynamic_cache[name] = name_map
           return cell, name_map
       no_cell = None  # type: Optional[runtime_asdl.cell]
       return no_cell, self.var_stack[0]  # set in global name_map
@@ -1749,6 +1893,7 @@ class Mem(object):
                                    bool(flags & SetNameref),
                                    val)
           name_map[cell_name] = cell
+          mylib.dict_erase(self.dynamic_cache, cell_name)  # may be shadowed
 
         # Maintain invariant that only strings and undefined cells can be
         # exported.
@@ -1866,6 +2011,7 @@ class Mem(object):
     # arrays can't be exported; can't have AssocArray flag
     readonly = bool(flags & SetReadOnly)
     name_map[lval.name] = runtime_asdl.cell(False, readonly, False, new_value)
+    mylib.dict_erase(self.dynamic_cache, lval.name)  # may be shadowed
 
   def InternalSetGlobal(self, name, new_val):
     # type: (str, value_t) -> None
@@ -1897,25 +2043,39 @@ class Mem(object):
       which_scopes = self.ScopesForReading()
     #log('which_scopes %s', which_scopes)
 
-    # TODO: Optimize this by doing a single hash lookup:
-    # COMPUTED_VARS = {'PIPESTATUS': 1, 'FUNCNAME': 1, ...}
-    # if name not in COMPUTED_VARS: ...
+    which = self.computed_vars.get(name, 0)
+    if which != 0:
+      return self._GetComputed(which)
+
+    # In the case 'declare -n ref='a[42]', the result won't be a cell.  Idea to
+    # fix this:
+    # 1. Call self.unsafe_arith.ParseVarRef() -> braced_var_sub
+    # 2. Call self.unsafe_arith.GetNameref(bvs_part), and get a value_t
+    #    We still need a ref_trail to detect cycles.
+    cell, _, _ = self._ResolveNameOrRef(name, which_scopes, False)
+    if cell:
+      return cell.val
+
+    return value.Undef()
 
-    if name == 'ARGV':
+  def _GetComputed(self, which):
+    # type: (int) -> value_t
+    """Return the value of a variable in self.computed_vars."""
+    if which == _COMPUTED_ARGV:
       # TODO:
       # - Reuse the MaybeStrArray?
       # - @@ could be an alias for ARGV (in command mode, but not expr mode)
       return value.MaybeStrArray(self.GetArgv())
 
     # "Registers"
-    if name == '_status':
+    if which == _COMPUTED_STATUS:
       if mylib.PYTHON:
         # TODO: value.Int()
         return value.Obj(self.TryStatus())
       else:
         return value.Undef()  # STUB
 
-    if name == '_this_dir':
+    if which == _COMPUTED_THIS_DIR:
       if len(self.this_dir) == 0:
         # e.g. osh -c '' doesn't have it set
         # Should we give a custom error here?
@@ -1925,45 +2085,51 @@ class Mem(object):
       else:
         return value.Str(self.this_dir[-1])  # top of stack
 
-    if name in ('PIPESTATUS', '_pipeline_status'):
+    if which == _COMPUTED_PIPESTATUS:
       pipe_strs = [str(i) for i in self.pipe_status[-1]] # type: List[str]
       return value.MaybeStrArray(pipe_strs)
 
-    if name == '_process_sub_status':  # Oil naming convention
+    if which == _COMPUTED_PROCESS_SUB_STATUS:  # Oil naming convention
       # TODO: Shouldn't these be real integers?
       sub_strs = [str(i) for i in self.process_sub_status[-1]] # type: List[str]
       return value.MaybeStrArray(sub_strs)
 
-    if name == 'BASH_REMATCH':
+    if which == _COMPUTED_BASH_REMATCH:
       return value.MaybeStrArray(self.regex_matches[-1])  # top of stack
 
-    # Do lookup of system globals before looking at user variables.  Note: we
-    # could optimize this at compile-time like $?.  That would break
-    # ${!varref}, but it's already broken for $?.
-    if name == 'FUNCNAME':
-      # bash wants it in reverse order.  This is a little inefficient but we're
-      # not depending on deque().
-      strs = []  # type: List[str]
-      for frame in reversed(self.debug_stack):
-        if frame.func_name is not None:
-          strs.append(frame.func_name)
-        if frame.source_name is not None:
-          strs.append('source')  # bash doesn't tell you the filename.
-        # Temp stacks are ignored
-      return value.MaybeStrArray(strs)  # TODO: Reuse this object too?
+    # These are looked up before user variables.  Note: we could optimize this
+    # at compile-time like $?.  That would break ${!varref}, but it's already
+    # broken for $?.
+    if which == _COMPUTED_FUNCNAME:
+      # Cached until the next function call, return, or 'source'
+      if self.funcname_val is None:
+        # bash wants it in reverse order.  This is a little inefficient but
+        # we're not depending on deque().
+        strs = []  # type: List[str]
+        for frame in reversed(self.debug_stack):
+          if frame.func_name is not None:
+            strs.append(frame.func_name)
+          if frame.source_name is not None:
+            strs.append('source')  # bash doesn't tell you the filename.
+          # Temp stacks are ignored
+        self.funcname_val = value.MaybeStrArray(strs)
+      return self.funcname_val
 
     # This isn't the call source, it's the source of the function DEFINITION
     # (or the sourced # file itself).
-    if name == 'BASH_SOURCE':
-      strs = []
-      for frame in reversed(self.debug_stack):
-        if frame.bash_source is not None:
-          strs.append(frame.bash_source)
-      return value.MaybeStrArray(strs)  # TODO: Reuse this object too?
+    if which == _COMPUTED_BASH_SOURCE:
+      if self.bash_source_val is None:
+        strs = []
+        for frame in reversed(self.debug_stack):
+          if frame.bash_source is not None:
+            strs.append(frame.bash_source)
+        self.bash_source_val = value.MaybeStrArray(strs)
+      return self.bash_source_val
 
-    # This is how bash source SHOULD be defined, but it's not!
+    # This is how bash source SHOULD be defined, but it's not!  (CALL_SOURCE
+    # isn't in self.computed_vars.)
     if 0:
-      if name == 'CALL_SOURCE':
+      if which == _COMPUTED_CALL_SOURCE:
         strs = []
         for frame in reversed(self.debug_stack):
           # should only happen for the first entry
@@ -1977,7 +2143,7 @@ class Mem(object):
           strs.append(source_str)
         return value.MaybeStrArray(strs)  # TODO: Reuse this object too?
 
-    if name == 'BASH_LINENO':
+    if which == _COMPUTED_BASH_LINENO:
       strs = []
       for frame in reversed(self.debug_stack):
         # should only happen for the first entry
@@ -1991,26 +2157,17 @@ class Mem(object):
         strs.append(str(line_num))
       return value.MaybeStrArray(strs)  # TODO: Reuse this object too?
 
-    if name == 'LINENO':
+    if which == _COMPUTED_LINENO:
       assert self.current_spid != -1, self.current_spid
       span = self.arena.GetLineSpan(self.current_spid)
       # TODO: maybe use interned GetLineNumStr?
       self.line_num.s = str(self.arena.GetLineNumber(span.line_id))
       return self.line_num
 
-    if name == 'BASHPID':  # TODO: Oil name for it
+    if which == _COMPUTED_BASHPID:  # TODO: Oil name for it
       return value.Str(str(posix.getpid()))
 
-    # In the case 'declare -n ref='a[42]', the result won't be a cell.  Idea to
-    # fix this:
-    # 1. Call self.unsafe_arith.ParseVarRef() -> braced_var_sub
-    # 2. Call self.unsafe_arith.GetNameref(bvs_part), and get a value_t
-    #    We still need a ref_trail to detect cycles.
-    cell, _, _ = self._ResolveNameOrRef(name, which_scopes, False)
-    if cell:
-      return cell.val
-
-    return value.Undef()
+    raise AssertionError(which)
 
   def GetCell(self, name, which_scopes=scope_e.Shopt):
     # type: (str, scope_t) -> cell
@@ -2064,6 +2221,7 @@ class Mem(object):
         # Make variables in higher scopes visible.
         # example: test/spec.sh builtin-vars -r 24 (ble.sh)
         mylib.dict_erase(name_map, cell_name)
+        mylib.dict_erase(self.dynamic_cache, cell_name)
 
         # alternative that some shells use:
         #   name_map[cell_name].val = value.Undef()
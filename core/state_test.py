@@ -3,8 +3,10 @@
 state_test.py: Tests for state.py
 """
 
-import unittest
 import os.path
+import shutil
+import tempfile
+import unittest
 
 from _devbuild.gen.runtime_asdl import scope_e, lvalue, value, value_e
 from core import error
@@ -59,6 +61,53 @@ class MemTest(unittest.TestCase):
     else:
         self.assertEqual(search_path.Lookup('env'), '/usr/bin/env')
 
+  def testSearchPathCache(self):
+    mem = _InitMem()
+    search_path = state.SearchPath(mem)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      mem.SetValue(lvalue.Named('PATH'), value.Str(tmp_dir),
+                   scope_e.GlobalOnly)
+
+      # Misses are cached
+      self.assertEqual(None, search_path.CachedLookup('mycmd'))
+      self.assertEqual(None, search_path.CachedLookup('mycmd'))
+      self.assertEqual(1, search_path.num_negative_hits)
+
+      # Creating a file in a $PATH dir invalidates the negative cache
+      full_path = os.path.join(tmp_dir, 'mycmd')
+      with open(full_path, 'w') as f:
+        f.write('#!/bin/sh\n')
+      os.chmod(full_path, 0o755)
+      self.assertEqual(full_path, search_path.CachedLookup('mycmd'))
+      self.assertEqual(full_path, search_path.CachedLookup('mycmd'))
+      self.assertEqual(1, search_path.num_hits)
+
+      # Changing $PATH invalidates the cache
+      mem.SetValue(lvalue.Named('PATH'), value.Str(tmp_dir + '/nonexistent'),
+                   scope_e.GlobalOnly)
+      self.assertEqual(None, search_path.CachedLookup('mycmd'))
+      self.assertEqual([], search_path.CachedCommands())
+
+      # Stats are kept
+      num_misses = search_path.num_misses
+      search_path.ClearCache()
+      self.assertEqual(num_misses, search_path.num_misses)
+
+      # A miss isn't cached when the file exists, since 'chmod +x' doesn't
+      # change the mtime of the dir
+      mem.SetValue(lvalue.Named('PATH'), value.Str(tmp_dir),
+                   scope_e.GlobalOnly)
+      nx_path = os.path.join(tmp_dir, 'nx')
+      with open(nx_path, 'w') as f:
+        f.write('#!/bin/sh\n')
+      self.assertEqual(None, search_path.CachedLookup('nx'))
+      os.chmod(nx_path, 0o755)
+      self.assertEqual(nx_path, search_path.CachedLookup('nx'))
+    finally:
+      shutil.rmtree(tmp_dir)
+
 
   def testPushTemp(self):
     mem = _InitMem()
@@ -253,6 +302,36 @@ class MemTest(unittest.TestCase):
     val = mem.GetValue('undef', scope_e.Dynamic)
     test_lib.AssertAsdlEqual(self, value.Undef(), val)
 
+  def testDynamicCache(self):
+    mem = _InitMem()
+    mem.SetValue(lvalue.Named('x'), value.Str('global'), scope_e.GlobalOnly)
+    val = mem.GetValue('x', scope_e.Dynamic)  # cached
+    test_lib.AssertAsdlEqual(self, value.Str('global'), val)
+
+    # local x=local shadows the cached global
+    mem.PushCall('my-func', 0, [])
+    val = mem.GetValue('x', scope_e.Dynamic)
+    test_lib.AssertAsdlEqual(self, value.Str('global'), val)
+    mem.SetValue(lvalue.Named('x'), value.Str('local'), scope_e.LocalOnly)
+    val = mem.GetValue('x', scope_e.Dynamic)
+    test_lib.AssertAsdlEqual(self, value.Str('local'), val)
+
+    # unset x makes the global visible again
+    mem.Unset(lvalue.Named('x'), scope_e.Dynamic)
+    val = mem.GetValue('x', scope_e.Dynamic)
+    test_lib.AssertAsdlEqual(self, value.Str('global'), val)
+
+    # Popping the frame drops its entries
+    mem.SetValue(lvalue.Named('x'), value.Str('local'), scope_e.LocalOnly)
+    mem.SetValue(lvalue.Named('y'), value.Str('local'), scope_e.LocalOnly)
+    val = mem.GetValue('y', scope_e.Dynamic)
+    test_lib.AssertAsdlEqual(self, value.Str('local'), val)
+    mem.PopCall()
+    val = mem.GetValue('x', scope_e.Dynamic)
+    test_lib.AssertAsdlEqual(self, value.Str('global'), val)
+    val = mem.GetValue('y', scope_e.Dynamic)
+    test_lib.AssertAsdlEqual(self, value.Undef(), val)
+
   def testExportThenAssign(self):
     """Regression Test"""
     mem = _InitMem()
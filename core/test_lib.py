@@ -231,11 +231,12 @@ def InitCommandEvaluator(parse_ctx=None, comp_lookup=None, arena=None, mem=None,
 
   tracer = dev.Tracer(parse_ctx, exec_opts, mutable_opts, mem, debug_f)
   waiter = process.Waiter(job_state, exec_opts, trap_state, tracer)
+  perf = dev.PerfCounters(exec_opts, '', debug_f)
 
   hay_state = state.Hay()
   shell_ex = executor.ShellExecutor(
       mem, exec_opts, mutable_opts, procs, hay_state, builtins, search_path,
-      ext_prog, waiter, tracer, job_state, fd_state, errfmt)
+      ext_prog, waiter, tracer, perf, job_state, fd_state, errfmt)
 
   assert cmd_ev.mutable_opts is not None, cmd_ev
   prompt_ev = prompt.Evaluator('osh', '0.0.0', parse_ctx, mem)
@@ -244,7 +245,8 @@ def InitCommandEvaluator(parse_ctx=None, comp_lookup=None, arena=None, mem=None,
                       prompt_ev, tracer)
 
   spec_builder = builtin_comp.SpecBuilder(cmd_ev, parse_ctx, word_ev, splitter,
-                                          comp_lookup, errfmt)
+                                          comp_lookup,
+                                          completion.ExecutableIndex(), errfmt)
   # Add some builtins that depend on the executor!
   complete_builtin = builtin_comp.Complete(spec_builder, comp_lookup)
   builtins[builtin_i.complete] = complete_builtin
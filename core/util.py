@@ -11,7 +11,8 @@ util.py - Common infrastructure.
 from __future__ import print_function
 
 from mycpp import mylib
-from typing import Any
+from mycpp.mylib import iteritems
+from typing import Any, Dict, Optional
 
 
 class UserExit(Exception):
@@ -40,6 +41,41 @@ if mylib.PYTHON:
       return out
 
 
+class LruKeys(object):
+  """Tracks the order that the keys of a bounded cache are used in.
+
+  The caller owns the cache dict.  It calls Touch() when a key is added or
+  used, and PopOldest() to choose the key to evict.
+  """
+
+  def __init__(self):
+    # type: () -> None
+    self.last_used = {}  # type: Dict[str, int]
+    self.clock = 0  # incremented on every use
+
+  def Touch(self, key):
+    # type: (str) -> None
+    self.clock += 1
+    self.last_used[key] = self.clock
+
+  def PopOldest(self):
+    # type: () -> str
+    """Forget the least recently used key, and return it.
+
+    A linear scan is OK because the caches are small, and this only happens
+    after a miss.
+    """
+    oldest = None  # type: Optional[str]
+    oldest_used = -1
+    for key, used in iteritems(self.last_used):
+      if oldest is None or used < oldest_used:
+        oldest = key
+        oldest_used = used
+    assert oldest is not None
+    mylib.dict_erase(self.last_used, oldest)
+    return oldest
+
+
 class _DebugFile(object):
 
   def __init__(self):
@@ -20,6 +20,18 @@ class UtilTest(unittest.TestCase):
     n = util.NullDebugFile()
     n.write('foo')
 
+  def testLruKeys(self):
+    lru = util.LruKeys()
+    lru.Touch('a')
+    lru.Touch('b')
+    lru.Touch('c')
+    lru.Touch('a')
+    self.assertEqual('b', lru.PopOldest())
+    self.assertEqual('c', lru.PopOldest())
+    lru.Touch('d')
+    self.assertEqual('a', lru.PopOldest())
+    self.assertEqual('d', lru.PopOldest())
+
 
 if __name__ == '__main__':
   unittest.main()
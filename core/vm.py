@@ -125,6 +125,15 @@ class _Executor(object):
     # type: () -> None
     pass
 
+  def MaybeFlushStdout(self):
+    # type: () -> None
+    """Called at the start of every loop iteration.
+
+    Writes output that builtins left in the buffer if it has been waiting for
+    a while, so a long loop doesn't hold it back.
+    """
+    pass
+
   def PushProcessSub(self):
     # type: () -> None
     pass
@@ -3,12 +3,20 @@
 #include "cpp/core.h"
 
 #include <errno.h>
-#include <pwd.h>  // passwd
+#include <fcntl.h>   // fcntl()
+#include <limits.h>  // PATH_MAX
+#include <pwd.h>    // passwd
 #include <signal.h>
+#include <stdio.h>         // snprintf()
+#include <stdlib.h>        // mkstemp()
+#include <string.h>        // memchr()
+#include <sys/mman.h>      // mmap()
 #include <sys/resource.h>  // getrusage
+#include <sys/stat.h>      // fstat()
+#include <sys/time.h>      // gettimeofday(), setitimer()
 #include <sys/times.h>     // tms / times()
 #include <sys/utsname.h>   // uname
-#include <sys/wait.h>      // waitpid()
+#include <sys/wait.h>      // wait4()
 #include <time.h>          // time()
 #include <unistd.h>        // getuid(), environ
 
@@ -16,15 +24,36 @@ namespace pyos {
 
 static SignalHandler* gSignalHandler = nullptr;
 
-Tuple2<int, int> WaitPid() {
-  int status;
-  int result = ::waitpid(-1, &status, WUNTRACED);
+// User + system CPU seconds of children reaped by WaitPid()
+static double gChildCpuTime = 0.0;
+
+static double TimevalSeconds(const timeval& tv) {
+  return static_cast<double>(tv.tv_sec) + tv.tv_usec / 1e6;
+}
+
+Tuple2<int, int> WaitPid(int waitpid_options) {
+  int status = 0;
+  rusage ru = {};
+  int result = ::wait4(-1, &status, WUNTRACED | waitpid_options, &ru);
   if (result < 0) {
     return Tuple2<int, int>(-1, errno);
   }
+  gChildCpuTime += TimevalSeconds(ru.ru_utime) + TimevalSeconds(ru.ru_stime);
   return Tuple2<int, int>(result, status);
 }
 
+double ChildCpuTime() {
+  return gChildCpuTime;
+}
+
+double WallTime() {
+  timeval tv;
+  if (::gettimeofday(&tv, nullptr) < 0) {
+    throw Alloc<IOError>(errno);
+  }
+  return TimevalSeconds(tv);
+}
+
 Tuple2<int, int> Read(int fd, int n, List<Str*>* chunks) {
   RootsFrame _r{FUNC_NAME};
   Str* s = OverAllocatedStr(n);  // Allocate enough for the result
@@ -56,6 +85,153 @@ Tuple2<int, int> ReadByte(int fd) {
   }
 }
 
+bool IsRegularFile(int fd) {
+  struct stat st;
+  if (::fstat(fd, &st) < 0) {
+    return false;
+  }
+  return S_ISREG(st.st_mode);
+}
+
+int RegularFileSize(int fd) {
+  struct stat st;
+  if (::fstat(fd, &st) < 0) {
+    return -1;
+  }
+  if (!S_ISREG(st.st_mode)) {
+    return -1;
+  }
+  return st.st_size;
+}
+
+bool SameFile(int fd1, int fd2) {
+  struct stat st1;
+  struct stat st2;
+  if (::fstat(fd1, &st1) < 0 || ::fstat(fd2, &st2) < 0) {
+    return false;
+  }
+  return st1.st_dev == st2.st_dev && st1.st_ino == st2.st_ino;
+}
+
+static double StatMtime(const struct stat& st) {
+  return st.st_mtim.tv_sec + st.st_mtim.tv_nsec / 1e9;
+}
+
+MappedFile::MappedFile(int fd, char* data, int size, double mtime)
+    : Obj(Tag::FixedSize, kZeroMask, sizeof(MappedFile)),
+      fd_(fd),
+      data_(data),
+      size_(size),
+      mtime_(mtime) {
+}
+
+bool MappedFile::Changed() {
+  if (fd_ == -1) {  // closed
+    return true;
+  }
+  struct stat st;
+  if (::fstat(fd_, &st) < 0) {
+    return true;
+  }
+  return st.st_size != size_ || StatMtime(st) != mtime_;
+}
+
+Str* MappedFile::Line(int offset) {
+  if (Changed()) {
+    return kEmptyString;
+  }
+  assert(0 <= offset && offset < size_);
+  char* start = data_ + offset;
+  char* newline =
+      static_cast<char*>(memchr(start, '\n', size_ - offset));
+  int len = newline ? newline - start + 1 : size_ - offset;
+  return StrFromC(start, len);
+}
+
+bool MappedFile::IsSameFile(MappedFile* other) {
+  return !Changed() && !other->Changed() && pyos::SameFile(fd_, other->fd_);
+}
+
+void MappedFile::Close() {
+  if (fd_ == -1) {
+    return;
+  }
+  ::munmap(data_, size_);
+  ::close(fd_);
+  fd_ = -1;
+  data_ = nullptr;
+}
+
+MappedFile* MapFile(int fd) {
+  struct stat st;
+  if (::fstat(fd, &st) < 0) {
+    return nullptr;
+  }
+  if (!S_ISREG(st.st_mode) || st.st_size == 0) {
+    return nullptr;
+  }
+
+  void* data = ::mmap(nullptr, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+  if (data == MAP_FAILED) {
+    return nullptr;
+  }
+
+  // Like process.SaveFd(), but child processes shouldn't inherit it
+  int new_fd = ::fcntl(fd, F_DUPFD_CLOEXEC, 100);
+  if (new_fd < 0) {
+    ::munmap(data, st.st_size);
+    return nullptr;
+  }
+  return Alloc<MappedFile>(new_fd, static_cast<char*>(data), st.st_size,
+                           StatMtime(st));
+}
+
+Tuple2<int, int> TempFilePipe(Str* tmp_dir) {
+  char path[PATH_MAX];
+  int n = snprintf(path, sizeof(path), "%.*s/osh-pipe-XXXXXX", len(tmp_dir),
+                   tmp_dir->data_);
+  if (n < 0 || n >= static_cast<int>(sizeof(path))) {
+    return Tuple2<int, int>(-1, -1);
+  }
+  int w = ::mkstemp(path);
+  if (w < 0) {
+    return Tuple2<int, int>(-1, -1);
+  }
+  int r = ::open(path, O_RDONLY);
+  ::unlink(path);
+  if (r < 0) {
+    ::close(w);
+    return Tuple2<int, int>(-1, -1);
+  }
+
+  // Like MapFile(), child processes shouldn't inherit these
+  int new_r = ::fcntl(r, F_DUPFD_CLOEXEC, 100);
+  int new_w = ::fcntl(w, F_DUPFD_CLOEXEC, 100);
+  ::close(r);
+  ::close(w);
+  if (new_r < 0 || new_w < 0) {
+    if (new_r >= 0) {
+      ::close(new_r);
+    }
+    if (new_w >= 0) {
+      ::close(new_w);
+    }
+    return Tuple2<int, int>(-1, -1);
+  }
+  return Tuple2<int, int>(new_r, new_w);
+}
+
+int SeekCur(int fd, int offset) {
+  if (::lseek(fd, offset, SEEK_CUR) < 0) {
+    return errno;
+  }
+  return 0;
+}
+
+int Tell(int fd) {
+  return ::lseek(fd, 0, SEEK_CUR);  // -1 on error
+}
+
 // for read --line
 Str* ReadLine() {
   assert(0);  // Does this get called?
@@ -249,6 +425,48 @@ void RegisterSignalInterest(int sig_num) {
   assert(sigaction(sig_num, &act, nullptr) == 0);
 }
 
+void StartProfiling(int interval_us) {
+  NO_ROOTS_FRAME(FUNC_NAME);  // no allocations here
+  struct sigaction act = {};
+  act.sa_handler = signal_handler;
+  act.sa_flags = SA_RESTART;  // 'wait' and 'read' shouldn't see SIGPROF
+  if (sigaction(SIGPROF, &act, nullptr) != 0) {
+    throw Alloc<OSError>(errno);
+  }
+
+  itimerval timer = {};
+  timer.it_interval.tv_sec = interval_us / 1000000;
+  timer.it_interval.tv_usec = interval_us % 1000000;
+  timer.it_value = timer.it_interval;
+  if (setitimer(ITIMER_PROF, &timer, nullptr) != 0) {
+    throw Alloc<OSError>(errno);
+  }
+}
+
+void StopProfiling() {
+  itimerval timer = {};  // zero disables it
+  setitimer(ITIMER_PROF, &timer, nullptr);
+}
+
+static void flush_stdout_and_die(int sig_num) {
+  // fflush() isn't async-signal-safe, but the process is about to die, and
+  // losing buffered output is worse.
+  fflush(stdout);
+  signal(sig_num, SIG_DFL);
+  raise(sig_num);
+}
+
+void FlushStdoutOnSignal(int sig_num) {
+  NO_ROOTS_FRAME(FUNC_NAME);  // no allocations here
+  struct sigaction old = {};
+  if (sigaction(sig_num, nullptr, &old) != 0 || old.sa_handler != SIG_DFL) {
+    return;  // e.g. ignored with nohup
+  }
+  struct sigaction act = {};
+  act.sa_handler = flush_stdout_and_die;
+  sigaction(sig_num, &act, nullptr);
+}
+
 List<int>* TakeSignalQueue() {
   NO_ROOTS_FRAME(FUNC_NAME);  // SignalHandler::TakeSignalQueue() does it
   assert(gSignalHandler != nullptr);
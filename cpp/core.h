@@ -23,10 +23,36 @@ const int NEWLINE_CH = 10;
 const int UNTRAPPED_SIGWINCH = -1;
 const int kMaxSignalsInFlight = 1024;
 
-Tuple2<int, int> WaitPid();
+Tuple2<int, int> WaitPid(int waitpid_options);
+double ChildCpuTime();
+double WallTime();
 Tuple2<int, int> Read(int fd, int n, List<Str*>* chunks);
 Tuple2<int, int> ReadByte(int fd);
+bool IsRegularFile(int fd);
+int RegularFileSize(int fd);
+bool SameFile(int fd1, int fd2);
+int SeekCur(int fd, int offset);
+int Tell(int fd);
 Str* ReadLine();
+
+class MappedFile : public Obj {
+ public:
+  MappedFile(int fd, char* data, int size, double mtime);
+  bool Changed();
+  Str* Line(int offset);
+  bool IsSameFile(MappedFile* other);
+  void Close();
+
+  int fd_;
+  char* data_;  // from mmap(), not the GC heap
+  int size_;
+  double mtime_;
+
+  DISALLOW_COPY_AND_ASSIGN(MappedFile)
+};
+
+MappedFile* MapFile(int fd);
+Tuple2<int, int> TempFilePipe(Str* tmp_dir);
 Dict<Str*, Str*>* Environ();
 int Chdir(Str* dest_dir);
 Str* GetMyHomeDir();
@@ -74,6 +100,11 @@ void Sigaction(int sig_num, sighandler_t handler);
 
 void RegisterSignalInterest(int sig_num);
 
+void StartProfiling(int interval_us);
+void StopProfiling();
+
+void FlushStdoutOnSignal(int sig_num);
+
 List<int>* TakeSignalQueue();
 
 int LastSignal();
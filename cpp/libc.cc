@@ -7,10 +7,84 @@
 #include <glob.h>
 #include <locale.h>
 #include <regex.h>
+#include <string.h>  // strcmp(), strdup()
 #include <unistd.h>  // gethostname()
 
 namespace libc {
 
+// Cache of compiled regexes, keyed by pattern and cflags.  Like the one in
+// pyext/libc.c.
+
+const int kRegexCacheSize = 32;
+
+struct RegexCacheEntry {
+  char* pattern;  // owned; nullptr means the slot is empty
+  int cflags;
+  char* locale;  // owned; LC_CTYPE when it was compiled
+  regex_t re;
+  unsigned long last_used;
+};
+
+static RegexCacheEntry gRegexCache[kRegexCacheSize];
+static unsigned long gRegexCacheTick = 0;
+static int gRegexCacheHits = 0;
+static int gRegexCacheMisses = 0;
+
+// Returns a compiled regex owned by the cache, which is valid until the next
+// call.  Returns nullptr on a syntax error.
+//
+// How a pattern compiles depends on LC_CTYPE, e.g. whether . matches a UTF-8
+// char or a byte, so the locale is part of the key.
+static regex_t* RegexCacheGet(const char* pattern, int cflags) {
+  gRegexCacheTick++;
+  const char* locale = setlocale(LC_CTYPE, NULL);
+
+  RegexCacheEntry* victim = &gRegexCache[0];
+  for (int i = 0; i < kRegexCacheSize; ++i) {
+    RegexCacheEntry* e = &gRegexCache[i];
+    if (e->pattern == nullptr) {
+      victim = e;
+      continue;
+    }
+    if (e->cflags == cflags && strcmp(e->pattern, pattern) == 0 &&
+        strcmp(e->locale, locale) == 0) {
+      e->last_used = gRegexCacheTick;
+      gRegexCacheHits++;
+      return &e->re;
+    }
+    if (victim->pattern != nullptr && e->last_used < victim->last_used) {
+      victim = e;
+    }
+  }
+  gRegexCacheMisses++;
+
+  regex_t pat;
+  if (regcomp(&pat, pattern, cflags) != 0) {
+    return nullptr;
+  }
+
+  char* pattern_copy = strdup(pattern);
+  char* locale_copy = strdup(locale);
+  if (pattern_copy == nullptr || locale_copy == nullptr) {
+    free(pattern_copy);
+    free(locale_copy);
+    regfree(&pat);
+    throw Alloc<OSError>(ENOMEM);
+  }
+
+  if (victim->pattern != nullptr) {
+    regfree(&victim->re);
+    free(victim->pattern);
+    free(victim->locale);
+  }
+  victim->pattern = pattern_copy;
+  victim->cflags = cflags;
+  victim->locale = locale_copy;
+  victim->re = pat;
+  victim->last_used = gRegexCacheTick;
+  return &victim->re;
+}
+
 Str* gethostname() {
   NO_ROOTS_FRAME(FUNC_NAME);  // OverAllocatedStr() does it
   Str* result = OverAllocatedStr(HOST_NAME_MAX);
@@ -88,24 +162,49 @@ List<Str*>* glob(Str* pat) {
   return matches;
 }
 
+// Sets LC_CTYPE from the environment, so regcomp() and regexec() see UTF-8,
+// and restores the old value when it goes out of scope.
+class CtypeLocale {
+ public:
+  CtypeLocale() {
+    // Copy it, since the next setlocale() may overwrite the string
+    old_locale_ = strdup(setlocale(LC_CTYPE, NULL));
+    if (old_locale_ == nullptr) {
+      throw Alloc<OSError>(ENOMEM);
+    }
+    if (setlocale(LC_CTYPE, "") == NULL) {
+      setlocale(LC_CTYPE, old_locale_);
+      free(old_locale_);
+      throw Alloc<RuntimeError>(StrFromC("Invalid locale for LC_CTYPE"));
+    }
+  }
+  ~CtypeLocale() {
+    setlocale(LC_CTYPE, old_locale_);
+    free(old_locale_);
+  }
+
+ private:
+  char* old_locale_;
+};
+
 // Raises RuntimeError if the pattern is invalid.  TODO: Use a different
 // exception?
 List<Str*>* regex_match(Str* pattern, Str* str) {
   RootsFrame _r{FUNC_NAME};
   List<Str*>* results = NewList<Str*>();
 
-  regex_t pat;
-  if (regcomp(&pat, pattern->data_, REG_EXTENDED) != 0) {
+  regex_t* pat = RegexCacheGet(pattern->data_, REG_EXTENDED);
+  if (pat == nullptr) {
     // TODO: check error code, as in func_regex_parse()
     throw Alloc<RuntimeError>(StrFromC("Invalid regex syntax (regex_match)"));
   }
 
-  int outlen = pat.re_nsub + 1;  // number of captures
+  int outlen = pat->re_nsub + 1;  // number of captures
 
   const char* s0 = str->data_;
   regmatch_t* pmatch =
       static_cast<regmatch_t*>(malloc(sizeof(regmatch_t) * outlen));
-  int match = regexec(&pat, s0, outlen, pmatch, 0) == 0;
+  int match = regexec(pat, s0, outlen, pmatch, 0) == 0;
   if (match) {
     int i;
     for (i = 0; i < outlen; i++) {
@@ -117,7 +216,6 @@ List<Str*>* regex_match(Str* pattern, Str* str) {
   }
 
   free(pmatch);
-  regfree(&pat);
 
   if (!match) {
     return nullptr;
@@ -137,29 +235,24 @@ const int NMATCH = 2;
 // Odd: This a Tuple2* not Tuple2 because it's Optional[Tuple2]!
 Tuple2<int, int>* regex_first_group_match(Str* pattern, Str* str, int pos) {
   RootsFrame _r{FUNC_NAME};
-  regex_t pat;
   regmatch_t m[NMATCH];
+  int result;
+  {
+    CtypeLocale ctype;
 
-  const char* old_locale = setlocale(LC_CTYPE, NULL);
-
-  if (setlocale(LC_CTYPE, "") == NULL) {
-    throw Alloc<RuntimeError>(StrFromC("Invalid locale for LC_CTYPE"));
-  }
+    // Could have been checked by regex_parse for [[ =~ ]], but not for glob
+    // patterns like ${foo/x*/y}.
 
-  // Could have been checked by regex_parse for [[ =~ ]], but not for glob
-  // patterns like ${foo/x*/y}.
+    regex_t* pat = RegexCacheGet(pattern->data_, REG_EXTENDED);
+    if (pat == nullptr) {
+      throw Alloc<RuntimeError>(
+          StrFromC("Invalid regex syntax (func_regex_first_group_match)"));
+    }
 
-  if (regcomp(&pat, pattern->data_, REG_EXTENDED) != 0) {
-    throw Alloc<RuntimeError>(
-        StrFromC("Invalid regex syntax (func_regex_first_group_match)"));
+    // Match at offset 'pos'
+    result = regexec(pat, str->data_ + pos, NMATCH, m, 0 /*flags*/);
   }
 
-  // Match at offset 'pos'
-  int result = regexec(&pat, str->data_ + pos, NMATCH, m, 0 /*flags*/);
-  regfree(&pat);
-
-  setlocale(LC_CTYPE, old_locale);
-
   if (result != 0) {
     return nullptr;
   }
@@ -174,4 +267,39 @@ Tuple2<int, int>* regex_first_group_match(Str* pattern, Str* str, int pos) {
   return tup;
 }
 
+List<Tuple2<int, int>*>* regex_find_all(Str* pattern, Str* str) {
+  RootsFrame _r{FUNC_NAME};
+  CtypeLocale ctype;  // like regex_first_group_match()
+
+  regex_t* pat = RegexCacheGet(pattern->data_, REG_EXTENDED);
+  if (pat == nullptr) {
+    throw Alloc<RuntimeError>(StrFromC("Invalid regex syntax (regex_find_all)"));
+  }
+
+  auto results = NewList<Tuple2<int, int>*>();
+  int n = len(str);
+  int pos = 0;
+  while (pos < n) {  // needed to prevent infinite loop in (.*) case
+    NO_ROOTS_FRAME(LOOP);  // Allocations are retained through `results`
+    regmatch_t m[1];
+    if (regexec(pat, str->data_ + pos, 1, m, 0 /*flags*/) != 0) {
+      break;  // no more matches
+    }
+    int start = pos + m[0].rm_so;
+    int end = pos + m[0].rm_eo;
+    results->append(Alloc<Tuple2<int, int>>(start, end));
+
+    // Advance past the match.  An empty match would otherwise be found again
+    // at the same position.
+    pos = (end == start) ? end + 1 : end;
+  }
+
+  gHeap.RootOnReturn(results);
+  return results;
+}
+
+Tuple2<int, int> regex_cache_stats() {
+  return Tuple2<int, int>(gRegexCacheHits, gRegexCacheMisses);
+}
+
 }  // namespace libc
@@ -29,6 +29,10 @@ Tuple2<int, int>* regex_first_group_match(Str* pattern, Str* str, int pos);
 
 List<Str*>* regex_match(Str* pattern, Str* str);
 
+List<Tuple2<int, int>*>* regex_find_all(Str* pattern, Str* str);
+
+Tuple2<int, int> regex_cache_stats();
+
 }  // namespace libc
 
 #endif  // LIBC_H
@@ -49,6 +49,18 @@ TEST libc_test() {
   ASSERT_EQ_FMT(8, result->at0(), "%d");
   ASSERT_EQ_FMT(10, result->at1(), "%d");
 
+  List<Tuple2<int, int>*>* spans =
+      libc::regex_find_all(StrFromC("X."), s);
+  ASSERT_EQ_FMT(3, len(spans), "%d");
+  ASSERT_EQ_FMT(8, spans->index_(2)->at0(), "%d");
+  ASSERT_EQ_FMT(10, spans->index_(2)->at1(), "%d");
+
+  // All the patterns above were compiled once
+  Tuple2<int, int> stats = libc::regex_cache_stats();
+  log("regex cache hits = %d, misses = %d", stats.at0(), stats.at1());
+  ASSERT_EQ_FMT(2, stats.at0(), "%d");
+  ASSERT_EQ_FMT(4, stats.at1(), "%d");
+
   Str* h = libc::gethostname();
   log("gethostname() = %s %d", h->data_, len(h));
 
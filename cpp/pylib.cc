@@ -49,4 +49,13 @@ bool exists(Str* path) {
   }
 }
 
+double mtime(Str* path) {
+  NO_ROOTS_FRAME(FUNC_NAME);  // No allocations here
+  struct stat st;
+  if (::stat(path->data_, &st) < 0) {
+    return -1;
+  }
+  return st.st_mtim.tv_sec + st.st_mtim.tv_nsec / 1e9;
+}
+
 }  // namespace path_stat
@@ -14,6 +14,7 @@ Str* rstrip_slashes(Str* s);
 namespace path_stat {
 
 bool exists(Str* path);
+double mtime(Str* path);
 
 }  // namespace path_stat
 
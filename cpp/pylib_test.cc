@@ -26,6 +26,16 @@ TEST os_path_test() {
   PASS();
 }
 
+TEST path_stat_test() {
+  ASSERT(path_stat::exists(StrFromC("/")));
+  ASSERT(path_stat::mtime(StrFromC("/")) > 0);
+
+  ASSERT(!path_stat::exists(StrFromC("/nonexistent__")));
+  ASSERT_EQ(-1, path_stat::mtime(StrFromC("/nonexistent__")));
+
+  PASS();
+}
+
 GREATEST_MAIN_DEFS();
 
 int main(int argc, char** argv) {
@@ -34,6 +44,7 @@ int main(int argc, char** argv) {
   GREATEST_MAIN_BEGIN();
 
   RUN_TEST(os_path_test);
+  RUN_TEST(path_stat_test);
 
   gHeap.CleanProcessExit();
 
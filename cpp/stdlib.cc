@@ -6,6 +6,7 @@
 #include <errno.h>
 #include <fcntl.h>      // open
 #include <signal.h>     // kill
+#include <spawn.h>      // posix_spawn
 #include <sys/stat.h>   // umask
 #include <sys/types.h>  // umask
 #include <sys/wait.h>   // WUNTRACED
@@ -79,10 +80,9 @@ mylib::LineReader* fdopen(int fd, Str* c_mode) {
   return Alloc<mylib::CFileLineReader>(f);
 }
 
-void execve(Str* argv0, List<Str*>* argv, Dict<Str*, Str*>* environ) {
-  NO_ROOTS_FRAME(FUNC_NAME);  // GC heap isn't used here
+// Returns an array for execve() or posix_spawn().  The strings aren't copied.
+static char** MakeArgv(List<Str*>* argv) {
   int n_args = len(argv);
-  // never deallocated
   char** _argv = static_cast<char**>(malloc((n_args + 1) * sizeof(char*)));
 
   // Annoying const_cast
@@ -91,8 +91,11 @@ void execve(Str* argv0, List<Str*>* argv, Dict<Str*, Str*>* environ) {
     _argv[i] = const_cast<char*>(argv->index_(i)->data_);
   }
   _argv[n_args] = nullptr;
+  return _argv;
+}
 
-  // Convert environ into an array of pointers to strings of the form: "k=v".
+// Convert environ into an array of pointers to strings of the form: "k=v".
+static char** MakeEnvp(Dict<Str*, Str*>* environ) {
   int n_env = len(environ);
   char** envp = static_cast<char**>(malloc((n_env + 1) * sizeof(char*)));
 
@@ -111,6 +114,14 @@ void execve(Str* argv0, List<Str*>* argv, Dict<Str*, Str*>* environ) {
     envp[env_index++] = buf;
   }
   envp[n_env] = nullptr;
+  return envp;
+}
+
+void execve(Str* argv0, List<Str*>* argv, Dict<Str*, Str*>* environ) {
+  NO_ROOTS_FRAME(FUNC_NAME);  // GC heap isn't used here
+  // never deallocated
+  char** _argv = MakeArgv(argv);
+  char** envp = MakeEnvp(environ);
 
   int ret = ::execve(argv0->data_, _argv, envp);
   if (ret == -1) {
@@ -124,6 +135,38 @@ void execve(Str* argv0, List<Str*>* argv, Dict<Str*, Str*>* environ) {
   InvalidCodePath();
 }
 
+int posix_spawn(Str* argv0, List<Str*>* argv, Dict<Str*, Str*>* environ,
+                List<int>* default_sigs) {
+  NO_ROOTS_FRAME(FUNC_NAME);  // GC heap isn't used here
+  char** _argv = MakeArgv(argv);
+  char** envp = MakeEnvp(environ);
+
+  posix_spawnattr_t attr;
+  posix_spawnattr_init(&attr);
+  sigset_t sigs;
+  sigemptyset(&sigs);
+  for (int i = 0; i < len(default_sigs); ++i) {
+    sigaddset(&sigs, default_sigs->index_(i));
+  }
+  posix_spawnattr_setsigdefault(&attr, &sigs);
+  posix_spawnattr_setflags(&attr, POSIX_SPAWN_SETSIGDEF);
+
+  pid_t pid;
+  int err = ::posix_spawn(&pid, argv0->data_, nullptr, &attr, _argv, envp);
+  posix_spawnattr_destroy(&attr);
+
+  for (char** e = envp; *e; ++e) {
+    free(*e);
+  }
+  free(envp);
+  free(_argv);
+
+  if (err != 0) {
+    throw Alloc<OSError>(err);
+  }
+  return pid;
+}
+
 void kill(int pid, int sig) {
   NO_ROOTS_FRAME(FUNC_NAME);  // No allocations here
   if (::kill(pid, sig) != 0) {
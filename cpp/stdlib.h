@@ -101,6 +101,9 @@ mylib::LineReader* fdopen(int fd, Str* c_mode);
 
 void execve(Str* argv0, List<Str*>* argv, Dict<Str*, Str*>* environ);
 
+int posix_spawn(Str* argv0, List<Str*>* argv, Dict<Str*, Str*>* environ,
+                List<int>* default_sigs);
+
 void kill(int pid, int sig);
 
 }  // namespace posix
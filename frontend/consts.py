@@ -12,7 +12,7 @@ from frontend import builtin_def
 from frontend import lexer_def
 from frontend import option_def 
 
-from typing import Tuple, Optional, TYPE_CHECKING
+from typing import Tuple, Optional, Dict, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.option_asdl import option_t, builtin_t
 
@@ -37,19 +37,32 @@ VISIBLE_SHOPT_NUMS = option_def.VISIBLE_SHOPT_NUMS  # used to print
 BUILTIN_NAMES = builtin_def.BUILTIN_NAMES  # Used by builtin_comp.py
 
 
+# Filled on first use.  The function-level import breaks a circular dep, but
+# doing it on every call is slow: GetKind() is called for nearly every token.
+_ID_TO_KIND = {}  # type: Dict[Id_t, Kind_t]
+_BOOL_ARG_TYPES = {}  # type: Dict[Id_t, bool_arg_type_t]
+
+
+def _LoadIdTables():
+  # type: () -> None
+  from _devbuild.gen.id_kind import ID_TO_KIND, BOOL_ARG_TYPES  # break circular dep
+  _ID_TO_KIND.update(ID_TO_KIND)
+  _BOOL_ARG_TYPES.update(BOOL_ARG_TYPES)
+
+
 def GetKind(id_):
   # type: (Id_t) -> Kind_t
   """To make coarse-grained parsing decisions."""
-
-  from _devbuild.gen.id_kind import ID_TO_KIND  # break circular dep
-  return ID_TO_KIND[id_]
+  if not _ID_TO_KIND:
+    _LoadIdTables()
+  return _ID_TO_KIND[id_]
 
 
 def BoolArgType(id_):
   # type: (Id_t) -> bool_arg_type_t
-
-  from _devbuild.gen.id_kind import BOOL_ARG_TYPES  # break circular dep
-  return BOOL_ARG_TYPES[id_]
+  if not _BOOL_ARG_TYPES:
+    _LoadIdTables()
+  return _BOOL_ARG_TYPES[id_]
 
 
 #
@@ -91,6 +91,7 @@ SHOPT_SPEC.ShortFlag('-q')  # query option settings
 
 HASH_SPEC = FlagSpec('hash')
 HASH_SPEC.ShortFlag('-r')
+HASH_SPEC.ShortFlag('-s')  # OSH extension: print cache stats
 
 
 ECHO_SPEC = FlagSpec('echo')
@@ -77,15 +77,6 @@ class _MatchOshToken_Slow(object):
     return _LongestMatch(re_list, line, start_pos)
 
 
-def _MatchOshToken_Fast(lex_mode, line, start_pos):
-  # type: (lex_mode_t, str, int) -> Tuple[Id_t, int]
-  """Returns (Id, end_pos)."""
-  tok_type, end_pos = fastlex.MatchOshToken(lex_mode, line, start_pos)
-  # IMPORTANT: We're reusing Id instances here.  Ids are very common, so this
-  # saves memory.
-  return tok_type, end_pos
-
-
 class _MatchTokenSlow(object):
   def __init__(self, pat_list):
     # type: (List[Tuple[bool, str, Id_t]]) -> None
@@ -96,51 +87,16 @@ class _MatchTokenSlow(object):
     return _LongestMatch(self.pat_list, line, start_pos)
 
 
-def _MatchEchoToken_Fast(line, start_pos):
-  # type: (str, int) -> Tuple[Id_t, int]
-  """Returns (id, end_pos)."""
-  tok_type, end_pos = fastlex.MatchEchoToken(line, start_pos)
-  return tok_type, end_pos
-
-def _MatchGlobToken_Fast(line, start_pos):
-  # type: (str, int) -> Tuple[Id_t, int]
-  """Returns (id, end_pos)."""
-  tok_type, end_pos = fastlex.MatchGlobToken(line, start_pos)
-  return tok_type, end_pos
-
-def _MatchPS1Token_Fast(line, start_pos):
-  # type: (str, int) -> Tuple[Id_t, int]
-  """Returns (id, end_pos)."""
-  tok_type, end_pos = fastlex.MatchPS1Token(line, start_pos)
-  return tok_type, end_pos
-
-def _MatchHistoryToken_Fast(line, start_pos):
-  # type: (str, int) -> Tuple[Id_t, int]
-  """Returns (id, end_pos)."""
-  tok_type, end_pos = fastlex.MatchHistoryToken(line, start_pos)
-  return tok_type, end_pos
-
-def _MatchBraceRangeToken_Fast(line, start_pos):
-  # type: (str, int) -> Tuple[Id_t, int]
-  """Returns (id, end_pos)."""
-  tok_type, end_pos = fastlex.MatchBraceRangeToken(line, start_pos)
-  return tok_type, end_pos
-
-#def _MatchQsnToken_Fast(line, start_pos):
-#  # type: (str, int) -> Tuple[Id_t, int]
-#  """Returns (id, end_pos)."""
-#  tok_type, end_pos = fastlex.MatchQsnToken(line, start_pos)
-#  return tok_type, end_pos
-
-
 if fastlex:
-  OneToken = _MatchOshToken_Fast
-  ECHO_MATCHER = _MatchEchoToken_Fast
-  GLOB_MATCHER = _MatchGlobToken_Fast
-  PS1_MATCHER = _MatchPS1Token_Fast
-  HISTORY_MATCHER = _MatchHistoryToken_Fast
-  BRACE_RANGE_MATCHER = _MatchBraceRangeToken_Fast
-  #QSN_MATCHER = _MatchQsnToken_Fast
+  # Bind the C functions directly.  A Python wrapper that unpacks and repacks
+  # the (Id, end_pos) tuple costs an extra frame for every token.
+  OneToken = fastlex.MatchOshToken
+  ECHO_MATCHER = fastlex.MatchEchoToken
+  GLOB_MATCHER = fastlex.MatchGlobToken
+  PS1_MATCHER = fastlex.MatchPS1Token
+  HISTORY_MATCHER = fastlex.MatchHistoryToken
+  BRACE_RANGE_MATCHER = fastlex.MatchBraceRangeToken
+  #QSN_MATCHER = fastlex.MatchQsnToken
   IsValidVarName = fastlex.IsValidVarName
   ShouldHijack = fastlex.ShouldHijack
   LooksLikeInteger = fastlex.LooksLikeInteger
@@ -268,6 +268,12 @@ def _Init(opt_def):
   # On in interactive shell
   opt_def.Add('redefine_module', default=False)
 
+  # Time builtins, procs, and external commands, and report at exit
+  opt_def.Add('perf_counters')
+
+  # Index executables in $PATH at interactive startup, for the first TAB
+  opt_def.Add('prewarm_completion')
+
   # For disabling strict_errexit while running traps.  Because we run in the
   # main loop, the value can be "off".  Prefix with _ because it's undocumented
   # and users shouldn't fiddle with it.  We need a stack so this is a
@@ -11,6 +11,7 @@ from _devbuild.gen import grammar_nt
 
 from core.pyerror import p_die
 from core import state
+from frontend import consts
 from frontend import lexer
 from frontend import reader
 from frontend import match
@@ -255,6 +256,24 @@ class ParseContext(object):
     # type: (bool) -> None
     self.one_pass_parse = b
 
+  def ParseOptionString(self):
+    # type: () -> str
+    """Like calling every method of optview.Parse, but faster.
+
+    Used to tell whether a saved parse is still valid.
+    """
+    opt0_array = self.parse_opts.opt0_array
+    opt_stacks = self.parse_opts.opt_stacks
+    chars = []  # type: List[str]
+    for opt_num in consts.PARSE_OPTION_NUMS:
+      overlay = opt_stacks[opt_num]
+      if overlay is not None and len(overlay):
+        b = overlay[-1]
+      else:
+        b = opt0_array[opt_num]
+      chars.append('1' if b else '0')
+    return ''.join(chars)
+
   def MakeLexer(self, line_reader):
     # type: (_Reader) -> Lexer
     """Helper function.
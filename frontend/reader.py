@@ -10,6 +10,7 @@ reader.py - Read lines of input.
 
 from mycpp import mylib
 
+from core import pyos
 from core.pyerror import p_die
 
 from typing import Optional, Tuple, List, Union, IO, TYPE_CHECKING
@@ -71,6 +72,10 @@ class DisallowedLineReader(_Reader):
     p_die("Here docs aren't allowed in expressions", token=self.blame_token)
 
 
+# Smaller files aren't worth a descriptor and a mapping
+_MAP_MIN_SIZE = 1 << 16
+
+
 class FileLineReader(_Reader):
   """For -c and stdin?"""
 
@@ -84,6 +89,56 @@ class FileLineReader(_Reader):
     self.f = f
     self.last_line_hint = False
 
+    self.mapped = None  # type: Optional[pyos.MappedFile]
+    self.offset = 0  # of the next line, when mapped
+    self.first_line_id = -1
+
+  def MapFile(self):
+    # type: () -> None
+    """Record where lines are, so the arena doesn't have to keep them.
+
+    Called by 'source' on a file it just opened.  Call DropLines() when done.
+    """
+    fd = self.f.fileno()
+    if pyos.RegularFileSize(fd) >= _MAP_MIN_SIZE:
+      mapped = pyos.MapFile(fd)
+      if mapped is not None:
+        self.mapped = self.arena.AddMappedFile(mapped)
+
+  def DropLines(self):
+    # type: () -> None
+    """Called after the whole file has been parsed and executed."""
+    if self.mapped is not None and self.first_line_id != -1:
+      self.arena.DropFileLines(self.mapped, self.first_line_id)
+
+  def SkipLines(self, n):
+    # type: (int) -> None
+    """Read past lines that were already parsed, e.g. by core/parse_cache.py"""
+    for _ in xrange(n):
+      line = self._GetLine()
+      if line is None:
+        break
+      self.line_num += 1
+      self.offset += len(line)
+
+  def GetLine(self):
+    # type: () -> Tuple[int, Optional[str], int]
+    if self.mapped is None:
+      return _Reader.GetLine(self)
+
+    line = self._GetLine()
+    if line is None:
+      eof_line = None  # type: Optional[str]
+      return -1, eof_line, 0
+
+    line_id = self.arena.AddFileLine(line, self.line_num, self.mapped,
+                                     self.offset)
+    if self.first_line_id == -1:
+      self.first_line_id = line_id
+    self.line_num += 1
+    self.offset += len(line)
+    return line_id, line, 0
+
   def _GetLine(self):
     # type: () -> Optional[str]
     line = self.f.readline()
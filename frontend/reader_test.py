@@ -4,6 +4,8 @@ reader_test.py: Tests for reader.py
 """
 
 import cStringIO
+import os
+import tempfile
 import unittest
 
 from _devbuild.gen.syntax_asdl import source
@@ -44,6 +46,93 @@ class ReaderTest(unittest.TestCase):
       self.assertEqual((1, 'two', 0), r.GetLine())
       self.assertEqual((-1, None, 0), r.GetLine())
 
+  def testMappedFileLines(self):
+    arena = alloc.Arena()
+    arena.PushSource(source.MainFile('reader_test.py'))
+
+    fd, path = tempfile.mkstemp()
+    lines = ['echo line %d\n' % i for i in xrange(10000)] + ['last']
+    os.write(fd, ''.join(lines))
+    os.close(fd)
+
+    try:
+      f = open(path)
+      r = reader.FileLineReader(f, arena)
+      r.MapFile()
+      self.assertNotEqual(None, r.mapped)
+
+      arena.AddLine('in memory\n', 1)  # e.g. from 'eval'
+      line_ids = []
+      for expected in lines:
+        line_id, line, _ = r.GetLine()
+        self.assertEqual(expected, line)
+        line_ids.append(line_id)
+      self.assertEqual((-1, None, 0), r.GetLine())
+
+      r.DropLines()
+      f.close()
+
+      # The copies are gone, but lines are still available
+      self.assertEqual('', arena.line_vals[line_ids[5]])
+      self.assertEqual('in memory\n', arena.GetLine(0))
+      for i, line_id in enumerate(line_ids):
+        self.assertEqual(lines[i], arena.GetLine(line_id))
+
+      # The mapping is no longer valid
+      with open(path, 'w') as f:
+        f.write('echo changed\n')
+      self.assertEqual('', arena.GetLine(line_ids[0]))
+
+    finally:
+      os.unlink(path)
+
+  def testMappingIsShared(self):
+    arena = alloc.Arena()
+    arena.PushSource(source.MainFile('reader_test.py'))
+
+    fd, path = tempfile.mkstemp()
+    os.write(fd, 'echo hi\n' * 10000)
+    os.close(fd)
+
+    try:
+      mappings = []
+      for _ in xrange(3):
+        with open(path) as f:
+          r = reader.FileLineReader(f, arena)
+          r.MapFile()
+          while r.GetLine()[0] != -1:
+            pass
+          r.DropLines()
+        mappings.append(r.mapped)
+
+      # Sourcing the same file again doesn't use another descriptor
+      self.assertNotEqual(None, mappings[0])
+      self.assertEqual(mappings[0], mappings[1])
+      self.assertEqual(mappings[0], mappings[2])
+      self.assertEqual(1, len(arena.mapped_files))
+
+      # After the file changes, the old mapping is closed
+      with open(path, 'w') as f:
+        f.write('echo changed\n' * 10000)
+      with open(path) as f:
+        r = reader.FileLineReader(f, arena)
+        r.MapFile()
+      self.assertNotEqual(mappings[0], r.mapped)
+      self.assertEqual(-1, mappings[0].fd)
+      self.assertEqual([r.mapped], arena.mapped_files)
+      r.mapped.Close()
+
+    finally:
+      os.unlink(path)
+
+  def testSmallFileNotMapped(self):
+    arena = test_lib.MakeArena('<reader_test.py>')
+    f = open(__file__)
+    r = reader.FileLineReader(f, arena)
+    r.MapFile()
+    self.assertEqual(None, r.mapped)
+    f.close()
+
 
 if __name__ == '__main__':
   unittest.main()
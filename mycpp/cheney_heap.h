@@ -68,8 +68,6 @@
 // This pushes local variables onto the global data structure managed by the
 // GC.
 
-// TODO: Dicts should actually use hashing!  Test computational complexity.
-
 // Memory allocation APIs:
 //
 // - Alloc<Foo>(x)
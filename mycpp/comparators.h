@@ -18,6 +18,10 @@ bool are_equal(Tuple2<Str*, int>* t1, Tuple2<Str*, int>* t2);
 bool keys_equal(int left, int right);
 bool keys_equal(Str* left, Str* right);
 
+// Non-negative hashes for Dict
+int hash_key(int i);
+int hash_key(Str* s);
+
 namespace id_kind_asdl {
 enum class Kind;
 };
@@ -0,0 +1,92 @@
+#!/usr/bin/env python2
+"""
+dicts.py: Test and benchmark Dict with many keys.
+"""
+from __future__ import print_function
+
+import os
+
+from mycpp import mylib
+from mycpp.mylib import log, iteritems
+
+from typing import Dict
+
+
+def IntKeys(n):
+  # type: (int) -> int
+  d = {}  # type: Dict[int, int]
+  i = 0
+  while i < n:
+    d[i * 7] = i
+    i += 1
+
+  total = 0
+  i = 0
+  while i < n:
+    total += d[i * 7]
+    if (i * 7 + 1) in d:  # never true
+      total += 1
+    i += 1
+  return total
+
+
+def StrKeys(n):
+  # type: (int) -> int
+  d = {}  # type: Dict[str, int]
+  i = 0
+  while i < n:
+    d['k%d' % i] = i
+    i += 1
+
+  total = 0
+  i = 0
+  while i < n:
+    # Fresh strings, so the cached hash doesn't help
+    total += d['k%d' % i]
+    i += 1
+  return total
+
+
+def EraseAndInsert(n):
+  # type: (int) -> int
+  d = {}  # type: Dict[str, int]
+  d['a'] = 1
+  d['b'] = 2
+  i = 0
+  while i < n:
+    d['x'] = i
+    mylib.dict_erase(d, 'x')
+    i += 1
+  d['c'] = 3
+
+  total = 0
+  for k, v in iteritems(d):
+    total += v
+  log('len(d) = %d', len(d))
+  return total
+
+
+def run_tests():
+  # type: () -> None
+
+  log('IntKeys = %d', IntKeys(1000))
+  log('StrKeys = %d', StrKeys(1000))
+  log('EraseAndInsert = %d', EraseAndInsert(100))
+
+
+def run_benchmarks():
+  # type: () -> None
+
+  # Lookups were a linear scan, so these sizes would have been quadratic
+  for n in [100000, 300000, 1000000]:
+    log('IntKeys(%d) = %d', n, IntKeys(n))
+    log('StrKeys(%d) = %d', n, StrKeys(n))
+  log('EraseAndInsert = %d', EraseAndInsert(1000000))
+
+
+if __name__ == '__main__':
+  if os.getenv('BENCHMARK'):
+    log('Benchmarking...')
+    run_benchmarks()
+  else:
+    run_tests()
@@ -237,6 +237,16 @@ bool keys_equal(Str* left, Str* right) {
   return are_equal(left, right);
 }
 
+int hash_key(int i) {
+  // Multiplicative hashing, so consecutive ints don't form long probe runs
+  unsigned h = static_cast<unsigned>(i) * 2654435761u;
+  return (h ^ (h >> 16)) & 0x7fffffff;
+}
+
+int hash_key(Str* s) {
+  return s->hash();
+}
+
 bool are_equal(Tuple2<Str*, int>* t1, Tuple2<Str*, int>* t2) {
   bool result = are_equal(t1->at0(), t2->at0());
   result = result && (t1->at1() == t2->at1());
@@ -3,8 +3,14 @@
 
 #include "mycpp/comparators.h"
 
-// Non-negative entries in entry_ are array indices into keys_ and values_.
-// There are two special negative entries.
+// A Dict is laid out like CPython 3.6's "compact dict":
+//
+// - keys_ and values_ are DENSE arrays, in insertion order.
+// - entry_ is parallel to them.  Each entry is kEmptyEntry, kDeletedEntry, or
+//   the (non-negative) hash of the key, so we don't recompute hashes when
+//   resizing, and can skip most keys_equal() calls.
+// - table_ is a SPARSE open addressing hash table, with linear probing.  Its
+//   entries are kEmptyEntry, kDeletedEntry, or a position in the dense arrays.
 
 // index that means this Dict item was deleted (a tombstone).
 const int kDeletedEntry = -1;
@@ -43,16 +49,20 @@ class _DummyDict {
   OBJ_HEADER()
   int len_;
   int capacity_;
+  int num_used_;
+  int table_len_;
   void* entry_;
   void* keys_;
   void* values_;
+  void* table_;
 };
 
-// A dict has 3 pointers the GC needs to follow.
+// A dict has 4 pointers the GC needs to follow.
 constexpr uint16_t maskof_Dict() {
   return maskbit(offsetof(_DummyDict, entry_)) |
          maskbit(offsetof(_DummyDict, keys_)) |
-         maskbit(offsetof(_DummyDict, values_));
+         maskbit(offsetof(_DummyDict, values_)) |
+         maskbit(offsetof(_DummyDict, table_));
 }
 
 template <class K, class V>
@@ -61,18 +71,24 @@ class Dict : public Obj {
   Dict() : Obj(Tag::FixedSize, maskof_Dict(), sizeof(Dict)) {
     assert(len_ == 0);
     assert(capacity_ == 0);
+    assert(num_used_ == 0);
+    assert(table_len_ == 0);
     assert(entry_ == nullptr);
     assert(keys_ == nullptr);
     assert(values_ == nullptr);
+    assert(table_ == nullptr);
   }
 
   Dict(std::initializer_list<K> keys, std::initializer_list<V> values)
       : Obj(Tag::FixedSize, maskof_Dict(), sizeof(Dict)) {
     assert(len_ == 0);
     assert(capacity_ == 0);
+    assert(num_used_ == 0);
+    assert(table_len_ == 0);
     assert(entry_ == nullptr);
     assert(keys_ == nullptr);
     assert(values_ == nullptr);
+    assert(table_ == nullptr);
   }
 
   // This relies on the fact that containers of 4-byte ints are reduced by 2
@@ -82,6 +98,8 @@ class Dict : public Obj {
   static_assert(kSlabHeaderSize % sizeof(int) == 0,
                 "Slab header size should be multiple of key size");
 
+  // Ensure there's room for n live entries, and at least one more entry in the
+  // dense arrays.
   void reserve(int n);
 
   // d[key] in Python: raises KeyError if not found
@@ -107,32 +125,40 @@ class Dict : public Obj {
 
   void clear();
 
-  // Returns the position in the array.  Used by dict_contains(), index(),
-  // get(), and set().
+  // Returns the position in the dense arrays.  Used by dict_contains(),
+  // index(), get(), and set().
   //
-  // For now this does a linear search.
-  // TODO:
-  // - hash functions, and linear probing.
-  // - resizing based on load factor
-  //   - which requires rehashing (re-insert all items)
-  // - Special case to intern Str* when it's hashed?  How?
+  // TODO: Special case to intern Str* when it's hashed?  How?
   //   - Should we have wrappers like:
   //   - V GetAndIntern<V>(D, &string_key)
   //   - SetAndIntern<V>(D, &string_key, value)
   //   This will enable duplicate copies of the string to be garbage collected
   int position_of_key(K key);
 
-  // int index_size_;  // size of index (sparse)
-  int len_;       // number of entries (keys and values, almost dense)
-  int capacity_;  // number of entries before resizing
+  // Returns the slot in table_ that points to the key, or -1.  Used by
+  // mylib::dict_erase().
+  int slot_of_key(K key);
+
+  // Appends a key that's not in the dict.  The caller must reserve() room.
+  // Doesn't allocate.
+  void append_entry(K key, V val);
+
+  // Allocates new slabs with room for n entries, dropping deleted entries and
+  // rebuilding table_.
+  void rehash(int n);
+
+  int len_;        // number of live entries
+  int capacity_;   // number of entries before resizing
+  int num_used_;   // number of entries used, including deleted ones
+  int table_len_;  // size of table_, a power of 2
 
-  // These 3 slabs are resized at the same time.
-  Slab<int>* entry_;  // NOW: kEmptyEntry, kDeletedEntry, or 0.
-                      // LATER: indices which are themselves indexed by // hash
-                      // value % capacity_
+  // These 3 DENSE slabs are resized at the same time.
+  Slab<int>* entry_;  // kEmptyEntry, kDeletedEntry, or hash of the key
   Slab<K>* keys_;     // Dict<int, V>
   Slab<V>* values_;   // Dict<K, int>
 
+  Slab<int>* table_;  // SPARSE hash table of positions
+
   DISALLOW_COPY_AND_ASSIGN(Dict)
 };
 
@@ -165,44 +191,77 @@ Dict<K, V>* NewDict(std::initializer_list<K> keys,
 
 template <typename K, typename V>
 void Dict<K, V>::reserve(int n) {
+  if (capacity_ < n) {
+    rehash(n);
+  } else if (num_used_ == capacity_) {
+    rehash(capacity_);  // same size, but drop deleted entries
+  }
+}
+
+template <typename K, typename V>
+void Dict<K, V>::rehash(int n) {
   auto self = this;
-  Slab<int>* new_i = nullptr;
+  Slab<int>* new_e = nullptr;
   Slab<K>* new_k = nullptr;
   Slab<V>* new_v = nullptr;
-  StackRoots _roots({&self, &new_i, &new_k, &new_v});
+  Slab<int>* new_i = nullptr;
+  StackRoots _roots({&self, &new_e, &new_k, &new_v, &new_i});
 
-  // log("--- reserve %d", capacity_);
-  //
-  if (self->capacity_ < n) {  // TODO: use load factor, not exact fit
-    // calculate the number of keys and values we should have
-    self->capacity_ = RoundUp(n + kCapacityAdjust) - kCapacityAdjust;
-
-    // TODO: This is SPARSE.  How to compute a size that ensures a decent
-    // load factor?
-    int index_len = self->capacity_;
-    new_i = NewSlab<int>(index_len);
-
-    // For the linear search to work
-    for (int i = 0; i < index_len; ++i) {
-      new_i->items_[i] = kEmptyEntry;
-    }
+  // log("--- rehash %d -> %d", self->capacity_, n);
 
-    // These are DENSE.
-    new_k = NewSlab<K>(self->capacity_);
-    new_v = NewSlab<V>(self->capacity_);
+  // calculate the number of keys and values we should have
+  int capacity = RoundUp(n + kCapacityAdjust) - kCapacityAdjust;
 
-    if (self->keys_ != nullptr) {
-      // Right now the index is the same size as keys and values.
-      memcpy(new_i->items_, self->entry_->items_, self->len_ * sizeof(int));
+  // Keep the load factor of table_ at or below 3/4
+  int table_len = 8;
+  while (table_len * 3 < capacity * 4) {
+    table_len *= 2;
+  }
+
+  // These are DENSE.
+  new_e = NewSlab<int>(capacity);
+  new_k = NewSlab<K>(capacity);
+  new_v = NewSlab<V>(capacity);
 
-      memcpy(new_k->items_, self->keys_->items_, self->len_ * sizeof(K));
-      memcpy(new_v->items_, self->values_->items_, self->len_ * sizeof(V));
+  // This is SPARSE.
+  new_i = NewSlab<int>(table_len);
+
+  for (int i = 0; i < capacity; ++i) {
+    new_e->items_[i] = kEmptyEntry;
+  }
+  for (int i = 0; i < table_len; ++i) {
+    new_i->items_[i] = kEmptyEntry;
+  }
+
+  // Copy live entries, which compacts them, and re-insert them into table_.
+  int mask = table_len - 1;
+  int j = 0;
+  for (int i = 0; i < self->num_used_; ++i) {
+    int h = self->entry_->items_[i];
+    if (h == kDeletedEntry) {
+      continue;
     }
+    new_e->items_[j] = h;
+    new_k->items_[j] = self->keys_->items_[i];
+    new_v->items_[j] = self->values_->items_[i];
 
-    self->entry_ = new_i;
-    self->keys_ = new_k;
-    self->values_ = new_v;
+    int slot = h & mask;
+    while (new_i->items_[slot] != kEmptyEntry) {
+      slot = (slot + 1) & mask;
+    }
+    new_i->items_[slot] = j;
+    ++j;
   }
+  assert(j == self->len_);
+
+  self->capacity_ = capacity;
+  self->num_used_ = j;
+  self->table_len_ = table_len;
+
+  self->entry_ = new_e;
+  self->keys_ = new_k;
+  self->values_ = new_v;
+  self->table_ = new_i;
 }
 
 // d[key] in Python: raises KeyError if not found
@@ -253,47 +312,78 @@ List<V>* Dict<K, V>::values() {
 
 template <typename K, typename V>
 void Dict<K, V>::clear() {
+  if (entry_ == nullptr) {
+    return;
+  }
+
   // Maintain invariant
-  for (int i = 0; i < capacity_; ++i) {
+  for (int i = 0; i < num_used_; ++i) {
     entry_->items_[i] = kEmptyEntry;
   }
+  for (int i = 0; i < table_len_; ++i) {
+    table_->items_[i] = kEmptyEntry;
+  }
 
-  memset(keys_->items_, 0, len_ * sizeof(K));    // zero for GC scan
-  memset(values_->items_, 0, len_ * sizeof(V));  // zero for GC scan
+  memset(keys_->items_, 0, num_used_ * sizeof(K));    // zero for GC scan
+  memset(values_->items_, 0, num_used_ * sizeof(V));  // zero for GC scan
   len_ = 0;
+  num_used_ = 0;
 }
 
-// Returns the position in the array.  Used by dict_contains(), index(),
-// get(), and set().
-//
-// For now this does a linear search.
-// TODO:
-// - hash functions, and linear probing.
-// - resizing based on load factor
-//   - which requires rehashing (re-insert all items)
-// - Special case to intern Str* when it's hashed?  How?
-//   - Should we have wrappers like:
-//   - V GetAndIntern<V>(D, &string_key)
-//   - SetAndIntern<V>(D, &string_key, value)
-//   This will enable duplicate copies of the string to be garbage collected
+// Returns the slot in table_, or -1.  This doesn't allocate.
 template <typename K, typename V>
-int Dict<K, V>::position_of_key(K key) {
-  auto self = this;
-  StackRoots _roots({&self});
+int Dict<K, V>::slot_of_key(K key) {
+  if (table_ == nullptr) {
+    return -1;  // empty dict
+  }
 
-  for (int i = 0; i < self->capacity_; ++i) {
-    int special = self->entry_->items_[i];  // NOT an index now
-    if (special == kDeletedEntry) {
-      continue;  // keep searching
-    }
-    if (special == kEmptyEntry) {
+  int h = hash_key(key);
+  int mask = table_len_ - 1;
+  int slot = h & mask;
+  while (true) {
+    int pos = table_->items_[slot];
+    if (pos == kEmptyEntry) {
       return -1;  // not found
     }
-    if (keys_equal(self->keys_->items_[i], key)) {
-      return i;
+    // Compare hashes first, which avoids most string comparisons
+    if (pos != kDeletedEntry && entry_->items_[pos] == h &&
+        keys_equal(keys_->items_[pos], key)) {
+      return slot;
     }
+    slot = (slot + 1) & mask;  // keep searching
+  }
+}
+
+template <typename K, typename V>
+int Dict<K, V>::position_of_key(K key) {
+  int slot = slot_of_key(key);
+  if (slot == -1) {
+    return -1;
   }
-  return -1;  // table is completely full?  Does this happen?
+  return table_->items_[slot];
+}
+
+template <typename K, typename V>
+void Dict<K, V>::append_entry(K key, V val) {
+  assert(num_used_ < capacity_);
+
+  int h = hash_key(key);
+  int pos = num_used_;
+  entry_->items_[pos] = h;
+  keys_->items_[pos] = key;
+  values_->items_[pos] = val;
+
+  // The key isn't in the dict, so we can reuse deleted slots.  There's always
+  // a free slot because capacity_ < table_len_.
+  int mask = table_len_ - 1;
+  int slot = h & mask;
+  while (table_->items_[slot] >= 0) {
+    slot = (slot + 1) & mask;
+  }
+  table_->items_[slot] = pos;
+
+  ++num_used_;
+  ++len_;
 }
 
 // Four overloads for dict_set()!  TODO: Is there a nicer way to do this?
@@ -303,12 +393,7 @@ void dict_set(Dict<K, V>* self, K key, V val) {
   StackRoots _roots({&self});
 
   self->reserve(self->len_ + 1);
-  self->keys_->items_[self->len_] = key;
-  self->values_->items_[self->len_] = val;
-
-  self->entry_->items_[self->len_] = 0;  // new special value
-
-  ++self->len_;
+  self->append_entry(key, val);
 }
 
 // e.g. Dict<Str*, int>
@@ -317,12 +402,7 @@ void dict_set(Dict<K*, V>* self, K* key, V val) {
   StackRoots _roots({&self, &key});
 
   self->reserve(self->len_ + 1);
-  self->keys_->items_[self->len_] = key;
-  self->values_->items_[self->len_] = val;
-
-  self->entry_->items_[self->len_] = 0;  // new special value
-
-  ++self->len_;
+  self->append_entry(key, val);
 }
 
 // e.g. Dict<int, Str*>
@@ -331,12 +411,7 @@ void dict_set(Dict<K, V*>* self, K key, V* val) {
   StackRoots _roots({&self, &val});
 
   self->reserve(self->len_ + 1);
-  self->keys_->items_[self->len_] = key;
-  self->values_->items_[self->len_] = val;
-
-  self->entry_->items_[self->len_] = 0;  // new special value
-
-  ++self->len_;
+  self->append_entry(key, val);
 }
 
 // e.g. Dict<Str*, Str*>
@@ -345,12 +420,7 @@ void dict_set(Dict<K*, V*>* self, K* key, V* val) {
   StackRoots _roots({&self, &key, &val});
 
   self->reserve(self->len_ + 1);
-  self->keys_->items_[self->len_] = key;
-  self->values_->items_[self->len_] = val;
-
-  self->entry_->items_[self->len_] = 0;  // new special value
-
-  ++self->len_;
+  self->append_entry(key, val);
 }
 
 template <typename K, typename V>
@@ -105,10 +105,6 @@ TEST test_dict() {
   PASS();
 }
 
-// TODO:
-// - Test set() can resize the dict
-//   - I guess you have to do rehashing?
-
 TEST test_dict_internals() {
   auto dict1 = NewDict<int, int>();
   StackRoots _roots1({&dict1});
@@ -213,6 +209,102 @@ TEST test_dict_internals() {
   PASS();
 }
 
+TEST test_dict_many_keys() {
+  auto d = NewDict<int, int>();
+  StackRoots _roots({&d});
+
+  const int n = 10000;
+  for (int i = 0; i < n; ++i) {
+    d->set(i * 7, i);
+  }
+  ASSERT_EQ_FMT(n, len(d), "%d");
+
+  for (int i = 0; i < n; ++i) {
+    ASSERT_EQ(i, d->index_(i * 7));
+  }
+  ASSERT(!dict_contains(d, 1));
+  ASSERT(!dict_contains(d, -7));
+
+  // The index stays at most 3/4 full
+  ASSERT(d->capacity_ * 4 <= d->table_len_ * 3);
+
+  // Insertion order is preserved across resizes
+  int expected = 0;
+  for (DictIter<int, int> it(d); !it.Done(); it.Next()) {
+    ASSERT_EQ_FMT(expected * 7, it.Key(), "%d");
+    ++expected;
+  }
+  ASSERT_EQ_FMT(n, expected, "%d");
+
+  PASS();
+}
+
+TEST test_dict_erase() {
+  auto d = NewDict<Str*, int>();
+  Str* a = nullptr;
+  Str* b = nullptr;
+  Str* c = nullptr;
+  StackRoots _roots({&d, &a, &b, &c});
+
+  a = StrFromC("a");
+  b = StrFromC("b");
+  c = StrFromC("c");
+
+  d->set(a, 1);
+  d->set(b, 2);
+  mylib::dict_erase(d, a);
+  ASSERT_EQ(1, len(d));
+
+  // Inserting after an erase must not clobber a live entry
+  d->set(c, 3);
+  ASSERT_EQ(2, len(d));
+  ASSERT_EQ(2, d->index_(b));
+  ASSERT_EQ(3, d->index_(c));
+  ASSERT(!dict_contains(d, a));
+
+  d->set(a, 4);
+  ASSERT_EQ(3, len(d));
+  ASSERT_EQ(4, d->index_(a));
+
+  // Deleted entries are skipped when iterating
+  List<Str*>* keys = d->keys();
+  ASSERT_EQ(3, len(keys));
+  ASSERT(str_equals(b, keys->index_(0)));
+  ASSERT(str_equals(c, keys->index_(1)));
+  ASSERT(str_equals(a, keys->index_(2)));
+
+  // Repeated erase and insert doesn't grow the dict without bound
+  auto d2 = NewDict<int, int>();
+  StackRoots _roots2({&d2});
+  for (int i = 0; i < 1000; ++i) {
+    d2->set(i, i);
+    mylib::dict_erase(d2, i);
+  }
+  ASSERT_EQ(0, len(d2));
+  ASSERT_EQ_FMT(6, d2->capacity_, "%d");
+
+  PASS();
+}
+
+TEST test_str_hash() {
+  Str* s1 = nullptr;
+  Str* s2 = nullptr;
+  StackRoots _roots({&s1, &s2});
+
+  s1 = StrFromC("foo");
+  s2 = StrFromC("foo");
+  ASSERT_EQ(-1, s1->hash_value_);
+
+  int h = s1->hash();
+  ASSERT(h >= 0);
+  ASSERT_EQ(h, s1->hash_value_);  // cached
+  ASSERT_EQ(h, s2->hash());
+
+  ASSERT(kEmptyString->hash() >= 0);
+
+  PASS();
+}
+
 GREATEST_MAIN_DEFS();
 
 int main(int argc, char** argv) {
@@ -222,6 +314,9 @@ int main(int argc, char** argv) {
 
   RUN_TEST(test_dict);
   RUN_TEST(test_dict_internals);
+  RUN_TEST(test_dict_many_keys);
+  RUN_TEST(test_dict_erase);
+  RUN_TEST(test_str_hash);
 
   gHeap.CleanProcessExit();
 
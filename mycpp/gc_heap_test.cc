@@ -101,9 +101,11 @@ TEST offsets_test() {
   ASSERT_EQ(offsetof(Dict<int COMMA int>, keys_), offsetof(_DummyDict, keys_));
   ASSERT_EQ(offsetof(Dict<int COMMA int>, values_),
             offsetof(_DummyDict, values_));
+  ASSERT_EQ(offsetof(Dict<int COMMA int>, table_),
+            offsetof(_DummyDict, table_));
 
-  // in binary: 0b 0000 0000 0000 01110
-  ASSERT_EQ_FMT(0x000E, maskof_Dict(), "0x%x");
+  // in binary: 0b 0000 0000 0011 1100
+  ASSERT_EQ_FMT(0x003C, maskof_Dict(), "0x%x");
 
   PASS();
 }
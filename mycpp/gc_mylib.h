@@ -25,10 +25,12 @@ inline Str* StrFromC(const char* s) {
 
 template <typename K, typename V>
 void dict_erase(Dict<K, V>* haystack, K needle) {
-  int pos = haystack->position_of_key(needle);
-  if (pos == -1) {
+  int slot = haystack->slot_of_key(needle);
+  if (slot == -1) {
     return;
   }
+  int pos = haystack->table_->items_[slot];
+  haystack->table_->items_[slot] = kDeletedEntry;  // keep probing past it
   haystack->entry_->items_[pos] = kDeletedEntry;
   // Zero out for GC.  These could be nullptr or 0
   haystack->keys_->items_[pos] = 0;
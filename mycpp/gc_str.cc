@@ -194,6 +194,22 @@ Str* Str::lower() {
   return result;
 }
 
+int Str::hash() {
+  if (hash_value_ != -1) {
+    return hash_value_;
+  }
+  // FNV-1a, which is simple and good enough for short strings like variable
+  // names
+  unsigned h = 2166136261u;
+  int n = len(this);
+  for (int i = 0; i < n; ++i) {
+    h ^= static_cast<unsigned char>(data_[i]);
+    h *= 16777619u;
+  }
+  hash_value_ = h & 0x7fffffff;  // non-negative, so it's never -1
+  return hash_value_;
+}
+
 Str* Str::ljust(int width, Str* fillchar) {
   assert(len(fillchar) == 1);
 
@@ -7,7 +7,7 @@ class List;
 class Str : public Obj {
  public:
   // Don't call this directly.  Call NewStr() instead, which calls this.
-  Str() : Obj(Tag::Opaque, kZeroMask, 0) {
+  Str() : Obj(Tag::Opaque, kZeroMask, 0), hash_value_(-1) {
   }
 
   char* data() {
@@ -56,6 +56,10 @@ class Str : public Obj {
   Str* upper();
   Str* lower();
 
+  // Non-negative hash of the contents, for Dict.  Computed lazily and cached
+  // in hash_value_, so the string must not be mutated after it's hashed.
+  int hash();
+
   // Other options for fast comparison / hashing / string interning:
   // - unique_id_: an index into intern table.  I don't think this works unless
   //   you want to deal with rehashing all strings when the set grows.
@@ -68,7 +72,7 @@ class Str : public Obj {
   // - Intern strings at GARBAGE COLLECTION TIME, with
   //   LayoutForwarded::new_location_?  Is this possible?  Does it introduce
   //   too much coupling between strings, hash tables, and GC?
-  int hash_value_;
+  int hash_value_;  // -1 if not computed yet
   char data_[1];  // flexible array
 
  private:
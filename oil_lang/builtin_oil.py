@@ -33,6 +33,7 @@ import posix_ as posix
 from typing import Dict, TYPE_CHECKING
 if TYPE_CHECKING:
   from core.alloc import Arena
+  from core.code_cache import CodeCache
   from core.ui import ErrorFormatter
   from oil_lang import expr_eval
 
@@ -51,12 +52,13 @@ class Pp(_Builtin):
 
   'pp cell a' is a lot easier to type than 'argv.py "${a[@]}"'.
   """
-  def __init__(self, mem, errfmt, procs, arena):
-    # type: (state.Mem, ErrorFormatter, Dict[str, Proc], Arena) -> None
+  def __init__(self, mem, errfmt, procs, arena, code_cache):
+    # type: (state.Mem, ErrorFormatter, Dict[str, Proc], Arena, CodeCache) -> None
     self.mem = mem
     self.errfmt = errfmt
     self.procs = procs
     self.arena = arena
+    self.code_cache = code_cache
 
   def Run(self, cmd_val):
     arg, arg_r = flag_spec.ParseCmdVal('pp', cmd_val)
@@ -120,6 +122,13 @@ class Pp(_Builtin):
 
       status = 0
 
+    elif action == '.code-cache':
+      # Parsed code for eval, trap, and PROMPT_COMMAND
+      c = self.code_cache
+      print('size\thits\tmisses\tevictions')
+      print('%d\t%d\t%d\t%d' % (len(c.entries), c.hits, c.misses, c.evictions))
+      status = 0
+
     else:
       e_usage('got invalid action %r' % action, span_id=action_spid)
 
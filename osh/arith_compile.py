@@ -0,0 +1,416 @@
+#!/usr/bin/env python2
+"""
+arith_compile.py - Compile arithmetic expressions to Python closures.
+
+Loops like 'for (( i = 0; i < n; ++i ))' evaluate the same arith_expr_t nodes
+over and over.  Walking the tree with tagswitch() costs more than the
+arithmetic, so we turn each node into a closure once, with the dispatch on
+node types and operators done up front.
+
+It's Python-only.  The C++ translation uses the tree-walking interpreter in
+osh/sh_expr_eval.py, which is already fast.
+
+Invariants:
+
+- A compiled closure returns the same int as ArithEvaluator._EvalToInt(), and
+  has the same side effects in the same order.
+- Only the common cases are compiled: variables holding integers or decimal
+  strings, and integer operators.  Everything else, like nounset errors, arrays
+  that decay, strings that are evaluated recursively, and a[i] += 1, calls
+  back into the interpreter.  A closure only does that before it has any side
+  effects, so nothing is evaluated twice.
+- Variables are looked up with Mem.GetValue() on every evaluation, which
+  caches the frame that a name resolves to.  Holding on to a cell isn't safe,
+  because a function call, 'local', or 'unset' can change which cell a name
+  refers to.
+"""
+from __future__ import print_function
+
+import operator
+
+from _devbuild.gen.id_kind_asdl import Id
+from _devbuild.gen.runtime_asdl import value, value_e, lvalue
+from _devbuild.gen.syntax_asdl import arith_expr_e
+from core import state
+from core.pyerror import e_die
+from frontend import location
+from osh import word_eval
+
+from typing import Callable, Dict, TYPE_CHECKING
+if TYPE_CHECKING:
+  from _devbuild.gen.runtime_asdl import value_t
+  from _devbuild.gen.syntax_asdl import arith_expr_t
+  from core.state import Mem
+  from osh.sh_expr_eval import ArithEvaluator
+
+  IntFunc = Callable[[], int]
+
+
+# Compiled closures are saved by node.  Code strings parsed at runtime, like
+# the ones passed to 'eval', make new nodes, so start over when there are too
+# many.
+_MAX_COMPILED = 1000
+
+_INT_OPS = {
+    Id.Arith_Plus: operator.add,
+    Id.Arith_Minus: operator.sub,
+    Id.Arith_Star: operator.mul,
+    Id.Arith_Pipe: operator.or_,
+    Id.Arith_Amp: operator.and_,
+    Id.Arith_Caret: operator.xor,
+    Id.Arith_DLess: operator.lshift,
+    Id.Arith_DGreat: operator.rshift,
+}
+
+_COMPARE_OPS = {
+    Id.Arith_DEqual: operator.eq,
+    Id.Arith_NEqual: operator.ne,
+    Id.Arith_Great: operator.gt,
+    Id.Arith_GreatEqual: operator.ge,
+    Id.Arith_Less: operator.lt,
+    Id.Arith_LessEqual: operator.le,
+}
+
+# For a += b, etc.
+_ASSIGN_OPS = {
+    Id.Arith_PlusEqual: operator.add,
+    Id.Arith_MinusEqual: operator.sub,
+    Id.Arith_StarEqual: operator.mul,
+    Id.Arith_DGreatEqual: operator.rshift,
+    Id.Arith_DLessEqual: operator.lshift,
+    Id.Arith_AmpEqual: operator.and_,
+    Id.Arith_PipeEqual: operator.or_,
+    Id.Arith_CaretEqual: operator.xor,
+}
+
+# Eval() of these nodes always returns value.Int, so it can use the compiled
+# closure.  Eval() of the others can return strings and arrays.
+_INT_VALUED = (
+    arith_expr_e.UnaryAssign, arith_expr_e.BinaryAssign, arith_expr_e.Unary,
+)
+
+
+def ReturnsInt(node):
+  # type: (arith_expr_t) -> bool
+  """Does ArithEvaluator.Eval() of this node always return value.Int?"""
+  tag = node.tag_()
+  if tag in _INT_VALUED:
+    return True
+  if tag == arith_expr_e.Binary:
+    return node.op_id != Id.Arith_LBracket  # type: ignore
+  return False
+
+
+class Compiler(object):
+  """Compiles and caches closures for ArithEvaluator.EvalToInt()."""
+
+  def __init__(self, arith_ev, mem):
+    # type: (ArithEvaluator, Mem) -> None
+    self.arith_ev = arith_ev
+    self.mem = mem
+    self.compiled = {}  # type: Dict[arith_expr_t, IntFunc]
+
+  def EvalToInt(self, node):
+    # type: (arith_expr_t) -> int
+    f = self.compiled.get(node)
+    if f is None:
+      if len(self.compiled) >= _MAX_COMPILED:
+        self.compiled.clear()
+      f = self._Compile(node)
+      self.compiled[node] = f
+    return f()
+
+  def _Compile(self, node):
+    # type: (arith_expr_t) -> IntFunc
+    tag = node.tag_()
+    if tag == arith_expr_e.VarRef:
+      return self._VarRef(node)
+    if tag == arith_expr_e.Word:
+      return self._Word(node)
+    if tag == arith_expr_e.UnaryAssign:
+      return self._UnaryAssign(node)
+    if tag == arith_expr_e.BinaryAssign:
+      return self._BinaryAssign(node)
+    if tag == arith_expr_e.Unary:
+      return self._Unary(node)
+    if tag == arith_expr_e.Binary:
+      return self._Binary(node)
+    if tag == arith_expr_e.TernaryOp:
+      return self._TernaryOp(node)
+    return self._Interpreted(node)
+
+  def _Interpreted(self, node):
+    # type: (arith_expr_t) -> IntFunc
+    interpret = self.arith_ev._EvalToInt
+    return lambda: interpret(node)
+
+  def _VarRef(self, tok):
+    # type: (arith_expr_t) -> IntFunc
+    """$(( x ))"""
+    get_value = self.mem.GetValue
+    name = tok.val  # type: ignore
+    to_int = self.arith_ev._ValToIntOrError
+    span_id = tok.span_id  # type: ignore
+    interpret = self.arith_ev._EvalToInt
+
+    def f():
+      # type: () -> int
+      val = get_value(name)
+      tag = val.tag_()
+      if tag == value_e.Str:
+        s = val.s  # type: ignore
+        # Not octal, hex, base#digits, negative, or an expression.
+        if s.isdigit() and s[0] != '0':
+          return int(s)
+        return to_int(val, span_id)
+      if tag == value_e.Int:
+        return val.i  # type: ignore
+      return interpret(tok)  # Undef with nounset, arrays, etc.
+    return f
+
+  def _Word(self, w):
+    # type: (arith_expr_t) -> IntFunc
+    """$(( $x )) $(( ${#a[@]} ))"""
+    arith_ev = self.arith_ev
+    span_id = location.SpanForArithExpr(w)
+
+    def f():
+      # type: () -> int
+      val = arith_ev.word_ev.EvalWordToString(w)  # type: ignore
+      return arith_ev._ValToIntOrError(val, span_id)
+    return f
+
+  def _OldValueFunc(self, tok):
+    # type: (arith_expr_t) -> Callable[[], value_t]
+    """For x++ and x += 1.  Returns None if the interpreter should be used."""
+    get_value = self.mem.GetValue
+    name = tok.val  # type: ignore
+
+    def f():
+      # type: () -> value_t
+      val = get_value(name)
+      tag = val.tag_()
+      if tag == value_e.Int:
+        return val
+      if tag == value_e.Str:
+        s = val.s  # type: ignore
+        if s.isdigit() and s[0] != '0':
+          return val
+      return None
+    return f
+
+  def _StoreFunc(self, tok):
+    # type: (arith_expr_t) -> Callable[[int], None]
+    mem = self.mem
+    name = tok.val  # type: ignore
+    span_id = tok.span_id  # type: ignore
+
+    def f(new_int):
+      # type: (int) -> None
+      lval = lvalue.Named(name)
+      lval.spids.append(span_id)
+      state.OshLanguageSetValue(mem, lval, value.Str(str(new_int)))
+    return f
+
+  def _UnaryAssign(self, node):
+    # type: (arith_expr_t) -> IntFunc
+    """x++ --x"""
+    child = node.child  # type: ignore
+    if child.tag_() != arith_expr_e.VarRef:
+      return self._Interpreted(node)  # a[i]++
+
+    old_value = self._OldValueFunc(child)
+    store = self._StoreFunc(child)
+    interpret = self.arith_ev._EvalToInt
+
+    op_id = node.op_id  # type: ignore
+    if op_id in (Id.Node_PostDPlus, Id.Arith_DPlus):
+      delta = 1
+    elif op_id in (Id.Node_PostDMinus, Id.Arith_DMinus):
+      delta = -1
+    else:
+      raise AssertionError(op_id)
+    is_post = op_id in (Id.Node_PostDPlus, Id.Node_PostDMinus)
+
+    def f():
+      # type: () -> int
+      val = old_value()
+      if val is None:
+        return interpret(node)
+      old_int = val.i if val.tag_() == value_e.Int else int(val.s)  # type: ignore
+      new_int = old_int + delta
+      store(new_int)
+      return old_int if is_post else new_int
+    return f
+
+  def _BinaryAssign(self, node):
+    # type: (arith_expr_t) -> IntFunc
+    """x = 1, x += 2"""
+    left = node.left  # type: ignore
+    if left.tag_() != arith_expr_e.VarRef:
+      return self._Interpreted(node)  # a[i] = 1
+
+    rhs_func = self._Compile(node.right)  # type: ignore
+    store = self._StoreFunc(left)
+
+    op_id = node.op_id  # type: ignore
+    if op_id == Id.Arith_Equal:
+      def f():
+        # type: () -> int
+        rhs_int = rhs_func()
+        store(rhs_int)
+        return rhs_int
+      return f
+
+    old_value = self._OldValueFunc(left)
+    interpret = self.arith_ev._EvalToInt
+
+    if op_id in (Id.Arith_SlashEqual, Id.Arith_PercentEqual):
+      is_div = op_id == Id.Arith_SlashEqual
+
+      def g():
+        # type: () -> int
+        val = old_value()
+        if val is None:
+          return interpret(node)
+        old_int = val.i if val.tag_() == value_e.Int else int(val.s)  # type: ignore
+        rhs = rhs_func()
+        if rhs == 0:
+          e_die('Divide by zero')  # TODO: location
+        new_int = old_int / rhs if is_div else old_int % rhs
+        store(new_int)
+        return new_int
+      return g
+
+    op = _ASSIGN_OPS[op_id]
+
+    def h():
+      # type: () -> int
+      val = old_value()
+      if val is None:
+        return interpret(node)
+      old_int = val.i if val.tag_() == value_e.Int else int(val.s)  # type: ignore
+      new_int = op(old_int, rhs_func())
+      store(new_int)
+      return new_int
+    return h
+
+  def _Unary(self, node):
+    # type: (arith_expr_t) -> IntFunc
+    child_func = self._Compile(node.child)  # type: ignore
+
+    op_id = node.op_id  # type: ignore
+    if op_id == Id.Node_UnaryPlus:
+      return child_func
+    if op_id == Id.Node_UnaryMinus:
+      return lambda: -child_func()
+    if op_id == Id.Arith_Bang:
+      return lambda: 1 if child_func() == 0 else 0
+    if op_id == Id.Arith_Tilde:
+      return lambda: ~child_func()
+    raise AssertionError(op_id)
+
+  def _Binary(self, node):
+    # type: (arith_expr_t) -> IntFunc
+    op_id = node.op_id  # type: ignore
+    if op_id == Id.Arith_LBracket:
+      return self._Index(node)
+
+    left_func = self._Compile(node.left)  # type: ignore
+    right_func = self._Compile(node.right)  # type: ignore
+
+    if op_id == Id.Arith_DPipe:
+      return lambda: 1 if left_func() != 0 or right_func() != 0 else 0
+    if op_id == Id.Arith_DAmp:
+      return lambda: 1 if left_func() != 0 and right_func() != 0 else 0
+    if op_id == Id.Arith_Comma:
+      def c():
+        # type: () -> int
+        left_func()  # throw away result
+        return right_func()
+      return c
+
+    op = _INT_OPS.get(op_id)
+    if op is not None:
+      return lambda: op(left_func(), right_func())
+
+    cmp = _COMPARE_OPS.get(op_id)
+    if cmp is not None:
+      return lambda: 1 if cmp(left_func(), right_func()) else 0
+
+    if op_id in (Id.Arith_Slash, Id.Arith_Percent):
+      is_div = op_id == Id.Arith_Slash
+      span_id = location.SpanForArithExpr(node.right)  # type: ignore
+
+      def f():
+        # type: () -> int
+        lhs = left_func()
+        rhs = right_func()
+        if rhs == 0:
+          # TODO: Could also blame /
+          e_die('Divide by zero', span_id=span_id)
+        return lhs / rhs if is_div else lhs % rhs
+      return f
+
+    if op_id == Id.Arith_DStar:
+      def g():
+        # type: () -> int
+        lhs = left_func()
+        rhs = right_func()
+        if rhs < 0:
+          e_die("Exponent can't be less than zero")  # TODO: error location
+        ret = 1
+        for i in xrange(rhs):
+          ret *= lhs
+        return ret
+      return g
+
+    raise AssertionError(op_id)
+
+  def _Index(self, node):
+    # type: (arith_expr_t) -> IntFunc
+    """a[i]"""
+    left = node.left  # type: ignore
+    if left.tag_() != arith_expr_e.VarRef:
+      return self._Interpreted(node)
+
+    get_value = self.mem.GetValue
+    name = left.val
+    index_func = self._Compile(node.right)  # type: ignore
+    to_int = self.arith_ev._ValToIntOrError
+    span_id = location.SpanForArithExpr(node)
+    interpret = self.arith_ev._EvalToInt
+
+    def f():
+      # type: () -> int
+      val = get_value(name)
+      if val.tag_() != value_e.MaybeStrArray:
+        return interpret(node)  # assoc arrays and errors
+
+      s = word_eval.GetArrayItem(val.strs, index_func())  # type: ignore
+      if s is None:
+        return to_int(value.Undef(), span_id)
+      if s.isdigit() and s[0] != '0':
+        return int(s)
+      return to_int(value.Str(s), span_id)
+    return f
+
+  def _TernaryOp(self, node):
+    # type: (arith_expr_t) -> IntFunc
+    cond_func = self._Compile(node.cond)  # type: ignore
+    true_expr = node.true_expr  # type: ignore
+    false_expr = node.false_expr  # type: ignore
+
+    # The chosen branch is evaluated with Eval(), not EvalToInt(), so arrays
+    # don't decay.
+    eval_ = self.arith_ev.Eval
+    to_int = self.arith_ev._ValToIntOrError
+    span_id = location.SpanForArithExpr(node)
+
+    def f():
+      # type: () -> int
+      if cond_func():  # nonzero
+        return to_int(eval_(true_expr), span_id)
+      else:
+        return to_int(eval_(false_expr), span_id)
+    return f
@@ -0,0 +1,86 @@
+#!/usr/bin/env python2
+"""
+arith_compile_test.py: Tests for arith_compile.py
+"""
+from __future__ import print_function
+
+import unittest
+
+from _devbuild.gen.types_asdl import lex_mode_e
+from core import error
+from core import state
+from core import test_lib
+from core import ui
+from osh import split
+from osh import sh_expr_eval
+from osh import word_eval
+
+
+def _InitEvaluator(arena, parse_ctx):
+  mem = state.Mem('', [], arena, [])
+  parse_opts, exec_opts, mutable_opts = state.MakeOpts(mem, None)
+  mem.exec_opts = exec_opts
+  state.InitMem(mem, {}, '0.1')
+
+  state.SetGlobalString(mem, 'x', '5')
+  state.SetGlobalString(mem, 'octal', '010')
+  state.SetGlobalString(mem, 'neg', '-3')
+  state.SetGlobalArray(mem, 'a', ['3', '1', '2'])
+
+  splitter = split.SplitContext(mem)
+  errfmt = ui.ErrorFormatter(arena)
+  word_ev = word_eval.CompletionWordEvaluator(mem, exec_opts, mutable_opts,
+                                              splitter, errfmt)
+
+  arith_ev = sh_expr_eval.ArithEvaluator(mem, exec_opts, parse_ctx, errfmt)
+  arith_ev.word_ev = word_ev
+  return mem, arith_ev
+
+
+def _Run(code_str, compiled):
+  """Returns the result or error, and the values of variables afterward."""
+  arena = test_lib.MakeArena('<arith_compile_test.py>')
+  parse_ctx = test_lib.InitParseContext(arena=arena)
+  w_parser = test_lib.InitWordParser(code_str, arena=arena)
+  w_parser._Next(lex_mode_e.Arith)  # Calling private method
+  anode = w_parser.a_parser.Parse()
+
+  mem, arith_ev = _InitEvaluator(arena, parse_ctx)
+  try:
+    if compiled:
+      # Twice, to use the cached closure
+      arith_ev.EvalToInt(anode)
+      result = arith_ev.EvalToInt(anode)
+    else:
+      arith_ev._EvalToInt(anode)
+      result = arith_ev._EvalToInt(anode)
+  except error.FatalRuntime as e:
+    result = 'error: %s' % e.msg
+
+  var_values = [repr(mem.GetValue(name)) for name in ('x', 'y', 'a')]
+  return result, var_values
+
+
+class CompilerTest(unittest.TestCase):
+
+  def testSameAsInterpreter(self):
+    CASES = [
+        'x', 'x + 1', 'octal + 1', 'neg * 2', 'undef + 1', '$x * 2',
+        '-x', '!x', '~x', 'x / 2', 'x % 3', 'x / 0', 'x ** 3', 'x ** -1',
+        'x << 2', 'x >> 1', 'x & 3', 'x | 8', 'x ^ 1',
+        'x == 5', 'x != 5', 'x < 6', 'x <= 4', 'x > 4', 'x >= 6',
+        'x && 0', '0 || x', 'x, x + 2', 'x > 3 ? x : 0', 'x > 3 ? a : 0',
+        'a', 'a[1]', 'a[x]', 'a[-1] + 1',
+        'x++', '++x', 'x--', '--x', 'y = x * 2', 'x += 2', 'x -= 2',
+        'x *= 2', 'x /= 2', 'x %= 2', 'x /= 0', 'x <<= 1', 'x >>= 1',
+        'x &= 4', 'x |= 2', 'x ^= 1', 'octal++', 'y++', 'y += 3',
+        'a[1]++', 'a[1] += 2',
+    ]
+    for code_str in CASES:
+      expected = _Run(code_str, False)
+      actual = _Run(code_str, True)
+      self.assertEqual(expected, actual, code_str)
+
+
+if __name__ == '__main__':
+  unittest.main()
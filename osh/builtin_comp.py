@@ -141,6 +141,7 @@ class SpecBuilder(object):
                word_ev,  # type: NormalWordEvaluator
                splitter,  # type: SplitContext
                comp_lookup,  # type: Lookup
+               exe_index,  # type: completion.ExecutableIndex
                errfmt  # type: ui.ErrorFormatter
                ):
     # type: (...) -> None
@@ -148,12 +149,14 @@ class SpecBuilder(object):
     Args:
       cmd_ev: CommandEvaluator for compgen -F
       parse_ctx, word_ev, splitter: for compgen -W
+      exe_index: for compgen -A command
     """
     self.cmd_ev = cmd_ev
     self.parse_ctx = parse_ctx
     self.word_ev = word_ev
     self.splitter = splitter
     self.comp_lookup = comp_lookup
+    self.exe_index = exe_index
     self.errfmt = errfmt
 
   def Build(self, argv, arg, base_opts):
@@ -193,7 +196,7 @@ class SpecBuilder(object):
         actions.append(completion.FileSystemAction(exec_only=True))
 
         # Look on the file system.
-        a = completion.ExternalCommandAction(cmd_ev.mem)
+        a = completion.ExternalCommandAction(cmd_ev.mem, self.exe_index)
 
       elif name == 'directory':
         a = completion.FileSystemAction(dirs_only=True)
@@ -20,13 +20,18 @@ from frontend import flag_spec
 from frontend import consts
 from frontend import reader
 from frontend import typed_args
+from mycpp import mylib
 from osh import cmd_eval
 
+if mylib.PYTHON:
+  from core import parse_cache
+
 _ = log
 
 from typing import Dict, List, Tuple, Optional, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.runtime_asdl import cmd_value__Argv, Proc
+  from core.code_cache import CodeCache
   from frontend.parse_lib import ParseContext
   from core import optview
   from core import process
@@ -37,14 +42,16 @@ if TYPE_CHECKING:
 
 class Eval(vm._Builtin):
 
-  def __init__(self, parse_ctx, exec_opts, cmd_ev, tracer, errfmt):
-    # type: (ParseContext, optview.Exec, CommandEvaluator, dev.Tracer, ui.ErrorFormatter) -> None
+  def __init__(self, parse_ctx, exec_opts, cmd_ev, tracer, errfmt,
+               code_cache):
+    # type: (ParseContext, optview.Exec, CommandEvaluator, dev.Tracer, ui.ErrorFormatter, CodeCache) -> None
     self.parse_ctx = parse_ctx
     self.arena = parse_ctx.arena
     self.exec_opts = exec_opts
     self.cmd_ev = cmd_ev
     self.tracer = tracer
     self.errfmt = errfmt
+    self.code_cache = code_cache
 
   def Run(self, cmd_val):
     # type: (cmd_value__Argv) -> int
@@ -61,14 +68,11 @@ class Eval(vm._Builtin):
       # code_str could be EMPTY, so just use the first one
       eval_spid = cmd_val.arg_spids[0]
 
-    line_reader = reader.StringLineReader(code_str, self.arena)
-    c_parser = self.parse_ctx.MakeOshParser(line_reader)
-
     src = source.ArgvWord('eval', eval_spid)
     with dev.ctx_Tracer(self.tracer, 'eval', None):
-      with alloc.ctx_Location(self.arena, src):
-        return main_loop.Batch(self.cmd_ev, c_parser, self.errfmt,
-                               cmd_flags=cmd_eval.RaiseControlFlow)
+      return self.code_cache.Batch(code_str, 'eval', src, eval_spid,
+                                   self.cmd_ev, self.errfmt,
+                                   cmd_eval.RaiseControlFlow)
 
 
 class Source(vm._Builtin):
@@ -85,6 +89,9 @@ class Source(vm._Builtin):
 
     self.mem = cmd_ev.mem
 
+    if mylib.PYTHON:
+      self.parse_cache = parse_cache.ParseCache(parse_ctx, self.mem)
+
   def Run(self, cmd_val):
     # type: (cmd_value__Argv) -> int
     call_spid = cmd_val.arg_spids[0]
@@ -107,6 +114,7 @@ class Source(vm._Builtin):
       return 1
 
     line_reader = reader.FileLineReader(f, self.arena)
+    line_reader.MapFile()
     c_parser = self.parse_ctx.MakeOshParser(line_reader)
 
     # A sourced module CAN have a new arguments array, but it always shares
@@ -119,14 +127,21 @@ class Source(vm._Builtin):
           src = source.SourcedFile(path, call_spid)
           with alloc.ctx_Location(self.arena, src):
             try:
-              status = main_loop.Batch(self.cmd_ev, c_parser, self.errfmt,
-                                       cmd_flags=cmd_eval.RaiseControlFlow)
+              if mylib.PYTHON:
+                # Opt-in with $OSH_PARSE_CACHE_DIR
+                status = self.parse_cache.Batch(
+                    resolved, src, line_reader, c_parser, self.cmd_ev,
+                    self.errfmt, cmd_eval.RaiseControlFlow)
+              else:
+                status = main_loop.Batch(self.cmd_ev, c_parser, self.errfmt,
+                                         cmd_flags=cmd_eval.RaiseControlFlow)
             except error._ControlFlow as e:
               if e.IsReturn():
                 status = e.StatusCode()
               else:
                 raise
             finally:
+              line_reader.DropLines()
               f.close()
 
     return status
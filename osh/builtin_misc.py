@@ -142,10 +142,19 @@ def _AppendParts(s, spans, max_results, join_next, parts):
   return done, join_next
 
 #
-# Three read() wrappers for 'read' builtin that RunPendingTraps: _ReadN,
-# _ReadUntilDelim, and _ReadLineSlowly
+# read() wrappers for 'read' and 'mapfile' that RunPendingTraps: _ReadN,
+# _ReadUntilDelim, and _ReadLines
 #
 
+# When stdin is a regular file, we read ahead in blocks and then seek back past
+# the delimiter, so the next reader of the file sees the rest of it.  POSIX
+# requires this: in 'while read line; do head -n 1; done < file', 'head' has to
+# start after the line that 'read' consumed.  Blocks start small, since most
+# lines are short, and double up to the max.
+_MIN_BLOCK_SIZE = 128
+_MAX_BLOCK_SIZE = 64 * 1024
+
+
 def _ReadN(stdin_fd, num_bytes, cmd_ev):
   # type: (int, int, CommandEvaluator) -> str
   chunks = []  # type: List[str]
@@ -169,12 +178,52 @@ def _ReadN(stdin_fd, num_bytes, cmd_ev):
   return ''.join(chunks)
 
 
+def _ReadUntilDelimSeekable(delim_byte, cmd_ev):
+  # type: (int, CommandEvaluator) -> Tuple[str, bool]
+  """Like _ReadUntilDelim, but reads blocks from a regular file."""
+  delim = chr(delim_byte)
+  chunks = []  # type: List[str]
+  block_size = _MIN_BLOCK_SIZE
+  while True:
+    n, err_num = pyos.Read(0, block_size, chunks)
+
+    if n < 0:
+      if err_num == EINTR:
+        cmd_ev.RunPendingTraps()
+        # retry after running traps
+      else:
+        raise pyos.ReadError(err_num)
+
+    elif n == 0:  # EOF
+      return ''.join(chunks), True
+
+    else:
+      block = chunks[-1]
+      i = block.find(delim)
+      if i != -1:
+        chunks[-1] = block[:i]
+        # Give back the bytes after the delimiter
+        err_num = pyos.SeekCur(0, i + 1 - n)
+        if err_num != 0:
+          raise pyos.ReadError(err_num)
+        return ''.join(chunks), False
+
+      if block_size < _MAX_BLOCK_SIZE:
+        block_size *= 2
+
+
 def _ReadUntilDelim(delim_byte, cmd_ev):
   # type: (int, CommandEvaluator) -> Tuple[str, bool]
   """Read a portion of stdin.
   
   Read until that delimiter, but don't include it.
   """
+  if pyos.IsRegularFile(0):
+    return _ReadUntilDelimSeekable(delim_byte, cmd_ev)
+
+  # sys.stdin.readline() in Python has its own buffering which is incompatible
+  # with shell semantics.  dash, mksh, and zsh all read a single byte at a time
+  # with read(0, 1) from pipes and terminals.
   eof = False
   ch_array = []  # type: List[int]
   while True:
@@ -199,39 +248,46 @@ def _ReadUntilDelim(delim_byte, cmd_ev):
   return pyutil.ChArrayToString(ch_array), eof
 
 
-# sys.stdin.readline() in Python has its own buffering which is incompatible
-# with shell semantics.  dash, mksh, and zsh all read a single byte at a
-# time with read(0, 1).
+def _ReadLines(keep_newline, cmd_ev):
+  # type: (bool, CommandEvaluator) -> List[str]
+  """Read all of stdin and split it into lines.
 
-# TODO:
-# - _ReadLineSlowly should have keep_newline (mapfile -t)
-#   - this halves memory usage!
-
-def _ReadLineSlowly(cmd_ev):
-  # type: (CommandEvaluator) -> str
-  """Read a line from stdin."""
-  ch_array = []  # type: List[int]
+  For mapfile, which consumes its input until EOF.  So unlike 'read', it can
+  read big blocks from pipes too.
+  """
+  chunks = []  # type: List[str]
   while True:
-    ch, err_num = pyos.ReadByte(0)
+    n, err_num = pyos.Read(0, _MAX_BLOCK_SIZE, chunks)
 
-    if ch < 0:
+    if n < 0:
       if err_num == EINTR:
         cmd_ev.RunPendingTraps()
         # retry after running traps
       else:
         raise pyos.ReadError(err_num)
 
-    elif ch == pyos.EOF_SENTINEL:
+    elif n == 0:  # EOF
       break
 
-    else:
-      ch_array.append(ch)
+  contents = ''.join(chunks)
 
-    # TODO: Add option to omit newline
-    if ch == pyos.NEWLINE_CH:
+  lines = []  # type: List[str]
+  n = len(contents)
+  pos = 0
+  while pos < n:
+    i = contents.find('\n', pos)
+    if i == -1:  # last line has no newline
+      lines.append(contents[pos:])
       break
 
-  return pyutil.ChArrayToString(ch_array)
+    # note: at least on Linux, bash doesn't strip \r\n
+    if keep_newline:
+      lines.append(contents[pos:i+1])
+    else:
+      lines.append(contents[pos:i])
+    pos = i + 1
+
+  return lines
 
 
 def _ReadAll():
@@ -273,8 +329,8 @@ class Read(vm._Builtin):
     # type: (arg_types.read, str) -> int
     """For read --line."""
 
-    # Use an optimized C implementation rather than _ReadLineSlowly, which
-    # calls ReadByte() over and over.
+    # Use an optimized C implementation rather than a loop that calls
+    # ReadByte() over and over.
     line = pyos.ReadLine()
     if len(line) == 0:  # EOF
       return 1
@@ -509,20 +565,11 @@ class MapFile(vm._Builtin):
      if var_name.startswith(':'):
        var_name = var_name[1:]
 
-    lines = []  # type: List[str]
-    while True:
-      # bash uses this slow algorithm; Oil could provide read --all-lines
-      try:
-        line = _ReadLineSlowly(self.cmd_ev)
-      except pyos.ReadError as e:
-        self.errfmt.PrintMessage("mapfile: read() error: %s" % posix.strerror(e.err_num))
-        return 1
-      if len(line) == 0:
-        break
-      # note: at least on Linux, bash doesn't strip \r\n
-      if arg.t and line.endswith('\n'):
-        line = line[:-1]
-      lines.append(line)
+    try:
+      lines = _ReadLines(not arg.t, self.cmd_ev)
+    except pyos.ReadError as e:
+      self.errfmt.PrintMessage("mapfile: read() error: %s" % posix.strerror(e.err_num))
+      return 1
 
     state.BuiltinSetArray(self.mem, var_name, lines)
     return 0
@@ -840,9 +887,10 @@ class Help(vm._Builtin):
 
 
 class Cat(vm._Builtin):
-  """Internal implementation detail for $(< file).
-  
-  Maybe expose this as 'builtin cat' ?
+  """Internal builtin that copies stdin to stdout.
+
+  $(< file) used to fork '__cat < file', but now it reads the file in the shell
+  process.  Maybe expose this as 'builtin cat' ?
   """
   def __init__(self):
     # type: () -> None
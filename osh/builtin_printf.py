@@ -22,6 +22,7 @@ from core import alloc
 from core import error
 from core.pyerror import e_die, p_die, log
 from core import state
+from core import util
 from core import vm
 from frontend import flag_spec
 from frontend import consts
@@ -148,6 +149,53 @@ class _FormatStringParser(object):
     return parts
 
 
+# Formats in a loop are reused, but we don't want to hold every format string
+# a script generates.
+_MAX_CACHED_FORMATS = 100
+
+
+class _CompiledFormat(object):
+  """A parsed format string, and what can be computed from it without args."""
+
+  def __init__(self, parts):
+    # type: (List[printf_part_t]) -> None
+    self.parts = parts
+
+    # For each part: the value of a Literal, or '' for a Percent
+    self.literals = []  # type: List[str]
+    # For each part: the flags of a Percent, like ['-', '0']
+    self.flags = []  # type: List[List[str]]
+    # For each part: the type of a Percent, like 's', or '' for a Literal
+    self.types = []  # type: List[str]
+
+    # Only %s %d %x %q without flags, width, or precision?  Then we can use
+    # Printf._FormatSimple().
+    self.simple = True
+
+    for part in parts:
+      UP_part = part
+      flags = []  # type: List[str]
+      if part.tag_() == printf_part_e.Literal:
+        part = cast(printf_part__Literal, UP_part)
+        token = part.token
+        if token.id == Id.Format_EscapedPercent:
+          self.literals.append('%')
+        else:
+          self.literals.append(word_compile.EvalCStringToken(token))
+        self.types.append('')
+      else:
+        part = cast(printf_part__Percent, UP_part)
+        for flag_token in part.flags:
+          flags.append(flag_token.val)
+        self.literals.append('')
+        typ = part.type.val
+        self.types.append(typ)
+        if (len(flags) or part.width is not None or
+            part.precision is not None or typ not in ('s', 'd', 'x', 'q')):
+          self.simple = False
+      self.flags.append(flags)
+
+
 class Printf(vm._Builtin):
 
   def __init__(self, mem, parse_ctx, unsafe_arith, errfmt):
@@ -156,12 +204,57 @@ class Printf(vm._Builtin):
     self.parse_ctx = parse_ctx
     self.unsafe_arith = unsafe_arith
     self.errfmt = errfmt
-    self.parse_cache = {}  # type: Dict[str, List[printf_part_t]]
+    self.parse_cache = {}  # type: Dict[str, _CompiledFormat]
+    self.format_lru = util.LruKeys()
 
     self.shell_start_time = time_.time()  # this object initialized in main()
 
-  def _Format(self, parts, varargs, spids, out):
-    # type: (List[printf_part_t], List[str], List[int], List[str]) -> int
+  def _FormatSimple(self, compiled, varargs, out):
+    # type: (_CompiledFormat, List[str], List[str]) -> bool
+    """Fast path for formats like '%s\t%d\n'.
+
+    Returns:
+      False if _Format() has to be used instead, e.g. for a missing arg or an
+      error message.  Then 'out' should be discarded.
+    """
+    arg_index = 0
+    num_args = len(varargs)
+
+    while True:  # loop over arguments
+      for i, typ in enumerate(compiled.types):
+        if len(typ) == 0:
+          out.append(compiled.literals[i])
+          continue
+
+        if arg_index >= num_args:
+          return False
+        s = varargs[arg_index]
+        arg_index += 1
+
+        if typ == 's':
+          out.append(s)
+        elif typ == 'q':
+          out.append(qsn.maybe_shell_encode(s))
+        else:  # d or x
+          try:
+            d = int(s)
+          except ValueError:
+            return False  # maybe 'a, or an error
+          if typ == 'd':
+            out.append(str(d))
+          else:
+            if d < 0:
+              return False  # error
+            out.append(mylib.hex_lower(d))
+
+      if arg_index == 0 or arg_index >= num_args:
+        break
+      # There are more args: recycle the format
+
+    return True
+
+  def _Format(self, compiled, varargs, spids, out):
+    # type: (_CompiledFormat, List[str], List[int], List[str]) -> int
     """Hairy printf formatting logic."""
 
     arg_index = 0
@@ -169,28 +262,17 @@ class Printf(vm._Builtin):
     backslash_c = False
 
     while True:  # loop over arguments
-      for part in parts:  # loop over parsed format string
+      for i, part in enumerate(compiled.parts):  # loop over parsed format string
         UP_part = part
         if part.tag_() == printf_part_e.Literal:
-          part = cast(printf_part__Literal, UP_part)
-          token = part.token
-          if token.id == Id.Format_EscapedPercent:
-            s = '%'
-          else:
-            s = word_compile.EvalCStringToken(token)
-          out.append(s)
+          out.append(compiled.literals[i])
 
         elif part.tag_() == printf_part_e.Percent:
           # Note: This case is very long, but hard to refactor because of the
           # error cases and "recycling" of args!  (arg_index, return 1, etc.)
           part = cast(printf_part__Percent, UP_part)
 
-          # TODO: These calculations are independent of the data, so could be
-          # cached
-          flags = []  # type: List[str]
-          if len(part.flags) > 0:
-            for flag_token in part.flags:
-              flags.append(flag_token.val)
+          flags = compiled.flags[i]
 
           width = -1  # nonexistent
           if part.width:
@@ -424,6 +506,13 @@ class Printf(vm._Builtin):
 
     return 0
 
+  def _CacheFormat(self, fmt, compiled):
+    # type: (str, _CompiledFormat) -> None
+    if len(self.parse_cache) >= _MAX_CACHED_FORMATS:
+      mylib.dict_erase(self.parse_cache, self.format_lru.PopOldest())
+
+    self.parse_cache[fmt] = compiled
+
   def Run(self, cmd_val):
     # type: (cmd_value__Argv) -> int
     """
@@ -439,9 +528,8 @@ class Printf(vm._Builtin):
     #log('vals %s', vals)
 
     arena = self.errfmt.arena
-    if fmt in self.parse_cache:
-      parts = self.parse_cache[fmt]
-    else:
+    compiled = self.parse_cache.get(fmt)
+    if compiled is None:
       line_reader = reader.StringLineReader(fmt, arena)
       # TODO: Make public
       lexer = self.parse_ctx.MakeLexer(line_reader)
@@ -454,18 +542,23 @@ class Printf(vm._Builtin):
           self.errfmt.PrettyPrintError(e)
           return 2  # parse error
 
-      self.parse_cache[fmt] = parts
+      compiled = _CompiledFormat(parts)
+      self._CacheFormat(fmt, compiled)
+
+    self.format_lru.Touch(fmt)
 
     if 0:
       print()
-      for part in parts:
+      for part in compiled.parts:
         part.PrettyPrint()
         print()
 
     out = []  # type: List[str]
-    status = self._Format(parts, varargs, spids, out)
-    if status != 0:
-      return status  # failure
+    if not compiled.simple or not self._FormatSimple(compiled, varargs, out):
+      del out[:]
+      status = self._Format(compiled, varargs, spids, out)
+      if status != 0:
+        return status  # failure
 
     result = ''.join(out)
     if arg.v is not None:
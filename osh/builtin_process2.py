@@ -138,6 +138,10 @@ class Wait(vm._Builtin):
           status = 128 + result
           break
 
+        # NumRunning() visits every job, so reap all the processes that have
+        # already exited before checking it again.
+        self.waiter.ReapExited()
+
       return status
 
     # Get list of jobs.  Then we need to check if they are ALL stopped.
@@ -288,6 +288,13 @@ class Hash(vm._Builtin):
       self.search_path.ClearCache()
       return 0
 
+    if arg.s:
+      if len(rest):
+        e_usage('got extra arguments after -s')
+      for name, n in self.search_path.Stats():
+        print('%s\t%d' % (name, n))
+      return 0
+
     status = 0
     if len(rest):
       for cmd in rest:  # enter in cache
@@ -6,34 +6,37 @@ from __future__ import print_function
 
 from signal import (
     SIG_DFL, SIG_IGN, SIGKILL, SIGSTOP, SIGQUIT, SIGTSTP, SIGTTOU, SIGTTIN,
-    SIGWINCH
+    SIGWINCH, SIGPROF, SIGHUP, SIGTERM, SIGALRM, SIGUSR1, SIGUSR2
 )
 
 from _devbuild.gen import arg_types
 from _devbuild.gen.runtime_asdl import cmd_value__Argv
 from _devbuild.gen.syntax_asdl import source
 from asdl import runtime
-from core import alloc
 from core import dev
 from core import error
-from core import main_loop
 from core import pyos
 from core.pyutil import stderr_line
 from core import vm
 from frontend import flag_spec
 from frontend import signal_def
-from frontend import reader
 from mycpp import mylib
 from mycpp.mylib import iteritems
 
 from typing import Dict, List, Optional, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.syntax_asdl import command_t
+  from core.code_cache import CodeCache
   from core.comp_ui import _IDisplay
   from core.ui import ErrorFormatter
   from frontend.parse_lib import ParseContext
 
 
+# Signals that terminate the shell by default.  Output that echo and printf
+# left in the buffer is written first.
+_FLUSH_STDOUT_SIGNALS = [SIGHUP, SIGTERM, SIGALRM, SIGUSR1, SIGUSR2]
+
+
 class TrapState(object):
   """All changes to global signal and hook state go through this object."""
   def __init__(self):
@@ -41,6 +44,7 @@ class TrapState(object):
     self.hooks = {}  # type: Dict[str, command_t]
     self.traps = {}  # type: Dict[int, command_t]
     self.display = None  # type: _IDisplay
+    self.sampler = None  # type: Optional[dev.Sampler]
 
   def GetHook(self, hook_name):
     # type: (str) -> command_t
@@ -79,12 +83,22 @@ class TrapState(object):
       pyos.SetSigwinchCode(pyos.UNTRAPPED_SIGWINCH)
     else:
       pyos.Sigaction(sig_num, SIG_DFL)
+      if sig_num in _FLUSH_STDOUT_SIGNALS:
+        pyos.FlushStdoutOnSignal(sig_num)
     # TODO: SIGINT is similar: set a flag, then optionally call user _TrapHandler
 
   def InitShell(self):
     # type: () -> None
     """Always called when initializing the shell process."""
     pyos.InitShell()
+    for sig_num in _FLUSH_STDOUT_SIGNALS:
+      pyos.FlushStdoutOnSignal(sig_num)
+
+  def StartSampling(self, sampler, interval_us):
+    # type: (dev.Sampler, int) -> None
+    """Take a sample of the shell's stack on every SIGPROF."""
+    self.sampler = sampler
+    pyos.StartProfiling(interval_us)
 
   def InitInteractiveShell(self, display, my_pid):
     # type: (_IDisplay, int) -> None
@@ -130,6 +144,11 @@ class TrapState(object):
           if node is None:
             continue
 
+        if sig_num == SIGPROF and self.sampler is not None:
+          # This is a safe point, called from CommandEvaluator._Execute()
+          self.sampler.Sample()
+          continue
+
         assert node is not None
         run_list.append(node)
 
@@ -170,13 +189,14 @@ _HOOK_NAMES = ['EXIT', 'ERR', 'RETURN', 'DEBUG']
 
 
 class Trap(vm._Builtin):
-  def __init__(self, trap_state, parse_ctx, tracer, errfmt):
-    # type: (TrapState, ParseContext, dev.Tracer, ErrorFormatter) -> None
+  def __init__(self, trap_state, parse_ctx, tracer, errfmt, code_cache):
+    # type: (TrapState, ParseContext, dev.Tracer, ErrorFormatter, CodeCache) -> None
     self.trap_state = trap_state
     self.parse_ctx = parse_ctx
     self.arena = parse_ctx.arena
     self.tracer = tracer
     self.errfmt = errfmt
+    self.code_cache = code_cache
 
   def _ParseTrapCode(self, code_str):
     # type: (str) -> command_t
@@ -184,17 +204,13 @@ class Trap(vm._Builtin):
     Returns:
       A node, or None if the code is invalid.
     """
-    line_reader = reader.StringLineReader(code_str, self.arena)
-    c_parser = self.parse_ctx.MakeOshParser(line_reader)
-
     # TODO: the SPID should be passed through argv.
     src = source.ArgvWord('trap', runtime.NO_SPID)
-    with alloc.ctx_Location(self.arena, src):
-      try:
-        node = main_loop.ParseWholeFile(c_parser)
-      except error.Parse as e:
-        self.errfmt.PrettyPrintError(e)
-        return None
+    try:
+      node = self.code_cache.Parse(code_str, 'trap', src, runtime.NO_SPID)
+    except error.Parse as e:
+      self.errfmt.PrettyPrintError(e)
+      return None
 
     return node
 
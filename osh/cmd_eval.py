@@ -399,9 +399,12 @@ class CommandEvaluator(object):
       raise error.ErrExit(msg, span_id=span_id, status=status,
                           show_code=cmd_st.show_code)
 
-  def _EvalRedirect(self, r):
+  def EvalRedirect(self, r):
     # type: (redir) -> redirect
+    """Evaluate the words in a redirect.  The executor uses it for $(< file).
 
+    Raises error.RedirectEval.
+    """
     result = redirect(r.op.id, r.op.span_id, r.loc, None)
 
     arg = r.arg
@@ -545,7 +548,7 @@ class CommandEvaluator(object):
 
     result = []  # type: List[redirect]
     for redir in redirects:
-      result.append(self._EvalRedirect(redir))
+      result.append(self.EvalRedirect(redir))
     return result
 
   def _RunSimpleCommand(self, cmd_val, cmd_st, do_fork):
@@ -652,7 +655,7 @@ class CommandEvaluator(object):
 
         # Find span_id for a basic implementation of $LINENO, e.g.
         # PS4='+$SOURCE_NAME:$LINENO:'
-        # Note that for '> $LINENO' the span_id is set in _EvalRedirect.
+        # Note that for '> $LINENO' the span_id is set in EvalRedirect.
         # TODO: Can we avoid setting this so many times?  See issue #567.
         if len(node.words):
           span_id = word_.LeftMostSpanForWord(node.words[0])
@@ -1114,6 +1117,7 @@ class CommandEvaluator(object):
 
         with ctx_LoopLevel(self):
           while True:
+            self.shell_ex.MaybeFlushStdout()
             try:
               # blame while/until spid
               b = self._EvalCondition(node.cond, node.spids[0])
@@ -1188,6 +1192,7 @@ class CommandEvaluator(object):
 
                 index =0
                 for item in obj:
+                  self.shell_ex.MaybeFlushStdout()
                   if i_name:
                     self.mem.SetValue(i_name, value.Obj(index),
                                       scope_e.LocalOnly)
@@ -1228,6 +1233,7 @@ class CommandEvaluator(object):
 
                 index = 0
                 for key in obj:
+                  self.shell_ex.MaybeFlushStdout()
                   self.mem.SetValue(key_name, value.Obj(key),
                                     scope_e.LocalOnly)
                   if val_name:
@@ -1272,6 +1278,7 @@ class CommandEvaluator(object):
 
             index = 0
             for x in iter_list:
+              self.shell_ex.MaybeFlushStdout()
               #log('> ForEach setting %r', x)
               if mylib.PYTHON:
                 # value.Obj not available in C++
@@ -1308,6 +1315,7 @@ class CommandEvaluator(object):
 
         with ctx_LoopLevel(self):
           while True:
+            self.shell_ex.MaybeFlushStdout()
             if for_cond:
               # We only accept integers as conditions
               cond_int = self.arith_ev.EvalToInt(for_cond)
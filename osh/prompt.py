@@ -9,19 +9,14 @@ import time as time_
 
 from _devbuild.gen.id_kind_asdl import Id, Id_t
 from _devbuild.gen.runtime_asdl import value_e, value_t, value__Str
-from _devbuild.gen.syntax_asdl import (
-    command_t, source, compound_word
-)
+from _devbuild.gen.syntax_asdl import source, compound_word
 from asdl import runtime
-from core import alloc
-from core import main_loop
 from core import error
 from core import pyos
 from core import state
 from core import ui
 from frontend import consts
 from frontend import match
-from frontend import reader
 from mycpp import mylib
 from osh import word_
 from pylib import os_path
@@ -31,6 +26,7 @@ import posix_ as posix
 
 from typing import Dict, List, Tuple, cast, TYPE_CHECKING
 if TYPE_CHECKING:
+  from core.code_cache import CodeCache
   from core.state import Mem
   from frontend.parse_lib import ParseContext
   from osh.cmd_eval import CommandEvaluator
@@ -259,15 +255,15 @@ class UserPlugin(object):
 
   Similar to core/dev.py:Tracer, which caches $PS4.
   """
-  def __init__(self, mem, parse_ctx, cmd_ev, errfmt):
-    # type: (Mem, ParseContext, CommandEvaluator, ui.ErrorFormatter) -> None
+  def __init__(self, mem, parse_ctx, cmd_ev, errfmt, code_cache):
+    # type: (Mem, ParseContext, CommandEvaluator, ui.ErrorFormatter, CodeCache) -> None
     self.mem = mem
     self.parse_ctx = parse_ctx
     self.cmd_ev = cmd_ev
     self.errfmt = errfmt
+    self.code_cache = code_cache
 
     self.arena = parse_ctx.arena
-    self.parse_cache = {}  # type: Dict[str, command_t]
 
   def Run(self):
     # type: () -> None
@@ -278,21 +274,15 @@ class UserPlugin(object):
     # PROMPT_COMMAND almost never changes, so we try to cache its parsing.
     # This avoids memory allocations.
     prompt_cmd = cast(value__Str, val).s
-    node = self.parse_cache.get(prompt_cmd)
-    if node is None:
-      line_reader = reader.StringLineReader(prompt_cmd, self.arena)
-      c_parser = self.parse_ctx.MakeOshParser(line_reader)
-
-      # NOTE: This is similar to CommandEvaluator.ParseTrapCode().
-      src = source.Variable(PROMPT_COMMAND, runtime.NO_SPID)
-      with alloc.ctx_Location(self.arena, src):
-        try:
-          node = main_loop.ParseWholeFile(c_parser)
-        except error.Parse as e:
-          self.errfmt.PrettyPrintError(e)
-          return  # don't execute
-
-      self.parse_cache[prompt_cmd] = node
+
+    # NOTE: This is similar to Trap._ParseTrapCode().
+    src = source.Variable(PROMPT_COMMAND, runtime.NO_SPID)
+    try:
+      node = self.code_cache.Parse(prompt_cmd, PROMPT_COMMAND, src,
+                                   runtime.NO_SPID)
+    except error.Parse as e:
+      self.errfmt.PrettyPrintError(e)
+      return  # don't execute
 
     # Save this so PROMPT_COMMAND can't set $?
     with state.ctx_Registers(self.mem):
@@ -34,6 +34,7 @@ from core import alloc
 from core import error
 from core import state
 from core import ui
+from core import util
 from core.pyerror import e_die, e_die_status, e_strict, e_usage, log
 from frontend import consts
 from frontend import location
@@ -48,7 +49,10 @@ from osh import word_eval
 
 import libc  # for fnmatch
 
-from typing import Tuple, Optional, cast, TYPE_CHECKING
+if mylib.PYTHON:
+  from osh import arith_compile
+
+from typing import Tuple, Dict, Optional, cast, TYPE_CHECKING
 if TYPE_CHECKING:
   from core.ui import ErrorFormatter
   from core import optview
@@ -179,6 +183,56 @@ if mylib.PYTHON:
     return 'A' <= ch and ch <= 'Z'
 
 
+# Strings that are parsed at runtime, like x='a+b' in $(( x * 2 )), or ref in
+# ${!ref}, are usually evaluated in a loop.  Keep this many parses.
+_MAX_CACHED_PARSES = 100
+
+
+class _MemoEntry(object):
+
+  def __init__(self, parse_options, anode, bvs_part):
+    # type: (str, Optional[arith_expr_t], Optional[braced_var_sub]) -> None
+    self.parse_options = parse_options
+    self.anode = anode
+    self.bvs_part = bvs_part
+
+
+class _ParseMemo(object):
+  """A bounded LRU memo of what was parsed from strings at runtime.
+
+  The key is the string and the span ID where it's evaluated, since error
+  messages point to the arena lines made by the parse.  Like
+  core/code_cache.py, an entry is only reused with the same parse options.
+  """
+
+  def __init__(self, parse_ctx):
+    # type: (Optional[parse_lib.ParseContext]) -> None
+    self.parse_ctx = parse_ctx
+    self.entries = {}  # type: Dict[str, _MemoEntry]
+    self.lru = util.LruKeys()
+
+  def Get(self, s, span_id):
+    # type: (str, int) -> Optional[_MemoEntry]
+    key = '%d %s' % (span_id, s)
+    entry = self.entries.get(key)
+    if (entry is None or
+        entry.parse_options != self.parse_ctx.ParseOptionString()):
+      return None
+
+    self.lru.Touch(key)
+    return entry
+
+  def Put(self, s, span_id, anode, bvs_part):
+    # type: (str, int, Optional[arith_expr_t], Optional[braced_var_sub]) -> None
+    while len(self.entries) >= _MAX_CACHED_PARSES:
+      mylib.dict_erase(self.entries, self.lru.PopOldest())
+
+    key = '%d %s' % (span_id, s)
+    self.lru.Touch(key)
+    self.entries[key] = _MemoEntry(self.parse_ctx.ParseOptionString(), anode,
+                                   bvs_part)
+
+
 class UnsafeArith(object):
   """For parsing a[i] at RUNTIME."""
 
@@ -191,6 +245,8 @@ class UnsafeArith(object):
     self.errfmt = errfmt
 
     self.arena = self.parse_ctx.arena
+    self.place_memo = _ParseMemo(parse_ctx)
+    self.var_ref_memo = _ParseMemo(parse_ctx)
 
   def ParseLValue(self, s, span_id):
     # type: (str, int) -> lvalue_t
@@ -198,15 +254,21 @@ class UnsafeArith(object):
 
     It uses the arith parser, so it behaves like the LHS of (( a[i] = x ))
     """
-    a_parser = self.parse_ctx.MakeArithParser(s)
+    entry = self.place_memo.Get(s, span_id)
+    if entry is not None:
+      anode = entry.anode
+    else:
+      a_parser = self.parse_ctx.MakeArithParser(s)
 
-    with alloc.ctx_Location(self.arena, source.ArgvWord('dynamic place', span_id)):
-      try:
-        anode = a_parser.Parse()
-      except error.Parse as e:
-        self.errfmt.PrettyPrintError(e)
-        # Exception for builtins 'unset' and 'printf'
-        e_usage('got invalid place expression', span_id=span_id)
+      with alloc.ctx_Location(self.arena, source.ArgvWord('dynamic place', span_id)):
+        try:
+          anode = a_parser.Parse()
+        except error.Parse as e:
+          self.errfmt.PrettyPrintError(e)
+          # Exception for builtins 'unset' and 'printf'
+          e_usage('got invalid place expression', span_id=span_id)
+
+      self.place_memo.Put(s, span_id, anode, None)
 
     lval = self.arith_ev.EvalArithLhs(anode, span_id)
 
@@ -240,6 +302,10 @@ class UnsafeArith(object):
     """
     static_ref_spid = token.span_id
 
+    entry = self.var_ref_memo.Get(ref_str, static_ref_spid)
+    if entry is not None:
+      return entry.bvs_part
+
     line_reader = reader.StringLineReader(ref_str, self.arena)
     lexer = self.parse_ctx.MakeLexer(line_reader)
     w_parser = self.parse_ctx.MakeWordParser(lexer, line_reader)
@@ -257,6 +323,8 @@ class UnsafeArith(object):
     # Hack: There is no ${ on the "virtual" braced_var_sub, but we can add one
     # for error messages
     bvs_part.spids.append(static_ref_spid)
+
+    self.var_ref_memo.Put(ref_str, static_ref_spid, None, bvs_part)
     return bvs_part
 
 
@@ -276,6 +344,9 @@ class ArithEvaluator(object):
     self.exec_opts = exec_opts
     self.parse_ctx = parse_ctx
     self.errfmt = errfmt
+    self.arith_memo = _ParseMemo(parse_ctx)
+    if mylib.PYTHON:
+      self.compiler = arith_compile.Compiler(self, mem)
 
   def CheckCircularDeps(self):
     # type: () -> None
@@ -352,14 +423,19 @@ class ArithEvaluator(object):
           return 0
 
         # For compatibility: Try to parse it as an expression and evaluate it.
-        a_parser = self.parse_ctx.MakeArithParser(s)
-        # don't know var name here
-        with alloc.ctx_Location(arena, source.Variable(None, span_id)):
-          try:
-            node2 = a_parser.Parse()  # may raise error.Parse
-          except error.Parse as e:
-            self.errfmt.PrettyPrintError(e)
-            e_die('Parse error in recursive arithmetic', span_id=e.span_id)
+        entry = self.arith_memo.Get(s, span_id)
+        if entry is not None:
+          node2 = entry.anode
+        else:
+          a_parser = self.parse_ctx.MakeArithParser(s)
+          # don't know var name here
+          with alloc.ctx_Location(arena, source.Variable(None, span_id)):
+            try:
+              node2 = a_parser.Parse()  # may raise error.Parse
+            except error.Parse as e:
+              self.errfmt.PrettyPrintError(e)
+              e_die('Parse error in recursive arithmetic', span_id=e.span_id)
+          self.arith_memo.Put(s, span_id, node2, None)
 
         # Prevent infinite recursion of $(( 1x )) -- it's a word that evaluates
         # to itself, and you don't want to reparse it as a word.
@@ -451,7 +527,13 @@ class ArithEvaluator(object):
 
     Also used internally.
     """
-    val = self.Eval(node)
+    if mylib.PYTHON:
+      return self.compiler.EvalToInt(node)  # falls back on _EvalToInt()
+    return self._EvalToInt(node)
+
+  def _EvalToInt(self, node):
+    # type: (arith_expr_t) -> int
+    val = self._Eval(node)
 
     # BASH_LINENO, arr (array name with shopt -s compat_array), etc.
     if val.tag_() in (value_e.MaybeStrArray, value_e.AssocArray) and node.tag_() == arith_expr_e.VarRef:
@@ -484,6 +566,15 @@ class ArithEvaluator(object):
     # can.  ${foo:-3}4 is OK.  $? will be a compound word too, so we don't have
     # to handle that as a special case.
 
+    if mylib.PYTHON:
+      # e.g. the update in for (( i = 0; i < n; ++i ))
+      if arith_compile.ReturnsInt(node):
+        return value.Int(self.compiler.EvalToInt(node))
+    return self._Eval(node)
+
+  def _Eval(self, node):
+    # type: (arith_expr_t) -> value_t
+    """The interpreter for Eval()."""
     UP_node = node
     with tagswitch(node) as case:
       if case(arith_expr_e.VarRef):  # $(( x ))  (can be array)
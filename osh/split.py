@@ -181,6 +181,12 @@ class SplitContext(object):
     Split used by word evaluation.  Also used by the explicit @split() functino.
     """
     sp = self._GetSplitter(ifs=ifs)
+
+    # Fast path for the default IFS, and others like IFS=$'\n'.  A backslash
+    # in s can join fields, so it needs the state machine.
+    if len(sp.ifs_other) == 0 and '\\' not in s:
+      return sp.SplitWhitespace(s)
+
     spans = sp.Split(s, True)
     if 0:
       for span in spans:
@@ -222,6 +228,41 @@ class IfsSplitter(_BaseSplitter):
     self.ifs_whitespace = ifs_whitespace
     self.ifs_other = ifs_other
 
+    # The char_kind of each byte, so Split() doesn't test string membership.
+    # A backslash in IFS is a delimiter rather than an escape.
+    self.char_kinds = [char_kind_i.Black] * 256
+    self.char_kinds[ord('\\')] = char_kind_i.Backslash
+    for c in ifs_other:
+      self.char_kinds[ord(c)] = char_kind_i.DE_Gray
+    for c in ifs_whitespace:
+      self.char_kinds[ord(c)] = char_kind_i.DE_White
+
+  def SplitWhitespace(self, s):
+    # type: (str) -> List[str]
+    """Split when IFS is only whitespace, and s has no backslashes.
+
+    The fields are just the runs of non-IFS chars, so we don't need the state
+    machine, spans, or _SpansToParts().
+    """
+    char_kinds = self.char_kinds
+    n = len(s)
+    parts = []  # type: List[str]
+
+    i = 0
+    while True:
+      # Skip IFS whitespace
+      while i < n and char_kinds[ord(s[i])] == char_kind_i.DE_White:
+        i += 1
+      if i == n:
+        break
+
+      start = i
+      while i < n and char_kinds[ord(s[i])] != char_kind_i.DE_White:
+        i += 1
+      parts.append(s[start:i])
+
+    return parts
+
   def Split(self, s, allow_escape):
     # type: (str, bool) -> List[Span]
     """
@@ -235,8 +276,7 @@ class IfsSplitter(_BaseSplitter):
     TODO: This should be (frag, do_split) pairs, to avoid IFS='\'
     double-escaping issue.
     """
-    ws_chars = self.ifs_whitespace
-    other_chars = self.ifs_other
+    char_kinds = self.char_kinds
 
     n = len(s)
     spans = [] # type: List[Span] # NOTE: in C, could reserve() this to len(s)
@@ -249,7 +289,7 @@ class IfsSplitter(_BaseSplitter):
     # This can't really be handled by the state machine.
 
     i = 0
-    while i < n and s[i] in self.ifs_whitespace:
+    while i < n and char_kinds[ord(s[i])] == char_kind_i.DE_White:
       i += 1
 
     # Append an ignored span.
@@ -265,13 +305,8 @@ class IfsSplitter(_BaseSplitter):
     while state != state_i.Done:
       if i < n:
         c = s[i]
-        if c in ws_chars:
-          ch = char_kind_i.DE_White
-        elif c in other_chars:
-          ch = char_kind_i.DE_Gray
-        elif allow_escape and c == '\\':
-          ch = char_kind_i.Backslash
-        else:
+        ch = char_kinds[ord(c)]
+        if ch == char_kind_i.Backslash and not allow_escape:
           ch = char_kind_i.Black
       elif i == n:
         ch = char_kind_i.Sentinel  # one more iterations for the end of string
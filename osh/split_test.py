@@ -26,6 +26,10 @@ def _RunSplitCases(test, sp, cases):
     test.assertEqual(expected_parts, parts,
         '%r: %s != %s' % (s, expected_parts, parts))
 
+    # The fast path agrees with the state machine
+    if len(sp.ifs_other) == 0 and '\\' not in s:
+      test.assertEqual(expected_parts, sp.SplitWhitespace(s))
+
 
 class SplitTest(unittest.TestCase):
 
@@ -54,6 +58,17 @@ class SplitTest(unittest.TestCase):
     parts = split._SpansToParts(s, spans, max_results=1)
     self.assertEqual(['one two'], parts)
 
+  def testSplitWhitespace(self):
+    sp = split.IfsSplitter(split.DEFAULT_IFS, '')
+    self.assertEqual([], sp.SplitWhitespace(''))
+    self.assertEqual([], sp.SplitWhitespace(' \t\n '))
+    self.assertEqual(['a', 'bc', 'd'], sp.SplitWhitespace('  a bc\n\td  '))
+    # Not IFS whitespace
+    self.assertEqual(['a\rb\x0b'], sp.SplitWhitespace('a\rb\x0b'))
+
+    sp = split.IfsSplitter('\n', '')
+    self.assertEqual(['a b', ' c'], sp.SplitWhitespace('a b\n\n c\n'))
+
   def testTrailingWhitespaceBug(self):
     # Bug: these differed
     CASES = [
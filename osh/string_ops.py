@@ -362,17 +362,8 @@ def _AllMatchPositions(s, regex):
 
   (If there are no matches, it returns the empty list.)
   """
-  matches = []  # type: List[Tuple[int, int]]
-  pos = 0
-  n = len(s)
-  while pos < n:  # needed to prevent infinite loop in (.*) case
-    m = libc.regex_first_group_match(regex, s, pos)
-    if m is None:
-      break
-    matches.append(m)
-    start, end = m
-    pos = end  # advance position
-  return matches
+  # One call into libc, rather than one regex_first_group_match() per match
+  return libc.regex_find_all(regex, s)
 
 
 def _PatSubAll(s, regex, replace_str):
@@ -392,9 +383,7 @@ class GlobReplacer(object):
   def __init__(self, regex, replace_str, slash_spid):
     # type: (str, str, int) -> None
 
-    # TODO: It would be nice to cache the compilation of the regex here,
-    # instead of just the string.  That would require more sophisticated use of
-    # the Python/C API in libc.c, which we might want to avoid.
+    # Note: libc.c caches the compiled regex, keyed by the string.
     self.regex = regex
     self.replace_str = replace_str
     self.slash_spid = slash_spid
@@ -412,7 +401,7 @@ class GlobReplacer(object):
       try:
         return _PatSubAll(s, regex, self.replace_str)  # loop over matches
       except RuntimeError as e:
-        # libc.regex_first_group_match raises RuntimeError.
+        # libc.regex_find_all raises RuntimeError.
         # note: MyPy doesn't know RuntimeError has e.message (and e.args)
         msg = e.message  # type: str
         e_die('Error matching regex %r: %s', regex, msg,
@@ -68,6 +68,9 @@ EXTGLOB_FILES = 1 << 2  # allow @(cc) from file system?
 EXTGLOB_MATCH = 1 << 3  # allow @(cc) in pattern matching?
 EXTGLOB_NESTED = 1 << 4  # for @(one|!(two|three))
 
+# The number of words that EvalWordSequence2() remembers
+_MAX_STATIC_ARGS = 10000
+
 # For EvalWordToString
 QUOTE_FNMATCH = 1 << 5
 QUOTE_ERE = 1 << 6
@@ -478,6 +481,11 @@ class AbstractWordEvaluator(StringWordEvaluator):
 
     self.globber = glob_.Globber(exec_opts)
 
+    if mylib.PYTHON:
+      # For EvalWordSequence2().  compound_word -> the arg it always
+      # evaluates to and its span ID, or None if it isn't a static word.
+      self.static_args = {}  # type: Dict[compound_word, Optional[Tuple[str, int]]]
+
   def CheckCircularDeps(self):
     # type: () -> None
     raise NotImplementedError()
@@ -2131,6 +2139,20 @@ class AbstractWordEvaluator(StringWordEvaluator):
 
     n = 0
     for i, w in enumerate(words):
+      if mylib.PYTHON:
+        # Fast path for words like echo and --flag.  They evaluate to one arg,
+        # which doesn't depend on IFS or glob options.
+        if w in self.static_args:
+          static_arg = self.static_args[w]
+          if static_arg is not None:
+            arg, spid = static_arg
+            if not (allow_assign and i == 0 and
+                    consts.LookupAssignBuiltin(arg) != consts.NO_INDEX):
+              strs.append(arg)
+              spids.append(spid)
+              n += 1
+              continue
+
       part_vals = []  # type: List[part_value_t]
       self._EvalWordToParts(w, part_vals, EXTGLOB_FILES)
 
@@ -2176,6 +2198,11 @@ class AbstractWordEvaluator(StringWordEvaluator):
       spid = word_.LeftMostSpanForWord(w)
       for _ in xrange(n_next - n):
         spids.append(spid)
+
+      if mylib.PYTHON:
+        if w not in self.static_args:
+          self._SaveStaticArg(w, strs, n, n_next, spid)
+
       n = n_next
 
     # A non-assignment command.
@@ -2183,6 +2210,23 @@ class AbstractWordEvaluator(StringWordEvaluator):
     # functions can override builtins.
     return cmd_value.Argv(strs, spids, None)
 
+  def _SaveStaticArg(self, w, strs, n, n_next, spid):
+    # type: (compound_word, List[str], int, int, int) -> None
+    """Remember what a word evaluated to, if it's static and not a glob.
+
+    The parts of a static word are never split, so IFS doesn't matter.
+    Without unquoted * ? or [], the word is never globbed, so noglob,
+    dashglob, nullglob, etc. don't matter.
+    """
+    if len(self.static_args) >= _MAX_STATIC_ARGS:
+      self.static_args.clear()  # e.g. eval in a loop makes new words
+
+    ok, _, _ = word_.StaticEval(w)
+    if ok and not glob_.LooksLikeStaticGlob(w) and n_next == n + 1:
+      self.static_args[w] = (strs[n], spid)
+    else:
+      self.static_args[w] = None
+
   def EvalWordSequence(self, words):
     # type: (List[compound_word]) -> List[str]
     """For arrays and for loops.  They don't allow assignment builtins."""
@@ -13,6 +13,7 @@
 #include <limits.h>
 #include <wchar.h>
 #include <stdlib.h>
+#include <string.h>  // strcmp(), strdup()
 #include <sys/ioctl.h>
 #include <locale.h>
 #include <fnmatch.h>
@@ -160,23 +161,91 @@ func_glob(PyObject *self, PyObject *args) {
   return matches;
 }
 
+// Cache of compiled regexes, keyed by pattern and cflags.
+//
+// Loops like 'while ...; do [[ $x =~ $pat ]]; done' and ${s//pat/rep} use the
+// same few patterns over and over, and regcomp() is much more expensive than
+// regexec().  Entries are evicted in least recently used order.
+
+#define REGEX_CACHE_SIZE 32
+
+typedef struct {
+  char* pattern;  // owned; NULL means the slot is empty
+  int cflags;
+  regex_t re;
+  unsigned long last_used;
+} regex_cache_entry;
+
+static regex_cache_entry regex_cache[REGEX_CACHE_SIZE];
+static unsigned long regex_cache_tick = 0;
+static long regex_cache_hits = 0;
+static long regex_cache_misses = 0;
+
+// Returns a compiled regex owned by the cache, which is valid until the next
+// call.  On a syntax error, sets RuntimeError and returns NULL.
+static regex_t* regex_cache_get(const char* pattern, int cflags) {
+  regex_cache_tick++;
+
+  regex_cache_entry* victim = &regex_cache[0];
+  int i;
+  for (i = 0; i < REGEX_CACHE_SIZE; i++) {
+    regex_cache_entry* e = &regex_cache[i];
+    if (e->pattern == NULL) {
+      victim = e;
+      continue;
+    }
+    if (e->cflags == cflags && strcmp(e->pattern, pattern) == 0) {
+      e->last_used = regex_cache_tick;
+      regex_cache_hits++;
+      return &e->re;
+    }
+    if (victim->pattern != NULL && e->last_used < victim->last_used) {
+      victim = e;
+    }
+  }
+  regex_cache_misses++;
+
+  regex_t pat;
+  int status = regcomp(&pat, pattern, cflags);
+  if (status != 0) {
+    char error_string[80];
+    regerror(status, &pat, error_string, 80);
+    PyErr_SetString(PyExc_RuntimeError, error_string);
+    return NULL;
+  }
+
+  char* pattern_copy = strdup(pattern);
+  if (pattern_copy == NULL) {
+    regfree(&pat);
+    PyErr_NoMemory();
+    return NULL;
+  }
+
+  if (victim->pattern != NULL) {
+    debug("regex cache: evicting %s", victim->pattern);
+    regfree(&victim->re);
+    free(victim->pattern);
+  }
+  victim->pattern = pattern_copy;
+  victim->cflags = cflags;
+  victim->re = pat;
+  victim->last_used = regex_cache_tick;
+  return &victim->re;
+}
+
 static PyObject *
 func_regex_parse(PyObject *self, PyObject *args) {
   const char* pattern;
   if (!PyArg_ParseTuple(args, "s", &pattern)) {
     return NULL;
   }
-  regex_t pat;
   // This is an extended regular expression rather than a basic one, i.e. we
   // use 'a*' instaed of 'a\*'.
-  int status = regcomp(&pat, pattern, REG_EXTENDED);
-  if (status != 0) {
-    char error_string[80];
-    regerror(status, &pat, error_string, 80);
-    PyErr_SetString(PyExc_RuntimeError, error_string);
+  //
+  // Compiling it also warms the cache for the first match.
+  if (regex_cache_get(pattern, REG_EXTENDED) == NULL) {
     return NULL;
   }
-  regfree(&pat);
 
   Py_RETURN_TRUE;
 }
@@ -189,25 +258,20 @@ func_regex_match(PyObject *self, PyObject *args) {
     return NULL;
   }
 
-  regex_t pat;
-  int status = regcomp(&pat, pattern, REG_EXTENDED);
-  if (status != 0) {
-    char error_string[80];
-    regerror(status, &pat, error_string, 80);
-    PyErr_SetString(PyExc_RuntimeError, error_string);
+  regex_t* pat = regex_cache_get(pattern, REG_EXTENDED);
+  if (pat == NULL) {
     return NULL;
   }
 
-  int outlen = pat.re_nsub + 1;
+  int outlen = pat->re_nsub + 1;
   PyObject *ret = PyList_New(outlen);
 
   if (ret == NULL) {
-    regfree(&pat);
     return NULL;
   }
 
   regmatch_t *pmatch = (regmatch_t*) malloc(sizeof(regmatch_t) * outlen);
-  int match = regexec(&pat, str, outlen, pmatch, 0);
+  int match = regexec(pat, str, outlen, pmatch, 0);
   if (match == 0) {
     int i;
     for (i = 0; i < outlen; i++) {
@@ -218,9 +282,9 @@ func_regex_match(PyObject *self, PyObject *args) {
   }
 
   free(pmatch);
-  regfree(&pat);
 
   if (match != 0) {
+    Py_DECREF(ret);
     Py_RETURN_NONE;
   }
 
@@ -243,25 +307,20 @@ func_regex_first_group_match(PyObject *self, PyObject *args) {
     return NULL;
   }
 
-  regex_t pat;
   regmatch_t m[NMATCH];
 
   // Could have been checked by regex_parse for [[ =~ ]], but not for glob
   // patterns like ${foo/x*/y}.
 
-  int status = regcomp(&pat, pattern, REG_EXTENDED);
-  if (status != 0) {
-    char error_string[80];
-    regerror(status, &pat, error_string, 80);
-    PyErr_SetString(PyExc_RuntimeError, error_string);
+  regex_t* pat = regex_cache_get(pattern, REG_EXTENDED);
+  if (pat == NULL) {
     return NULL;
   }
 
   debug("first_group_match pat %s str %s pos %d", pattern, str, pos);
 
   // Match at offset 'pos'
-  int result = regexec(&pat, str + pos, NMATCH, m, 0 /*flags*/);
-  regfree(&pat);
+  int result = regexec(pat, str + pos, NMATCH, m, 0 /*flags*/);
 
   if (result != 0) {
     Py_RETURN_NONE;  // no match
@@ -273,6 +332,55 @@ func_regex_first_group_match(PyObject *self, PyObject *args) {
   return Py_BuildValue("(i,i)", pos + start, pos + end);
 }
 
+static PyObject *
+func_regex_find_all(PyObject *self, PyObject *args) {
+  const char* pattern;
+  const char* str;
+  if (!PyArg_ParseTuple(args, "ss", &pattern, &str)) {
+    return NULL;
+  }
+
+  regex_t* pat = regex_cache_get(pattern, REG_EXTENDED);
+  if (pat == NULL) {
+    return NULL;
+  }
+
+  PyObject* results = PyList_New(0);
+  if (results == NULL) {
+    return NULL;
+  }
+
+  int n = strlen(str);
+  int pos = 0;
+  while (pos < n) {  // needed to prevent infinite loop in (.*) case
+    regmatch_t m[1];
+    if (regexec(pat, str + pos, 1, m, 0 /*flags*/) != 0) {
+      break;  // no more matches
+    }
+    int start = pos + m[0].rm_so;
+    int end = pos + m[0].rm_eo;
+
+    PyObject* span = Py_BuildValue("(i,i)", start, end);
+    if (span == NULL || PyList_Append(results, span) < 0) {
+      Py_XDECREF(span);
+      Py_DECREF(results);
+      return NULL;
+    }
+    Py_DECREF(span);
+
+    // Advance past the match.  An empty match would otherwise be found again
+    // at the same position.
+    pos = (end == start) ? end + 1 : end;
+  }
+
+  return results;
+}
+
+static PyObject *
+func_regex_cache_stats(PyObject *self, PyObject *unused) {
+  return Py_BuildValue("(l,l)", regex_cache_hits, regex_cache_misses);
+}
+
 // We do this in C so we can remove '%f' % 0.1 from the CPython build.  That
 // involves dtoa.c and pystrod.c, which are thousands of lines of code.
 static PyObject *
@@ -377,6 +485,13 @@ static PyMethodDef methods[] = {
   // the regex is invalid.
   {"regex_first_group_match", func_regex_first_group_match, METH_VARARGS, ""},
 
+  // Return the (start, end) positions of all non-overlapping matches of the
+  // regex.  Raises RuntimeError if the regex is invalid.
+  {"regex_find_all", func_regex_find_all, METH_VARARGS, ""},
+
+  // Return (hits, misses) for the cache of compiled regexes.
+  {"regex_cache_stats", func_regex_cache_stats, METH_NOARGS, ""},
+
   // "Print three floating point values for the 'time' builtin.
   {"print_time", func_print_time, METH_VARARGS, ""},
 
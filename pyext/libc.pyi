@@ -5,6 +5,8 @@ def glob(pat: str) -> List[str]: ...
 def fnmatch(pat: str, s: str) -> bool: ...
 def regex_first_group_match(regex: str, s: str, pos: int) -> Optional[Tuple[int, int]]: ...
 def regex_match(regex: str, s: str) -> List[str]: ...
+def regex_find_all(regex: str, s: str) -> List[Tuple[int, int]]: ...
+def regex_cache_stats() -> Tuple[int, int]: ...
 def wcswidth(s: str) -> int: ...
 def get_terminal_width() -> int: ...
 def print_time(real: float, user: float, sys: float) -> None: ...
@@ -229,6 +229,41 @@ class LibcTest(unittest.TestCase):
     self.assertRaises(
         RuntimeError, libc.regex_first_group_match, r'*', 'abcd', 0)
 
+  def testRegexFindAll(self):
+    s = 'oXooXoooXoX'
+    self.assertEqual(
+        [(1, 3), (4, 6), (8, 10)],
+        libc.regex_find_all('X.', s))
+
+    self.assertEqual([], libc.regex_find_all('z', s))
+    self.assertEqual([(0, 11)], libc.regex_find_all('(.*)', s))
+
+    # Empty matches advance one character
+    self.assertEqual([(0, 0), (1, 1)], libc.regex_find_all('z*', 'ab'))
+
+    # Syntax Error
+    self.assertRaises(RuntimeError, libc.regex_find_all, r'*', 'abcd')
+
+  def testRegexCache(self):
+    hits, misses = libc.regex_cache_stats()
+
+    for i in xrange(10):
+      libc.regex_match('^cache-test-([0-9]+)$', 'cache-test-%d' % i)
+    h, m = libc.regex_cache_stats()
+    self.assertEqual(hits + 9, h)
+    self.assertEqual(misses + 1, m)
+
+    # Evict everything, and then the pattern has to be compiled again
+    for i in xrange(100):
+      libc.regex_match('evict-%d' % i, 'x')
+    libc.regex_match('^cache-test-([0-9]+)$', 'cache-test-1')
+    h, m = libc.regex_cache_stats()
+    self.assertEqual(misses + 102, m)
+
+    # Syntax errors aren't cached
+    self.assertRaises(RuntimeError, libc.regex_match, r'*', 'abcd')
+    self.assertRaises(RuntimeError, libc.regex_match, r'*', 'abcd')
+
   def testRegexFirstGroupMatchError(self):
     # Helping to debug issue #291
     s = ''
@@ -110,6 +110,7 @@ def dup(fd: int) -> int: ...
 def dup2(fd: int, fd2: int) -> None: ...
 def execv(path: str, args: Sequence[str], env: Mapping[str, str]) -> None: ...
 def execve(path: str, args: Sequence[str], env: Mapping[str, str]) -> None: ...
+def posix_spawn(path: str, args: List[str], env: Dict[str, str], default_sigs: List[int]) -> int: ...
 def fchdir(fd: int) -> None: ...
 def fchmod(fd: int, mode: int) -> None: ...
 def fchown(fd: int, uid: int, gid: int) -> None: ...
@@ -151,7 +152,7 @@ def lchown(path: unicode, uid: int, gid: int) -> None: ...
 def link(source: unicode, link_name: str) -> None: ...
 _T = TypeVar("_T")
 def listdir(path: _T) -> List[_T]: ...
-def lseek(fd: int, pos: int, how: int) -> None: ...
+def lseek(fd: int, pos: int, how: int) -> int: ...
 def lstat(path: unicode) -> stat_result: ...
 def major(device: int) -> int: ...
 def makedev(major: int, minor: int) -> int: ...
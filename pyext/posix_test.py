@@ -28,6 +28,7 @@ Other notes:
 """
 from __future__ import print_function
 
+import errno
 import signal
 import subprocess
 import unittest
@@ -51,6 +52,7 @@ FUNCS = [
     "_exit",
     "execv",
     "execve",
+    "posix_spawn",
     "fork",
     "geteuid",
     "getpid",
@@ -60,8 +62,10 @@ FUNCS = [
     "close",
     "dup2",
     "read",
+    "lseek",
     "write",
     "fdopen",
+    "fstat",
     "isatty",
     "pipe",
     "strerror",
@@ -101,6 +105,46 @@ class PosixTest(unittest.TestCase):
     posix_.read(0, 0)
     posix_.write(1, '')
 
+  def testLseek(self):
+    fd = posix_.open('pyext/posix_test.py', posix_.O_RDONLY)
+    try:
+      self.assertEqual('#!', posix_.read(fd, 2))
+      self.assertEqual(2, posix_.lseek(fd, 0, 1))  # SEEK_CUR
+
+      self.assertEqual(1, posix_.lseek(fd, -1, 1))
+      self.assertEqual('!', posix_.read(fd, 1))
+
+      st = posix_.fstat(fd)
+      self.assert_(st.st_size > 0)
+    finally:
+      posix_.close(fd)
+
+    r, w = posix_.pipe()
+    try:
+      posix_.lseek(r, 0, 1)
+    except OSError as e:
+      self.assertEqual(errno.ESPIPE, e.errno)
+    else:
+      self.fail('Expected ESPIPE')
+    posix_.close(r)
+    posix_.close(w)
+
+  def testPosixSpawn(self):
+    # Python ignores SIGPIPE, and the child should get the default back
+    pid = posix_.posix_spawn(
+        '/bin/sh', ['sh', '-c', 'test "$FOO" = bar && kill -PIPE $$'],
+        {'FOO': 'bar'}, [signal.SIGPIPE])
+    _, status = posix_.waitpid(pid, 0)
+    self.assert_(posix_.WIFSIGNALED(status))
+    self.assertEqual(signal.SIGPIPE, posix_.WTERMSIG(status))
+
+    try:
+      posix_.posix_spawn('/nonexistent', ['x'], {}, [])
+    except OSError as e:
+      self.assertEqual(errno.ENOENT, e.errno)
+    else:
+      self.fail('Expected ENOENT')
+
   def testRead(self):
     if posix_.environ.get('EINTR_TEST'):
       # Now we can do kill -TERM PID can get EINTR.
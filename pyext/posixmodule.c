@@ -46,6 +46,7 @@ corresponding Unix manual entries for more information on calls.");
 
 #ifdef HAVE_SIGNAL_H
 #include <signal.h>
+#include <spawn.h>              /* posix_spawn() */
 #endif
 
 #ifdef HAVE_FCNTL_H
@@ -1262,6 +1263,120 @@ posix_execve(PyObject *self, PyObject *args)
     PyMem_Free(path);
     return NULL;
 }
+
+/* posix_spawn(path, args, env, default_sigs) -> pid
+
+   Like fork() then execve(), but without copying the page tables of a big
+   shell.  Signals in default_sigs are reset to SIG_DFL in the child.  Raises
+   OSError if the program can't be executed. */
+
+static PyObject *
+posix_posix_spawn(PyObject *self, PyObject *args)
+{
+    char *path;
+    PyObject *argv, *env, *sigs;
+    char **argvlist = NULL;
+    char **envlist = NULL;
+    PyObject *keys = NULL, *vals = NULL;
+    PyObject *result = NULL;
+    Py_ssize_t i, argc, envc = 0, lastarg = 0, n_env;
+    posix_spawnattr_t attr;
+    sigset_t sigdefault;
+    pid_t pid;
+    int err;
+
+    if (!PyArg_ParseTuple(args, "etO!O!O!:posix_spawn",
+                          Py_FileSystemDefaultEncoding, &path,
+                          &PyList_Type, &argv, &PyDict_Type, &env,
+                          &PyList_Type, &sigs))
+        return NULL;
+
+    argc = PyList_Size(argv);
+    argvlist = PyMem_NEW(char *, argc+1);
+    if (argvlist == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    for (i = 0; i < argc; i++) {
+        if (!PyArg_Parse(PyList_GetItem(argv, i),
+                         "et;posix_spawn() arg 2 must contain only strings",
+                         Py_FileSystemDefaultEncoding,
+                         &argvlist[i])) {
+            lastarg = i;
+            goto done;
+        }
+    }
+    lastarg = argc;
+    argvlist[argc] = NULL;
+
+    n_env = PyDict_Size(env);
+    envlist = PyMem_NEW(char *, n_env + 1);
+    if (envlist == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    keys = PyDict_Keys(env);
+    vals = PyDict_Values(env);
+    if (!keys || !vals)
+        goto done;
+    for (i = 0; i < n_env; i++) {
+        char *p, *k, *v;
+        size_t len;
+        PyObject *key = PyList_GetItem(keys, i);
+        PyObject *val = PyList_GetItem(vals, i);
+
+        if (!PyArg_Parse(key, "s;posix_spawn() arg 3 contains a non-string key",
+                         &k) ||
+            !PyArg_Parse(val,
+                         "s;posix_spawn() arg 3 contains a non-string value",
+                         &v))
+            goto done;
+
+        len = PyString_Size(key) + PyString_Size(val) + 2;
+        p = PyMem_NEW(char, len);
+        if (p == NULL) {
+            PyErr_NoMemory();
+            goto done;
+        }
+        PyOS_snprintf(p, len, "%s=%s", k, v);
+        envlist[envc++] = p;
+    }
+    envlist[envc] = NULL;
+
+    sigemptyset(&sigdefault);
+    for (i = 0; i < PyList_Size(sigs); i++) {
+        long sig_num = PyInt_AsLong(PyList_GetItem(sigs, i));
+        if (sig_num == -1 && PyErr_Occurred())
+            goto done;
+        sigaddset(&sigdefault, (int)sig_num);
+    }
+
+    posix_spawnattr_init(&attr);
+    posix_spawnattr_setsigdefault(&attr, &sigdefault);
+    posix_spawnattr_setflags(&attr, POSIX_SPAWN_SETSIGDEF);
+    err = posix_spawn(&pid, path, NULL, &attr, argvlist, envlist);
+    posix_spawnattr_destroy(&attr);
+
+    if (err != 0) {
+        errno = err;
+        posix_error();
+    } else {
+        result = PyInt_FromLong((long)pid);
+    }
+
+  done:
+    if (envlist != NULL) {
+        while (--envc >= 0)
+            PyMem_DEL(envlist[envc]);
+        PyMem_DEL(envlist);
+    }
+    if (argvlist != NULL)
+        free_string_array(argvlist, lastarg);
+    Py_XDECREF(vals);
+    Py_XDECREF(keys);
+    PyMem_Free(path);
+    return result;
+}
 #endif /* HAVE_EXECV */
 
 #ifdef HAVE_FORK
@@ -2034,6 +2149,53 @@ posix_dup2(PyObject *self, PyObject *args)
 }
 
 
+PyDoc_STRVAR_remove(posix_lseek__doc__,
+"lseek(fd, pos, how) -> newpos\n\n\
+Set the current position of a file descriptor.\n\
+Return the new cursor position in bytes, starting from the beginning.");
+
+static PyObject *
+posix_lseek(PyObject *self, PyObject *args)
+{
+    int fd, how;
+    off_t pos, res;
+    PyObject *posobj;
+    if (!PyArg_ParseTuple(args, "iOi:lseek", &fd, &posobj, &how))
+        return NULL;
+#ifdef SEEK_SET
+    /* Turn 0, 1, 2 into SEEK_{SET,CUR,END} */
+    switch (how) {
+    case 0: how = SEEK_SET; break;
+    case 1: how = SEEK_CUR; break;
+    case 2: how = SEEK_END; break;
+    }
+#endif /* SEEK_END */
+
+#if !defined(HAVE_LARGEFILE_SUPPORT)
+    pos = PyInt_AsLong(posobj);
+#else
+    pos = PyLong_Check(posobj) ?
+        PyLong_AsLongLong(posobj) : PyInt_AsLong(posobj);
+#endif
+    if (PyErr_Occurred())
+        return NULL;
+
+    if (!_PyVerify_fd(fd))
+        return posix_error();
+    Py_BEGIN_ALLOW_THREADS
+    res = lseek(fd, pos, how);
+    Py_END_ALLOW_THREADS
+    if (res < 0)
+        return posix_error();
+
+#if !defined(HAVE_LARGEFILE_SUPPORT)
+    return PyInt_FromLong(res);
+#else
+    return PyLong_FromLongLong(res);
+#endif
+}
+
+
 PyDoc_STRVAR_remove(posix_read__doc__,
 "read(fd, buffersize) -> string\n\n\
 Read a file descriptor.");
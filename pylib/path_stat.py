@@ -17,6 +17,16 @@ def exists(path):
     return True
 
 
+def mtime(path):
+    # type: (str) -> float
+    """Return the modification time of path, or -1 if it doesn't exist."""
+    try:
+        st = posix.stat(path)
+    except posix.error:
+        return -1
+    return st.st_mtime
+
+
 def isdir(s):
     # type: (str) -> bool
     """Return true if the pathname refers to an existing directory."""
@@ -576,6 +576,26 @@ echo $(( a2 ))
 0
 0
 ## END
+
+#### eval_unsafe_arith evaluates the same string in a loop
+shopt -s eval_unsafe_arith
+e='a * 2'
+for a in 1 2 3; do
+  echo $(( e + 1 ))
+done
+e='a - 1'
+for a in 1 2; do
+  echo $(( e ))
+done
+## STDOUT:
+3
+5
+7
+0
+1
+## END
+## N-I dash status: 2
+## N-I dash stdout-json: ""
  
 #### nested ternary (bug fix)
 echo $((1?2?3:4:5))
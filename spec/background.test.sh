@@ -82,6 +82,19 @@ wait  # wait for all gives 0
 echo "status=$?"
 ## stdout: status=0
 
+#### Many jobs exiting at once, wait all
+for i in 1 2 3 4 5 6 7 8 9 10; do
+  { echo $i > $TMP/job$i; exit $i; } &
+done
+wait
+echo "status=$?"
+cat $TMP/job* | sort -n | tr '\n' ' '
+echo
+## STDOUT:
+status=0
+1 2 3 4 5 6 7 8 9 10 
+## END
+
 #### Wait on background process PID
 { sleep 0.09; exit 9; } &
 pid1=$!
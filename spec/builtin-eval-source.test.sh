@@ -121,6 +121,33 @@ echo status=$?
 ## OK mksh stdout-json: ""
 ## OK mksh status: 1
 
+#### Eval the same string in a loop, where it defines an alias the 2nd time
+shopt -s expand_aliases  # bash
+e() { echo func "$@"; }
+for define in '' 1 ''; do
+  eval 'if test -n "$define"; then alias e="echo alias"; fi
+e hi'
+done
+## STDOUT:
+func hi
+alias hi
+alias hi
+## END
+
+#### OSH_CODE_CACHE_SIZE that isn't an integer
+OSH_CODE_CACHE_SIZE=%d
+eval 'echo hi'
+echo status=$?
+## status: 1
+## STDOUT:
+hi
+## END
+## N-I bash/dash/mksh/zsh status: 0
+## N-I bash/dash/mksh/zsh STDOUT:
+hi
+status=0
+## END
+
 #### Eval in does tilde expansion
 
 x="~"
@@ -247,3 +274,68 @@ mkdir -p dir
 echo status=$?
 ## stdout: status=1
 ## OK dash/zsh/mksh stdout: status=0
+
+#### source with $OSH_PARSE_CACHE_DIR (saves, then loads)
+cd $TMP
+mkdir -p parse-cache
+export OSH_PARSE_CACHE_DIR=$TMP/parse-cache
+cat >cached.sh <<'EOF2'
+f() { a[1+1]=x; echo "f ${a[2]} `echo back` $LINENO"; }
+cat <<END
+here $((1 + 2))
+END
+EOF2
+. ./cached.sh
+f
+. ./cached.sh
+f
+## STDOUT:
+here 3
+f x back 1
+here 3
+f x back 1
+## END
+## N-I dash status: 2
+## N-I dash STDOUT:
+here 3
+## END
+
+#### source with $OSH_PARSE_CACHE_DIR, file rewritten with the same mtime
+cd $TMP
+mkdir -p parse-cache
+export OSH_PARSE_CACHE_DIR=$TMP/parse-cache
+echo 'echo AAA' > same-mtime.sh
+touch -t 202001010000 same-mtime.sh
+. ./same-mtime.sh
+echo 'echo BBB' > same-mtime.sh
+touch -t 202001010000 same-mtime.sh
+. ./same-mtime.sh
+## STDOUT:
+AAA
+BBB
+## END
+
+#### source with $OSH_PARSE_CACHE_DIR and an alias defined in the file
+shopt -s expand_aliases  # bash
+cd $TMP
+mkdir -p parse-cache
+export OSH_PARSE_CACHE_DIR=$TMP/parse-cache
+cat >aliased.sh <<'EOF2'
+if test -n "$define"; then alias e='echo alias'; fi
+e hi
+EOF2
+e() { echo func "$@"; }
+. ./aliased.sh
+. ./aliased.sh
+define=1
+. ./aliased.sh
+## STDOUT:
+func hi
+func hi
+alias hi
+## END
+## N-I mksh/zsh STDOUT:
+func hi
+func hi
+func hi
+## END
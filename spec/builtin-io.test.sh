@@ -541,6 +541,21 @@ bar 1
 2
 ## END
 
+#### read from a file leaves the offset after the delimiter
+# 'read' may read ahead on a regular file, but it has to give back the bytes it
+# didn't consume, so that other processes see them.
+printf '1\n2\n3\n4\n' > $TMP/lines.txt
+while read x; do
+  echo "read $x"
+  head -n 1
+done < $TMP/lines.txt
+## STDOUT:
+read 1
+2
+read 3
+4
+## END
+
 #### read -t 0 tests if input is available
 case $SH in (dash|zsh|mksh) exit ;; esac
 
@@ -749,3 +764,96 @@ status=2
 status=2
 ## END
 
+
+#### Builtin output is in order with other writers to the same file
+rm -f out.txt
+{
+  echo 1
+  printf '%s\n' 2
+  sh -c 'echo 3'
+  echo 4
+  ( echo 5 )
+  echo 6 >> out.txt
+  echo 7 | cat
+  echo 8
+} >> out.txt
+cat out.txt
+## STDOUT:
+1
+2
+3
+4
+5
+6
+7
+8
+## END
+
+#### Builtin output is in order with stderr when they're the same file
+{ echo out1; echo err1 >&2; echo out2; ls /nonexistent-dir >/dev/null; echo out3; } > both.txt 2>&1
+grep -v nonexistent both.txt
+## STDOUT:
+out1
+err1
+out2
+out3
+## END
+
+#### Builtin output is in order with a background job's output
+rm -f bg.txt
+{
+  (sleep 0.2; echo child) &
+  echo parent
+  # a loop of builtins that may take longer than the sleep
+  for i in 1 2 3 4 5 6 7 8 9 10; do
+    for j in 1 2 3 4 5 6 7 8 9 10; do
+      for k in 1 2 3 4 5 6 7 8 9 10; do
+        for m in 1 2 3 4 5 6 7 8 9 10; do
+          :
+        done
+      done
+    done
+  done
+  wait
+} > bg.txt
+cat bg.txt
+## STDOUT:
+parent
+child
+## END
+
+#### Builtin output is written when the shell is killed
+rm -f killed.txt
+$SH -c 'echo start; while true; do :; done' > killed.txt &
+sleep 0.5
+kill -TERM $!
+wait $!
+echo status=$?
+cat killed.txt
+## STDOUT:
+status=143
+start
+## END
+
+#### A loop of builtins writes its output with few write() calls
+# syscw in /proc/$$/io counts the write() calls the process made
+$SH -c '
+i=0
+while test $i -lt 2000; do
+  echo "line $i"
+  i=$((i + 1))
+done
+while read -r name val; do
+  case $name in syscw:) echo $val > syscw.txt ;; esac
+done < /proc/$$/io
+' > lines.txt
+wc -l < lines.txt
+if test "$(cat syscw.txt)" -lt 200; then echo fewer; else echo many; fi
+## STDOUT:
+2000
+fewer
+## END
+## N-I bash/dash STDOUT:
+2000
+many
+## END
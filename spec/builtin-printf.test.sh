@@ -898,3 +898,22 @@ printf $'\U0z'
 ## stdout-json: "x"
 ## OK zsh stdout-repr: "x\0z\0z"
 ## N-I dash/ash stdout-json: ""
+
+#### Same format with different args, including ones the simple directives can't handle
+for arg in 42 ' 7' "'A" -3 x; do
+  printf '[%s %d %x]\n' "$arg" "$arg" "${arg#-}"
+done
+## status: 1
+## STDOUT:
+[42 42 2a]
+[ 7 7 7]
+['A 65 41]
+[-3 -3 3]
+## END
+## OK bash/dash STDOUT:
+[42 42 2a]
+[ 7 7 7]
+['A 65 41]
+[-3 -3 3]
+[x 0 0]
+## END
@@ -270,3 +270,43 @@ status=1
 status=1
 ## END
 ## OK bash stdout-json: "\nstatus=0\n\nstatus=0\n"
+
+#### Trailing newlines are stripped from large output
+x=$(seq 100000; echo; echo)
+echo ${#x}
+echo "${x: -6}"
+## STDOUT:
+588894
+100000
+## END
+## N-I dash status: 2
+## N-I dash STDOUT:
+588894
+## END
+
+#### OSH_CSUB_MAX_BYTES limits the size of command sub output
+OSH_CSUB_MAX_BYTES=10
+x=$(echo 123456789)
+echo "[$x]"
+x=$(seq 1000)
+echo status=$?
+## status: 1
+## STDOUT:
+[123456789]
+## END
+## N-I bash/dash/mksh/zsh status: 0
+## N-I bash/dash/mksh/zsh STDOUT:
+[123456789]
+status=0
+## END
+
+#### OSH_CSUB_MAX_BYTES that isn't an integer
+OSH_CSUB_MAX_BYTES=%s
+x=$(echo hi)
+echo "[$x]"
+## status: 1
+## stdout-json: ""
+## N-I bash/dash/mksh/zsh status: 0
+## N-I bash/dash/mksh/zsh STDOUT:
+[hi]
+## END
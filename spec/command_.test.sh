@@ -127,6 +127,74 @@ one
 status=0
 ## END
 
+#### command not found, then created in $PATH
+cd $TMP
+PATH="$TMP/neg:$PATH"
+mkdir -p neg
+rm -f neg/mycmd
+
+mycmd 2>/dev/null
+echo status=$?
+command -v mycmd
+echo status=$?
+
+echo 'echo created' > neg/mycmd
+chmod +x neg/mycmd
+mycmd
+echo status=$?
+path=$(command -v mycmd)
+echo status=$?
+echo ${path#"$TMP/"}
+## STDOUT:
+status=127
+status=1
+created
+status=0
+status=0
+neg/mycmd
+## END
+## OK dash STDOUT:
+status=127
+status=127
+created
+status=0
+status=0
+neg/mycmd
+## END
+
+#### assigning PATH clears the cache
+cd $TMP
+PATH="one:two:$PATH"
+mkdir -p one two
+rm -f one/mycmd two/mycmd
+
+echo 'echo two' > two/mycmd
+chmod +x two/mycmd
+mycmd
+
+echo 'echo one' > one/mycmd
+chmod +x one/mycmd
+mycmd  # still runs the cached 'two'
+
+PATH="two:one:$PATH"
+mycmd
+PATH="one:$PATH"
+mycmd
+## STDOUT:
+two
+two
+two
+one
+## END
+
+# zsh doesn't do caching!
+## OK zsh STDOUT:
+two
+one
+two
+one
+## END
+
 #### Non-executable on $PATH
 
 # shells differ in whether they actually execve('one/cmd') and get EPERM
@@ -148,6 +216,28 @@ two
 status=0
 ## END
 
+#### chmod +x on $PATH after a lookup failed
+cd $TMP
+PATH="three:$PATH"
+mkdir -p three
+rm -f three/nx
+echo 'echo three' > three/nx
+nx 2>/dev/null
+echo status=$?
+chmod +x three/nx
+nx
+echo status=$?
+## STDOUT:
+status=126
+three
+status=0
+## END
+## OK osh/dash/mksh/zsh STDOUT:
+status=127
+three
+status=0
+## END
+
 #### hash without args prints the cache
 whoami >/dev/null
 hash
@@ -184,6 +274,26 @@ status=0
 status=0
 ## END
 
+#### hash -s prints cache stats
+hash -r
+whoami >/dev/null
+whoami >/dev/null
+_nonexistent_ 2>/dev/null
+_nonexistent_ 2>/dev/null
+hash -s
+echo status=$?
+## STDOUT:
+hits	1
+misses	3
+negative_hits	1
+cached	1
+cached_misses	1
+status=0
+## END
+## N-I dash/bash/mksh/zsh STDOUT:
+status=2
+## END
+
 #### hash -r doesn't allow additional args
 hash -r whoami >/dev/null  # avoid weird output with mksh
 echo status=$?
@@ -779,3 +779,37 @@ common
 status=0
 2 stderr.txt
 ## END
+
+
+#### perf_counters reports builtins, procs, and externals at exit
+
+$SH -c '
+shopt -s perf_counters
+f() { echo hi; }
+f
+f
+env true
+' 2>stderr.txt
+echo status=$?
+
+# kind, count, and base name columns; the times and paths vary
+awk 'NR > 1 { n = split($5, a, "/"); print $1, $2, a[n] }' stderr.txt | sort
+## STDOUT:
+hi
+hi
+status=0
+builtin 2 echo
+external 1 env
+proc 2 f
+## END
+
+#### perf_counters reports when the last command is external
+$SH -c 'shopt -s perf_counters; echo hi; env true' 2>stderr.txt
+echo status=$?
+awk 'NR > 1 { n = split($5, a, "/"); print $1, $2, a[n] }' stderr.txt | sort
+## STDOUT:
+hi
+status=0
+builtin 1 echo
+external 1 env
+## END
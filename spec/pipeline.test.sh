@@ -164,3 +164,23 @@ echo ${PIPESTATUS[@]}
 ## N-I zsh stdout:
 ## N-I dash status: 2
 ## N-I dash stdout-json: ""
+
+#### Builtins at the front of a pipeline don't change shell state
+false
+printf '%s\n' "$?" | echo "$?" | cat
+echo ${y=set} | cat
+echo "y=$y"
+## STDOUT:
+1
+set
+y=
+## END
+
+#### Pipeline stage can write more than a pipe holds
+s=$(printf '%0100000d' 0)
+echo "$s" | wc -c | tr -d ' '
+echo "$s" | echo ignored | cat
+## STDOUT:
+100001
+ignored
+## END
@@ -500,6 +500,42 @@ FOO
 ## END
 ## N-I dash/ash/yash stdout-json: "\n"
 
+#### $(< file) with a nonexistent file, and with a directory
+foo=$(< nonexistent)
+echo status=$? "[$foo]"
+foo=$(< /)
+echo status=$? "[$foo]"
+## STDOUT:
+status=1 []
+status=2 []
+## END
+## OK bash STDOUT:
+status=1 []
+status=0 []
+## END
+## N-I dash STDOUT:
+status=2 []
+status=0 []
+## END
+
+#### $(< file) strips trailing newlines, but not leading ones
+printf '\n\nFOO\n\n' > myfile
+foo=$(< myfile)
+echo "[$foo]"
+f=myfile
+foo=$(< $f)
+echo ${#foo}
+## STDOUT:
+[
+
+FOO]
+5
+## END
+## N-I dash/ash/yash STDOUT:
+[]
+0
+## END
+
 #### $(< file) with more statements
 
 # note that it doesn't do this without a command sub!
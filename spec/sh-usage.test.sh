@@ -88,3 +88,41 @@ $SH --login -c 'exit 0'
 ## status: 0
 ## OK dash status: 2
 ## OK mksh status: 1
+
+#### OSH_SAMPLE_PROFILE writes folded stacks at exit
+rm -f $TMP/prof.txt
+OSH_SAMPLE_PROFILE=$TMP/prof.txt $SH -c '
+f() { i=0; while test $i -lt 5000; do i=$((i+1)); done; }
+f
+'
+echo status=$?
+
+# procs, then file:line and a count
+cat $TMP/prof.txt 2>/dev/null | grep -c '^f;\[ -c flag \]:2 [0-9][0-9]*$'
+## STDOUT:
+status=0
+1
+## END
+## N-I bash/dash/mksh/zsh status: 1
+## N-I bash/dash/mksh/zsh STDOUT:
+status=0
+0
+## END
+
+#### OSH_SAMPLE_PROFILE is written when the last command is external
+rm -f $TMP/prof.txt
+OSH_SAMPLE_PROFILE=$TMP/prof.txt $SH -c '
+f() { i=0; while test $i -lt 5000; do i=$((i+1)); done; }
+f; env true'
+echo status=$?
+
+cat $TMP/prof.txt 2>/dev/null | grep -c '^f;\[ -c flag \]:2 [0-9][0-9]*$'
+## STDOUT:
+status=0
+1
+## END
+## N-I bash/dash/mksh/zsh status: 1
+## N-I bash/dash/mksh/zsh STDOUT:
+status=0
+0
+## END
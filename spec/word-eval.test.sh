@@ -60,3 +60,22 @@ touch '_tmp/[bc]ar.mm' # file that looks like a glob pattern
 touch _tmp/bar.mm _tmp/car.mm
 argv.py '_tmp/[bc]'*.mm - _tmp/?ar.mm
 ## stdout: ['_tmp/[bc]ar.mm', '-', '_tmp/bar.mm', '_tmp/car.mm']
+
+#### Constant words evaluated repeatedly, with different options
+touch _tmp/c.zz
+for i in 1 2; do
+  argv.py foo 'a b' '' _tmp/*.zz
+  IFS=o
+  set -f
+done
+## STDOUT:
+['foo', 'a b', '', '_tmp/c.zz']
+['foo', 'a b', '', '_tmp/*.zz']
+## END
+
+#### Assignment builtin as a constant word in a loop
+for i in 1 2; do
+  export v$i=x
+done
+argv.py "$v1" "$v2"
+## stdout: ['x', 'x']